@@ -0,0 +1,113 @@
+"""
+Cache de resultados de Athena, por texto de query y versión del dataset
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import boto3
+from botocore.exceptions import ClientError
+
+ANALITICA_S3_BUCKET = os.environ.get("ANALITICA_S3_BUCKET", "alerta-utec-analitica")
+ANALITICA_CACHE_TTL_SECONDS = int(os.environ.get("ANALITICA_CACHE_TTL_SECONDS", "86400"))
+# Cada cuánto se relee el marcador de versión (lo escribe el DAG al terminar)
+ANALITICA_VERSION_TTL_SECONDS = int(os.environ.get("ANALITICA_VERSION_TTL_SECONDS", "30"))
+
+CACHE_PREFIX = "analitica-cache"
+VERSION_KEY = "analitica-meta/version.json"
+
+s3 = boto3.client("s3")
+
+# Cache en memoria del contenedor: {clave: (expira_en, resultado)}
+_memoria = {}
+_version = {"valor": None, "leida_en": 0.0}
+
+
+def version_dataset():
+    """
+    Versión actual del dataset (marca de la última ejecución del DAG).
+    Cuando el DAG escribe una versión nueva, todas las claves cambian y la
+    cache anterior queda invalidada.
+    """
+    ahora = time.time()
+    if ahora - _version["leida_en"] < ANALITICA_VERSION_TTL_SECONDS:
+        return _version["valor"]
+
+    try:
+        response = s3.get_object(Bucket=ANALITICA_S3_BUCKET, Key=VERSION_KEY)
+        valor = json.loads(response["Body"].read()).get("version")
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+            print(f"⚠️ No se pudo leer la versión del dataset: {e}")
+        valor = None
+
+    _version.update(valor=valor, leida_en=ahora)
+    return valor
+
+
+def publicar_version(version, **detalle):
+    """
+    Publica una versión nueva del dataset (la usa la compactación CDC al
+    reescribir particiones). Invalida la cache de todas las lambdas en
+    cuanto relean el marcador.
+    """
+    s3.put_object(
+        Bucket=ANALITICA_S3_BUCKET,
+        Key=VERSION_KEY,
+        Body=json.dumps({
+            "version": version,
+            "publicado_en": datetime.now(timezone.utc).isoformat(),
+            **detalle,
+        }).encode("utf-8"),
+        ContentType="application/json",
+    )
+    _version.update(valor=version, leida_en=time.time())
+
+
+def _clave(query, version):
+    texto = f"{version or 'sin-version'}\n{' '.join(query.split())}"
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def leer(query):
+    """Resultado cacheado para la query en la versión actual, o None."""
+    clave = _clave(query, version_dataset())
+    ahora = time.time()
+
+    en_memoria = _memoria.get(clave)
+    if en_memoria and en_memoria[0] > ahora:
+        return en_memoria[1]
+
+    try:
+        response = s3.get_object(Bucket=ANALITICA_S3_BUCKET, Key=f"{CACHE_PREFIX}/{clave}.json")
+        entrada = json.loads(response["Body"].read())
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+            print(f"⚠️ Error leyendo cache de Athena: {e}")
+        return None
+
+    if entrada.get("expira_en", 0) <= ahora:
+        return None
+
+    _memoria[clave] = (entrada["expira_en"], entrada["resultado"])
+    return entrada["resultado"]
+
+
+def guardar(query, resultado):
+    """Guarda un resultado exitoso en memoria y en S3 con TTL."""
+    clave = _clave(query, version_dataset())
+    expira_en = time.time() + ANALITICA_CACHE_TTL_SECONDS
+    _memoria[clave] = (expira_en, resultado)
+
+    try:
+        s3.put_object(
+            Bucket=ANALITICA_S3_BUCKET,
+            Key=f"{CACHE_PREFIX}/{clave}.json",
+            Body=json.dumps({"expira_en": expira_en, "resultado": resultado}, ensure_ascii=False).encode("utf-8"),
+            ContentType="application/json",
+        )
+    except ClientError as e:
+        print(f"⚠️ Error guardando cache de Athena: {e}")
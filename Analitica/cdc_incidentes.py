@@ -0,0 +1,497 @@
+"""
+CDC de incidentes: consumidor del stream de DynamoDB y compactación en S3
+"""
+
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from botocore.exceptions import ClientError
+from boto3.dynamodb.types import TypeDeserializer
+
+from cache_athena import publicar_version
+from exportacion import EscritorJsonlS3
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CompactarCdcIncidentes lo recibe de la layer de AWS SDK for pandas
+    pa = None
+    pq = None
+
+ANALITICA_S3_BUCKET = os.environ.get("ANALITICA_S3_BUCKET", "alerta-utec-analitica")
+
+CDC_PREFIX = "analitica-cdc/incidentes"
+CAMBIOS_PREFIX = f"{CDC_PREFIX}/cambios/"
+WATERMARK_KEY = f"{CDC_PREFIX}/_watermark.json"
+# Estado actual de la tabla, un JSON Lines por partición fecha/tipo (igual
+# que el dataset). Lo crea el DAG en la exportación inicial y al terminar
+# escribe SNAPSHOT_COMPLETO_KEY; desde entonces lo mantiene la compactación.
+SNAPSHOT_PREFIX = f"{CDC_PREFIX}/snapshot/"
+SNAPSHOT_COMPLETO_KEY = f"{SNAPSHOT_PREFIX}_completo.json"
+# Compactación y export_tables del DAG escriben los mismos prefijos: se
+# serializan con este lock (PutObject condicional)
+LOCK_KEY = f"{CDC_PREFIX}/_lock.json"
+ANALITICA_CDC_LOCK_TTL_SEGUNDOS = int(os.environ.get("ANALITICA_CDC_LOCK_TTL_SEGUNDOS", "600"))
+
+# Dataset que consultan Athena y el motor local (lo genera el DAG). La
+# compactación reescribe aquí sólo las particiones que cambiaron.
+ANALITICA_GLUE_DATABASE = os.environ.get("ANALITICA_GLUE_DATABASE")
+RESULTS_PREFIX = "analitica-results/incidentes"
+DATASET_JSONL_KEY = f"{RESULTS_PREFIX}/incidentes.jsonl"
+GLUE_TABLA = "incidentes"
+# Igual que PARTICIONES["incidentes"] en etl_dynamodb.py
+COLUMNAS_PARTICION = ("fecha", "tipo")
+SIN_VALOR = "__sin_valor__"
+PARQUET_COMPRESION = "zstd"
+PARQUET_FILAS_POR_GRUPO = int(os.environ.get("ANALITICA_PARQUET_FILAS_POR_GRUPO", "50000"))
+
+# Sólo se compactan objetos con esta antigüedad, para que un lote escrito en
+# paralelo por otro shard no quede detrás de la marca de agua
+ANALITICA_CDC_MARGEN_SEGUNDOS = int(os.environ.get("ANALITICA_CDC_MARGEN_SEGUNDOS", "120"))
+
+FORMATO_MARCA = "%Y%m%dT%H%M%S%f"
+ERRORES_CONDICION = ("PreconditionFailed", "ConditionalRequestConflict")
+
+s3 = boto3.client("s3")
+glue = boto3.client("glue")
+_deserializer = TypeDeserializer()
+
+
+def _imagen(imagen):
+    if not imagen:
+        return None
+    return {k: _deserializer.deserialize(v) for k, v in imagen.items()}
+
+
+def _particion(item):
+    """Valores (fecha, tipo) de la partición de un incidente, como en el DAG."""
+    fecha = str(item.get("creado_en") or item.get("created_at") or "")[:10]
+    return tuple(
+        str(valor) if valor not in (None, "") else SIN_VALOR
+        for valor in (fecha, item.get("tipo"))
+    )
+
+
+def _ruta_particion(valores):
+    return "/".join(f"{c}={v}" for c, v in zip(COLUMNAS_PARTICION, valores))
+
+
+def _registro_cambio(record):
+    datos = record.get("dynamodb", {})
+    claves = _imagen(datos.get("Keys")) or {}
+    anterior = _imagen(datos.get("OldImage"))
+    return {
+        "operacion": record.get("eventName"),
+        "incidente_id": claves.get("incidente_id"),
+        "secuencia": datos.get("SequenceNumber"),
+        "aprox_creacion": datos.get("ApproximateCreationDateTime"),
+        "imagen": _imagen(datos.get("NewImage")),
+        # La compactación sólo abre la partición de la que sale el incidente
+        # y a la que llega, sin buscarlo en todo el snapshot
+        "particion_anterior": list(_particion(anterior)) if anterior else None,
+    }
+
+
+def lambda_handler(event, context):
+    """
+    Consumidor del stream de incidentes: agrega los cambios del lote a un
+    objeto JSON Lines particionado por fecha y hora:
+
+        analitica-cdc/incidentes/cambios/fecha=AAAA-MM-DD/hora=HH/<marca>-<secuencia>.jsonl
+
+    La marca de tiempo al inicio del nombre mantiene el orden lexicográfico
+    de las claves igual al orden de escritura, que es lo que usa la
+    compactación.
+    """
+    records = event.get("Records", [])
+    if not records:
+        return {"cambios": 0}
+
+    ahora = datetime.now(timezone.utc)
+    primera_secuencia = records[0].get("dynamodb", {}).get("SequenceNumber", "0")
+    key = (
+        f"{CAMBIOS_PREFIX}fecha={ahora:%Y-%m-%d}/hora={ahora:%H}/"
+        f"{ahora.strftime(FORMATO_MARCA)}-{primera_secuencia}.jsonl"
+    )
+
+    escritor = EscritorJsonlS3(s3, ANALITICA_S3_BUCKET, key)
+    escritor.escribir([_registro_cambio(record) for record in records])
+    cambios = escritor.cerrar()
+
+    print(f"📝 {cambios} cambios de incidentes en s3://{ANALITICA_S3_BUCKET}/{key}")
+    return {"cambios": cambios, "s3_key": key}
+
+
+def _codigo_error(e):
+    return e.response.get("Error", {}).get("Code")
+
+
+def _leer_json(key):
+    try:
+        response = s3.get_object(Bucket=ANALITICA_S3_BUCKET, Key=key)
+    except ClientError as e:
+        if _codigo_error(e) in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.loads(response["Body"].read())
+
+
+def _leer_jsonl(key):
+    """Itera las líneas de un objeto JSON Lines sin descargarlo completo."""
+    try:
+        response = s3.get_object(Bucket=ANALITICA_S3_BUCKET, Key=key)
+    except ClientError as e:
+        if _codigo_error(e) in ("NoSuchKey", "404"):
+            return
+        raise
+    for linea in response["Body"].iter_lines():
+        if linea.strip():
+            yield json.loads(linea)
+
+
+def _existe(key):
+    try:
+        s3.head_object(Bucket=ANALITICA_S3_BUCKET, Key=key)
+        return True
+    except ClientError:
+        return False
+
+
+def adquirir_lock(duenio, ttl=None):
+    """
+    Toma el lock de escritura de incidentes sin esperar. Un lock vencido
+    (su dueño falló sin liberarlo) se reemplaza con PutObject condicionado
+    a su ETag, así dos interesados no lo toman a la vez.
+
+    Returns:
+        bool: True si el lock quedó tomado por `duenio`
+    """
+    cuerpo = json.dumps({
+        "duenio": duenio,
+        "expira_en": time.time() + (ttl or ANALITICA_CDC_LOCK_TTL_SEGUNDOS),
+    }).encode("utf-8")
+    try:
+        s3.put_object(Bucket=ANALITICA_S3_BUCKET, Key=LOCK_KEY, Body=cuerpo, IfNoneMatch="*")
+        return True
+    except ClientError as e:
+        if _codigo_error(e) not in ERRORES_CONDICION:
+            raise
+
+    try:
+        actual = s3.get_object(Bucket=ANALITICA_S3_BUCKET, Key=LOCK_KEY)
+    except ClientError as e:
+        if _codigo_error(e) in ("NoSuchKey", "404"):
+            return False
+        raise
+    if json.loads(actual["Body"].read()).get("expira_en", 0) > time.time():
+        return False
+
+    try:
+        s3.put_object(Bucket=ANALITICA_S3_BUCKET, Key=LOCK_KEY, Body=cuerpo, IfMatch=actual["ETag"])
+        return True
+    except ClientError as e:
+        if _codigo_error(e) in ERRORES_CONDICION + ("NoSuchKey",):
+            return False
+        raise
+
+
+def liberar_lock(duenio):
+    """Borra el lock sólo si sigue siendo de `duenio`."""
+    try:
+        actual = _leer_json(LOCK_KEY)
+        if actual and actual.get("duenio") == duenio:
+            s3.delete_object(Bucket=ANALITICA_S3_BUCKET, Key=LOCK_KEY)
+    except ClientError as e:
+        print(f"⚠️ No se pudo liberar el lock {LOCK_KEY}: {e}")
+
+
+def _marca_de_clave(key):
+    nombre = key.rsplit("/", 1)[-1]
+    return datetime.strptime(nombre.split("-", 1)[0], FORMATO_MARCA).replace(tzinfo=timezone.utc)
+
+
+def _cambios_pendientes(desde_key):
+    """Claves de cambios posteriores a la marca de agua y anteriores al margen."""
+    limite = datetime.now(timezone.utc) - timedelta(seconds=ANALITICA_CDC_MARGEN_SEGUNDOS)
+    paginator = s3.get_paginator("list_objects_v2")
+    kwargs = {"Bucket": ANALITICA_S3_BUCKET, "Prefix": CAMBIOS_PREFIX}
+    if desde_key:
+        kwargs["StartAfter"] = desde_key
+
+    claves = []
+    for pagina in paginator.paginate(**kwargs):
+        for objeto in pagina.get("Contents", []):
+            if _marca_de_clave(objeto["Key"]) > limite:
+                return claves
+            claves.append(objeto["Key"])
+    return claves
+
+
+def _particiones_de_fecha(fecha):
+    """Particiones del snapshot con esa fecha (para cambios sin particion_anterior)."""
+    prefijo = f"{SNAPSHOT_PREFIX}fecha={fecha}/"
+    particiones = set()
+    paginator = s3.get_paginator("list_objects_v2")
+    for pagina in paginator.paginate(Bucket=ANALITICA_S3_BUCKET, Prefix=prefijo):
+        for objeto in pagina.get("Contents", []):
+            tipo = objeto["Key"][len(prefijo):].split("/", 1)[0]
+            if tipo.startswith("tipo="):
+                particiones.add((fecha, tipo[len("tipo="):]))
+    return particiones
+
+
+def _ultimos_cambios(claves):
+    """
+    Último estado de cada incidente en los objetos de cambios y las
+    particiones que tocan (la de origen y la de destino).
+
+    Returns:
+        tuple: ({incidente_id: imagen o None si se borró}, set de particiones, cambios leídos)
+    """
+    ultimos = {}
+    afectadas = set()
+    cambios = 0
+    for key in claves:
+        for cambio in _leer_jsonl(key):
+            incidente_id = cambio.get("incidente_id")
+            if not incidente_id:
+                continue
+            imagen = cambio.get("imagen") if cambio.get("operacion") != "REMOVE" else None
+            ultimos[incidente_id] = imagen
+            if cambio.get("particion_anterior"):
+                afectadas.add(tuple(cambio["particion_anterior"]))
+            elif imagen and cambio.get("operacion") != "INSERT":
+                # Cambios escritos antes de guardar particion_anterior: la
+                # fecha no cambia, el tipo anterior puede ser cualquiera
+                afectadas |= _particiones_de_fecha(_particion(imagen)[0])
+            elif not imagen:
+                print(f"⚠️ Borrado de {incidente_id} sin partición de origen, lo aplicará el DAG")
+            if imagen:
+                afectadas.add(_particion(imagen))
+            cambios += 1
+    return ultimos, afectadas, cambios
+
+
+def _escribir_jsonl(key, items):
+    escritor = EscritorJsonlS3(s3, ANALITICA_S3_BUCKET, key)
+    try:
+        escritor.escribir(items)
+        return escritor.cerrar()
+    except Exception:
+        escritor.abortar()
+        raise
+
+
+def _esquema_dataset():
+    """Esquema de los Parquet que escribió el DAG (todas las particiones comparten uno)."""
+    response = s3.list_objects_v2(Bucket=ANALITICA_S3_BUCKET, Prefix=f"{RESULTS_PREFIX}/")
+    for objeto in response.get("Contents", []):
+        if objeto["Key"].endswith(".parquet"):
+            datos = s3.get_object(Bucket=ANALITICA_S3_BUCKET, Key=objeto["Key"])["Body"].read()
+            return pq.read_schema(io.BytesIO(datos))
+    return None
+
+
+def _valor_parquet(valor, tipo):
+    """Convierte un valor del snapshot al tipo de la columna en el dataset."""
+    if valor is None:
+        return None
+    if isinstance(valor, (dict, list)):
+        valor = json.dumps(valor, ensure_ascii=False)
+    try:
+        if pa.types.is_string(tipo):
+            return valor if isinstance(valor, str) else str(valor)
+        if pa.types.is_floating(tipo):
+            return float(valor)
+        if pa.types.is_integer(tipo):
+            return int(valor)
+        if pa.types.is_boolean(tipo):
+            return bool(valor)
+    except (TypeError, ValueError):
+        return None
+    return valor
+
+
+def _fila_parquet(item, esquema):
+    fila = dict(item)
+    fila.setdefault("creado_en", fila.get("created_at"))
+    fila.setdefault("actualizado_en", fila.get("updated_at"))
+    return {campo.name: _valor_parquet(fila.get(campo.name), campo.type) for campo in esquema}
+
+
+def _escribir_particion_parquet(key, items, esquema):
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, esquema, compression=PARQUET_COMPRESION) as writer:
+        for inicio in range(0, len(items), PARQUET_FILAS_POR_GRUPO):
+            writer.write_table(pa.Table.from_pylist(
+                [_fila_parquet(item, esquema) for item in items[inicio:inicio + PARQUET_FILAS_POR_GRUPO]],
+                schema=esquema,
+            ))
+    s3.put_object(
+        Bucket=ANALITICA_S3_BUCKET,
+        Key=key,
+        Body=buffer.getvalue(),
+        ContentType="application/vnd.apache.parquet",
+    )
+
+
+def _registrar_particiones(nuevas):
+    """
+    Da de alta en Glue las particiones nuevas para que Athena las vea sin
+    esperar al crawler del DAG. Las que ya existen se ignoran.
+    """
+    if not nuevas or not ANALITICA_GLUE_DATABASE:
+        return
+    try:
+        tabla = glue.get_table(DatabaseName=ANALITICA_GLUE_DATABASE, Name=GLUE_TABLA)["Table"]
+        descriptor = tabla["StorageDescriptor"]
+        for inicio in range(0, len(nuevas), 100):
+            glue.batch_create_partition(
+                DatabaseName=ANALITICA_GLUE_DATABASE,
+                TableName=GLUE_TABLA,
+                PartitionInputList=[
+                    {
+                        "Values": list(valores),
+                        "StorageDescriptor": {
+                            **descriptor,
+                            "Location": f"s3://{ANALITICA_S3_BUCKET}/{RESULTS_PREFIX}/{_ruta_particion(valores)}/",
+                        },
+                    }
+                    for valores in nuevas[inicio:inicio + 100]
+                ],
+            )
+    except ClientError as e:
+        print(f"⚠️ No se pudieron registrar particiones en Glue (las agregará el crawler): {e}")
+
+
+def _aplicar_particion(valores, ultimos, esquema):
+    """
+    Lee una partición del snapshot, le aplica el último estado de los
+    incidentes cambiados y reescribe esa partición del snapshot y del
+    dataset. Es idempotente: un reintento produce el mismo resultado.
+
+    Returns:
+        tuple: (incidentes en la partición, True si la partición del dataset es nueva)
+    """
+    ruta = _ruta_particion(valores)
+    snapshot_key = f"{SNAPSHOT_PREFIX}{ruta}/incidentes.jsonl"
+    dataset_key = f"{RESULTS_PREFIX}/{ruta}/part-0000.parquet"
+
+    items = {
+        item["incidente_id"]: item
+        for item in _leer_jsonl(snapshot_key)
+        if item.get("incidente_id") and item["incidente_id"] not in ultimos
+    }
+    for incidente_id, imagen in ultimos.items():
+        if imagen and _particion(imagen) == valores:
+            items[incidente_id] = imagen
+    filas = list(items.values())
+
+    nueva = False
+    if esquema is not None:
+        if filas:
+            nueva = not _existe(dataset_key)
+            _escribir_particion_parquet(dataset_key, filas, esquema)
+        else:
+            s3.delete_object(Bucket=ANALITICA_S3_BUCKET, Key=dataset_key)
+
+    # El snapshot se escribe después del dataset: si algo falla, el
+    # reintento parte del snapshot anterior
+    if filas:
+        _escribir_jsonl(snapshot_key, filas)
+    else:
+        s3.delete_object(Bucket=ANALITICA_S3_BUCKET, Key=snapshot_key)
+    return len(filas), nueva
+
+
+def compactar(event, context):
+    """
+    Aplica los cambios acumulados desde la última compactación y mueve la
+    marca de agua al último objeto aplicado.
+
+    Sólo se leen los objetos de cambios nuevos y las particiones fecha/tipo
+    que tocan: cada una se reescribe en el snapshot y en analitica-results/,
+    las nuevas se registran en Glue y se publica una versión del dataset,
+    que invalida la cache de resultados de Athena. La memoria depende del
+    tamaño de esas particiones, no de la tabla.
+
+    Mientras export_tables del DAG tiene el lock de incidentes, la
+    compactación no hace nada y los cambios quedan para la siguiente.
+    """
+    watermark = _leer_json(WATERMARK_KEY) or {}
+    claves = _cambios_pendientes(watermark.get("ultima_clave"))
+
+    if not claves:
+        print("✅ Sin cambios pendientes de compactar")
+        return {"objetos": 0, "cambios": 0}
+
+    if not _existe(SNAPSHOT_COMPLETO_KEY):
+        # Sin snapshot base (el DAG aún no hizo la exportación completa) no se
+        # avanza la marca de agua: los cambios se aplicarán sobre ese snapshot.
+        print(f"⏳ No existe s3://{ANALITICA_S3_BUCKET}/{SNAPSHOT_COMPLETO_KEY}, se espera la exportación completa")
+        return {"objetos": 0, "cambios": 0, "pendientes": len(claves)}
+
+    duenio = f"compactacion-{getattr(context, 'aws_request_id', None) or time.time()}"
+    if not adquirir_lock(duenio):
+        print("⏳ El DAG está exportando incidentes, la compactación queda para la próxima ejecución")
+        return {"objetos": 0, "cambios": 0, "pendientes": len(claves), "bloqueado": True}
+
+    try:
+        ultimos, afectadas, cambios = _ultimos_cambios(claves)
+
+        esquema = None
+        if _existe(DATASET_JSONL_KEY):
+            # Dataset JSON Lines (DAG sin pyarrow): es un único objeto sin
+            # particiones, lo regenera el DAG desde el snapshot
+            print("⚠️ El dataset es JSON Lines sin particiones: se actualizará en la próxima ejecución del DAG")
+        elif pq is None:
+            print("⚠️ pyarrow no está disponible: el dataset Parquet se actualizará en la próxima ejecución del DAG")
+        else:
+            esquema = _esquema_dataset()
+            if esquema is None:
+                print(f"⏳ No hay dataset Parquet en s3://{ANALITICA_S3_BUCKET}/{RESULTS_PREFIX}/, lo generará el DAG")
+
+        incidentes = 0
+        nuevas = []
+        for valores in sorted(afectadas):
+            filas, nueva = _aplicar_particion(valores, ultimos, esquema)
+            incidentes += filas
+            if nueva:
+                nuevas.append(valores)
+
+        dataset_actualizado = esquema is not None and bool(afectadas)
+        if dataset_actualizado:
+            _registrar_particiones(nuevas)
+            publicar_version(
+                datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-cdc",
+                origen="compactacion_cdc",
+                particiones=len(afectadas),
+            )
+
+        s3.put_object(
+            Bucket=ANALITICA_S3_BUCKET,
+            Key=WATERMARK_KEY,
+            Body=json.dumps({
+                "ultima_clave": claves[-1],
+                "compactado_en": datetime.now(timezone.utc).isoformat(),
+            }).encode("utf-8"),
+            ContentType="application/json",
+        )
+    finally:
+        liberar_lock(duenio)
+
+    print(
+        f"✅ Compactados {cambios} cambios de {len(claves)} objetos en {len(afectadas)} particiones "
+        f"({incidentes} incidentes, {len(nuevas)} particiones nuevas)"
+    )
+    return {
+        "objetos": len(claves),
+        "cambios": cambios,
+        "particiones": len(afectadas),
+        "incidentes_en_particiones": incidentes,
+        "dataset_actualizado": dataset_actualizado,
+    }
@@ -1,23 +1,59 @@
 import json
 import os
+import tempfile
 import time
+from collections import defaultdict
 from datetime import datetime
 from decimal import Decimal
 
 import boto3
+from botocore.exceptions import ClientError
 from airflow import DAG
 from airflow.decorators import task
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sin pyarrow se mantiene la salida JSON Lines
+    pa = None
+    pq = None
+
 DEFAULT_ARGS = {
     "owner": "analitica",
     "retries": 1,
 }
 
 S3_PREFIX = "analitica-results"
+# Snapshot que mantiene la compactación CDC (Analitica/cdc_incidentes.py):
+# un JSON Lines por partición y un marcador que escribe la exportación inicial
+CDC_SNAPSHOT_PREFIX = "analitica-cdc/{logical}/snapshot/"
+CDC_SNAPSHOT_COMPLETO_KEY = CDC_SNAPSHOT_PREFIX + "_completo.json"
+# Snapshot de un solo archivo (versión anterior); se migra a particiones
+CDC_SNAPSHOT_LEGADO_KEY = CDC_SNAPSHOT_PREFIX + "{logical}.jsonl"
+# Lock compartido con la compactación: mientras se exporta una tabla CDC la
+# compactación no reescribe ni el snapshot ni el dataset
+CDC_LOCK_KEY = "analitica-cdc/{logical}/_lock.json"
+CDC_LOCK_TTL_SEGUNDOS = int(os.environ.get("ANALITICA_CDC_LOCK_TTL_DAG_SEGUNDOS", "3600"))
+CDC_LOCK_ESPERA_SEGUNDOS = 600
+# Columnas de partición (estilo Hive) por tabla lógica al escribir Parquet
+PARTICIONES = {
+    "incidentes": ("fecha", "tipo"),
+}
+PARQUET_COMPRESION = "zstd"
+# Filas por row group: la memoria de la escritura Parquet queda acotada por
+# este valor, no por el tamaño de la tabla
+PARQUET_FILAS_POR_GRUPO = int(os.environ.get("ANALITICA_PARQUET_FILAS_POR_GRUPO", "50000"))
+# Marcador de versión del dataset (lo lee Analitica/cache_athena.py)
+VERSION_KEY = "analitica-meta/version.json"
+# Tamaño de parte del multipart upload (S3 exige al menos 5 MB salvo la última)
+TAMANO_PARTE = 8 * 1024 * 1024
 
 def _decimal_default(obj):
     if isinstance(obj, Decimal):
         return float(obj) if obj % 1 else int(obj)
+    # String sets de DynamoDB (p. ej. evidencias_procesadas)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
     raise TypeError(f"No serializable type: {type(obj)}")
 
 def _parse_table_mapping(raw_value: str):
@@ -34,6 +70,359 @@ def _parse_table_mapping(raw_value: str):
         raise ValueError("ANALITICA_TABLES no contiene pares válidos clave=tabla")
     return mapping
 
+class _EscritorJsonlS3:
+    """JSON Lines hacia S3 por multipart upload; memoria acotada por TAMANO_PARTE."""
+
+    def __init__(self, s3, bucket, key):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.upload_id = None
+        self.partes = []
+        self.buffer = bytearray()
+
+    def _subir_buffer(self):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType="application/x-ndjson"
+            )["UploadId"]
+        numero = len(self.partes) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=numero, Body=bytes(self.buffer),
+        )
+        self.partes.append({"PartNumber": numero, "ETag": response["ETag"]})
+        self.buffer = bytearray()
+
+    def escribir(self, items):
+        for item in items:
+            self.buffer.extend(
+                (json.dumps(item, default=_decimal_default, ensure_ascii=False) + "\n").encode("utf-8")
+            )
+        if len(self.buffer) >= TAMANO_PARTE:
+            self._subir_buffer()
+
+    def cerrar(self):
+        if self.upload_id is None:
+            self.s3.put_object(
+                Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer),
+                ContentType="application/x-ndjson",
+            )
+            return
+        if self.buffer:
+            self._subir_buffer()
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.partes},
+        )
+
+    def abortar(self):
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+def _paginas_dynamodb(dynamodb, table_name):
+    table = dynamodb.Table(table_name)
+    last_evaluated_key = None
+    while True:
+        scan_kwargs = {}
+        if last_evaluated_key:
+            scan_kwargs["ExclusiveStartKey"] = last_evaluated_key
+        response = table.scan(**scan_kwargs)
+        yield response.get("Items", [])
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key:
+            break
+
+def _paginas_snapshot(s3, bucket, prefijo, tamano=1000):
+    """Páginas de todos los JSON Lines del snapshot (uno por partición)."""
+    paginator = s3.get_paginator("list_objects_v2")
+    pagina = []
+    for listado in paginator.paginate(Bucket=bucket, Prefix=prefijo):
+        for objeto in listado.get("Contents", []):
+            if not objeto["Key"].endswith(".jsonl"):
+                continue
+            body = s3.get_object(Bucket=bucket, Key=objeto["Key"])["Body"]
+            for linea in body.iter_lines():
+                if linea.strip():
+                    pagina.append(json.loads(linea, parse_float=Decimal))
+                    if len(pagina) >= tamano:
+                        yield pagina
+                        pagina = []
+    if pagina:
+        yield pagina
+
+def _particion_snapshot(item):
+    """Igual que _particion en Analitica/cdc_incidentes.py."""
+    fecha = str(item.get("creado_en") or item.get("created_at") or "")[:10]
+    return tuple(
+        str(valor) if valor not in (None, "") else "__sin_valor__"
+        for valor in (fecha, item.get("tipo"))
+    )
+
+class _SnapshotParticionado:
+    """
+    Snapshot CDC inicial: reparte los items en archivos temporales por
+    partición fecha/tipo y al cerrar los sube, borra lo que quedara de un
+    snapshot anterior y escribe el marcador de snapshot completo.
+    """
+
+    def __init__(self, s3, bucket, logical):
+        self.s3 = s3
+        self.bucket = bucket
+        self.logical = logical
+        self.prefijo = CDC_SNAPSHOT_PREFIX.format(logical=logical)
+        self.directorio = tempfile.TemporaryDirectory(prefix="etl-snapshot-")
+        self.archivos = {}
+        self.registros = 0
+
+    def escribir(self, items):
+        por_particion = defaultdict(list)
+        for item in items:
+            por_particion[_particion_snapshot(item)].append(item)
+        for valores, grupo in por_particion.items():
+            if valores not in self.archivos:
+                self.archivos[valores] = os.path.join(self.directorio.name, f"particion-{len(self.archivos)}.jsonl")
+            with open(self.archivos[valores], "a", encoding="utf-8") as archivo:
+                archivo.writelines(
+                    json.dumps(item, default=_decimal_default, ensure_ascii=False) + "\n" for item in grupo
+                )
+        self.registros += len(items)
+
+    def cerrar(self):
+        try:
+            claves = []
+            for (fecha, tipo), ruta in self.archivos.items():
+                key = f"{self.prefijo}fecha={fecha}/tipo={tipo}/{self.logical}.jsonl"
+                self.s3.upload_file(ruta, self.bucket, key, ExtraArgs={"ContentType": "application/x-ndjson"})
+                claves.append(key)
+            marcador = CDC_SNAPSHOT_COMPLETO_KEY.format(logical=self.logical)
+            _limpiar_prefijo(self.s3, self.bucket, self.prefijo, claves + [marcador])
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=marcador,
+                Body=json.dumps({
+                    "registros": self.registros,
+                    "particiones": len(claves),
+                    "creado_en": datetime.utcnow().isoformat(),
+                }).encode("utf-8"),
+                ContentType="application/json",
+            )
+        finally:
+            self.directorio.cleanup()
+
+    def abortar(self):
+        self.directorio.cleanup()
+
+def _existe(s3, bucket, key):
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError:
+        return False
+
+def _adquirir_lock_cdc(s3, bucket, logical, duenio):
+    """
+    Toma el lock de la tabla CDC (el mismo de Analitica/cdc_incidentes.py)
+    con PutObject condicional; espera a que termine una compactación en
+    curso y reemplaza un lock vencido condicionado a su ETag.
+    """
+    key = CDC_LOCK_KEY.format(logical=logical)
+    limite = time.time() + CDC_LOCK_ESPERA_SEGUNDOS
+    while True:
+        cuerpo = json.dumps({"duenio": duenio, "expira_en": time.time() + CDC_LOCK_TTL_SEGUNDOS}).encode("utf-8")
+        try:
+            s3.put_object(Bucket=bucket, Key=key, Body=cuerpo, IfNoneMatch="*")
+            return
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise
+        try:
+            actual = s3.get_object(Bucket=bucket, Key=key)
+            if json.loads(actual["Body"].read()).get("expira_en", 0) <= time.time():
+                s3.put_object(Bucket=bucket, Key=key, Body=cuerpo, IfMatch=actual["ETag"])
+                return
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in (
+                "NoSuchKey", "PreconditionFailed", "ConditionalRequestConflict"
+            ):
+                raise
+        if time.time() >= limite:
+            raise TimeoutError(f"No se pudo tomar s3://{bucket}/{key} en {CDC_LOCK_ESPERA_SEGUNDOS} s")
+        print(f"  ⏳ Compactación CDC en curso, esperando s3://{bucket}/{key}")
+        time.sleep(10)
+
+def _liberar_lock_cdc(s3, bucket, logical, duenio):
+    key = CDC_LOCK_KEY.format(logical=logical)
+    try:
+        actual = json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+        if actual.get("duenio") == duenio:
+            s3.delete_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        print(f"  ⚠️ No se pudo liberar el lock {key}: {e}")
+
+def _con_copia(paginas, escritor):
+    """Entrega las páginas y además las escribe en `escritor` (snapshot CDC inicial)."""
+    for pagina in paginas:
+        escritor.escribir(pagina)
+        yield pagina
+
+def _fila_parquet(item):
+    """
+    Aplana un item para Parquet: Decimal -> int/float, objetos y listas como
+    JSON string, y fechas normalizadas a creado_en/actualizado_en (los datos
+    de ejemplo usan esos nombres y los handlers created_at/updated_at).
+    """
+    fila = {}
+    for campo, valor in item.items():
+        if isinstance(valor, Decimal):
+            valor = _decimal_default(valor)
+        elif isinstance(valor, (dict, list, set, frozenset)):
+            valor = json.dumps(valor, default=_decimal_default, ensure_ascii=False)
+        fila[campo] = valor
+    if "creado_en" not in fila and "created_at" in fila:
+        fila["creado_en"] = fila["created_at"]
+    if "actualizado_en" not in fila and "updated_at" in fila:
+        fila["actualizado_en"] = fila["updated_at"]
+    return fila
+
+def _valores_particion(fila, columnas):
+    valores = []
+    for columna in columnas:
+        if columna == "fecha":
+            valor = str(fila.get("creado_en") or "")[:10]
+        else:
+            valor = fila.pop(columna, None)
+        valores.append(str(valor) if valor not in (None, "") else "__sin_valor__")
+    return tuple(valores)
+
+def _esquema_arrow(tipos):
+    """
+    Esquema a partir de los tipos vistos en cada columna ({columna: {tipos}}).
+    Sólo una columna con tipos mezclados se guarda como texto; el resto
+    conserva su tipo (p. ej. `piso` sigue siendo numérico en Athena).
+    """
+    campos = []
+    for columna in sorted(tipos):
+        vistos = tipos[columna]
+        if vistos == {bool}:
+            tipo = pa.bool_()
+        elif vistos == {int}:
+            tipo = pa.int64()
+        elif vistos and vistos <= {int, float}:
+            tipo = pa.float64()
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(columna, tipo))
+    return pa.schema(campos)
+
+def _convertir_valor(valor, tipo):
+    if valor is None:
+        return None
+    if pa.types.is_string(tipo):
+        return valor if isinstance(valor, str) else str(valor)
+    if pa.types.is_floating(tipo):
+        return float(valor)
+    return valor
+
+def _lotes_jsonl(ruta, tamano):
+    lote = []
+    with open(ruta, encoding="utf-8") as archivo:
+        for linea in archivo:
+            lote.append(json.loads(linea))
+            if len(lote) >= tamano:
+                yield lote
+                lote = []
+    if lote:
+        yield lote
+
+def _escribir_parquet(s3, bucket, prefijo_tabla, paginas, columnas_particion):
+    """
+    Escribe la tabla como Parquet (ZSTD), un archivo por partición
+    `col=valor/...`. Retorna (registros, claves escritas).
+
+    Primera pasada: cada página se reparte en archivos temporales por
+    partición y se registran los tipos de cada columna. Segunda pasada:
+    cada partición se escribe con ParquetWriter en row groups de
+    PARQUET_FILAS_POR_GRUPO filas con un esquema común a toda la tabla.
+    La memoria queda acotada por la página y el row group, no por la tabla.
+    """
+    with tempfile.TemporaryDirectory(prefix="etl-parquet-") as directorio:
+        archivos = {}
+        tipos = defaultdict(set)
+        registros = 0
+
+        for pagina in paginas:
+            por_particion = defaultdict(list)
+            for item in pagina:
+                fila = _fila_parquet(item)
+                valores = _valores_particion(fila, columnas_particion)
+                for campo, valor in fila.items():
+                    vistos = tipos[campo]
+                    if valor is not None:
+                        vistos.add(type(valor))
+                por_particion[valores].append(fila)
+            for valores, filas in por_particion.items():
+                if valores not in archivos:
+                    archivos[valores] = os.path.join(directorio, f"particion-{len(archivos)}.jsonl")
+                with open(archivos[valores], "a", encoding="utf-8") as archivo:
+                    archivo.writelines(json.dumps(fila, ensure_ascii=False) + "\n" for fila in filas)
+            registros += len(pagina)
+
+        if not registros:
+            return 0, []
+
+        # Un solo esquema para toda la tabla, así todas las particiones coinciden
+        esquema = _esquema_arrow(tipos)
+        claves = []
+        for valores, ruta_jsonl in archivos.items():
+            ruta = "/".join(f"{c}={v}" for c, v in zip(columnas_particion, valores))
+            key = f"{prefijo_tabla}/{ruta + '/' if ruta else ''}part-0000.parquet"
+            ruta_parquet = ruta_jsonl[:-len(".jsonl")] + ".parquet"
+            with pq.ParquetWriter(ruta_parquet, esquema, compression=PARQUET_COMPRESION) as writer:
+                for lote in _lotes_jsonl(ruta_jsonl, PARQUET_FILAS_POR_GRUPO):
+                    writer.write_table(pa.Table.from_pylist(
+                        [
+                            {campo.name: _convertir_valor(fila.get(campo.name), campo.type) for campo in esquema}
+                            for fila in lote
+                        ],
+                        schema=esquema,
+                    ))
+            s3.upload_file(
+                ruta_parquet, bucket, key,
+                ExtraArgs={"ContentType": "application/vnd.apache.parquet"},
+            )
+            os.remove(ruta_jsonl)
+            os.remove(ruta_parquet)
+            claves.append(key)
+        return registros, claves
+
+def _escribir_jsonl(s3, bucket, key, paginas):
+    escritor = _EscritorJsonlS3(s3, bucket, key)
+    registros = 0
+    try:
+        for pagina in paginas:
+            escritor.escribir(pagina)
+            registros += len(pagina)
+        escritor.cerrar()
+    except Exception:
+        escritor.abortar()
+        raise
+    return registros
+
+def _limpiar_prefijo(s3, bucket, prefijo, conservar):
+    """Borra los objetos del dataset anterior que no se reescribieron."""
+    conservar = set(conservar)
+    obsoletos = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for pagina in paginator.paginate(Bucket=bucket, Prefix=prefijo):
+        obsoletos.extend(o["Key"] for o in pagina.get("Contents", []) if o["Key"] not in conservar)
+    for inicio in range(0, len(obsoletos), 1000):
+        s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": k} for k in obsoletos[inicio:inicio + 1000]], "Quiet": True},
+        )
+    return len(obsoletos)
+
 with DAG(
     dag_id="etl_dynamodb_a_glue_athena",
     description="Ingesta de DynamoDB a S3 con Glue y Athena",
@@ -64,6 +453,8 @@ with DAG(
             "glue_crawler": os.environ["ANALITICA_GLUE_CRAWLER"],
             "glue_role": glue_role_arn,
             "region": os.environ.get("AWS_REGION", "us-east-1"),
+            # Tablas cuyo snapshot mantiene la compactación CDC (Analitica/cdc_incidentes.py)
+            "tablas_cdc": [t.strip() for t in os.environ.get("ANALITICA_TABLAS_CDC", "").split(",") if t.strip()],
         }
         return config
 
@@ -91,51 +482,74 @@ with DAG(
         print(f"🪣 Bucket: {cfg['bucket']}")
         print(f"📁 Prefijo: {cfg['prefix']}")
 
+        formato = "parquet" if pq is not None else "jsonl"
+        print(f"🗂️  Formato: {formato}")
+
         for logical_name, table_name in cfg["tables"].items():
             print(f"\n📋 Exportando: {table_name} → {logical_name}")
-            
-            table = dynamodb.Table(table_name)
-            items = []
-            last_evaluated_key = None
-
-            while True:
-                scan_kwargs = {}
-                if last_evaluated_key:
-                    scan_kwargs["ExclusiveStartKey"] = last_evaluated_key
-                response = table.scan(**scan_kwargs)
-                items.extend(response.get("Items", []))
-                last_evaluated_key = response.get("LastEvaluatedKey")
-                if not last_evaluated_key:
-                    break
-
-            print(f"  ✓ Registros: {len(items)}")
-
-            # Estructura simple: analitica_results/tabla/tabla.jsonl
-            key = f"{cfg['prefix']}/{logical_name}/{logical_name}.jsonl"
-            
-            # JSON Lines: una línea por objeto
-            jsonl_lines = []
-            for item in items:
-                json_line = json.dumps(item, default=_decimal_default, ensure_ascii=False)
-                jsonl_lines.append(json_line)
-            
-            body = "\n".join(jsonl_lines)
-            
-            # Sobrescribir archivo existente
-            s3.put_object(
-                Bucket=cfg["bucket"],
-                Key=key,
-                Body=body.encode("utf-8"),
-                ContentType="application/x-ndjson"
-            )
 
-            print(f"  ✅ Guardado en: s3://{cfg['bucket']}/{key}")
+            prefijo_tabla = f"{cfg['prefix']}/{logical_name}"
+            es_cdc = logical_name in cfg.get("tablas_cdc", [])
+            duenio_lock = f"dag-{timestamp}-{logical_name}"
+            escritor_snapshot = None
+
+            # Tablas con CDC: se parte del snapshot que mantiene la compactación
+            # en lugar de escanear DynamoDB. La primera vez (sin snapshot) se
+            # escanea y se deja el snapshot base particionado para la
+            # compactación. El lock evita que ésta reescriba el snapshot o el
+            # dataset mientras se exporta.
+            if es_cdc:
+                _adquirir_lock_cdc(s3, cfg["bucket"], logical_name, duenio_lock)
+            try:
+                if es_cdc:
+                    snapshot_prefijo = CDC_SNAPSHOT_PREFIX.format(logical=logical_name)
+                    legado_key = CDC_SNAPSHOT_LEGADO_KEY.format(logical=logical_name)
+                    if _existe(s3, cfg["bucket"], CDC_SNAPSHOT_COMPLETO_KEY.format(logical=logical_name)):
+                        print(f"  🔁 Desde snapshot CDC: s3://{cfg['bucket']}/{snapshot_prefijo}")
+                        paginas = _paginas_snapshot(s3, cfg["bucket"], snapshot_prefijo)
+                    else:
+                        escritor_snapshot = _SnapshotParticionado(s3, cfg["bucket"], logical_name)
+                        if _existe(s3, cfg["bucket"], legado_key):
+                            print(f"  🔀 Migrando snapshot CDC de un archivo a particiones: s3://{cfg['bucket']}/{legado_key}")
+                            origen = _paginas_snapshot(s3, cfg["bucket"], legado_key)
+                        else:
+                            print("  📸 Sin snapshot CDC previo, exportación completa inicial")
+                            origen = _paginas_dynamodb(dynamodb, table_name)
+                        paginas = _con_copia(origen, escritor_snapshot)
+                else:
+                    paginas = _paginas_dynamodb(dynamodb, table_name)
+
+                try:
+                    if formato == "parquet":
+                        registros, claves = _escribir_parquet(
+                            s3, cfg["bucket"], prefijo_tabla, paginas, PARTICIONES.get(logical_name, ())
+                        )
+                    else:
+                        # Estructura simple: analitica_results/tabla/tabla.jsonl
+                        key = f"{prefijo_tabla}/{logical_name}.jsonl"
+                        registros = _escribir_jsonl(s3, cfg["bucket"], key, paginas)
+                        claves = [key]
+                    if escritor_snapshot:
+                        escritor_snapshot.cerrar()
+                except Exception:
+                    if escritor_snapshot:
+                        escritor_snapshot.abortar()
+                    raise
+
+                eliminados = _limpiar_prefijo(s3, cfg["bucket"], f"{prefijo_tabla}/", claves)
+            finally:
+                if es_cdc:
+                    _liberar_lock_cdc(s3, cfg["bucket"], logical_name, duenio_lock)
+
+            print(f"  ✓ Registros: {registros}")
+            print(f"  ✅ Guardado en: s3://{cfg['bucket']}/{prefijo_tabla}/ ({len(claves)} archivos, {eliminados} obsoletos eliminados)")
 
             results.append({
                 "logical": logical_name,
                 "table": table_name,
-                "records": len(items),
-                "s3_key": key
+                "records": registros,
+                "format": formato,
+                "s3_keys": claves
             })
 
         print(f"\n📊 Resumen:")
@@ -240,6 +654,28 @@ with DAG(
             print(traceback.format_exc())
             raise
 
+    @task()
+    def publish_dataset_version(cfg, exports, crawler_run):
+        """
+        Publica la versión del dataset al terminar la ingesta. Las lambdas de
+        analítica la usan como parte de la clave de su cache de resultados,
+        por lo que una versión nueva invalida la cache anterior.
+        """
+        s3 = boto3.client("s3", region_name=cfg["region"])
+        version = {
+            "version": exports["timestamp"],
+            "publicado_en": datetime.utcnow().isoformat() + "Z",
+            "crawler_status": crawler_run.get("status"),
+        }
+        s3.put_object(
+            Bucket=cfg["bucket"],
+            Key=VERSION_KEY,
+            Body=json.dumps(version).encode("utf-8"),
+            ContentType="application/json",
+        )
+        print(f"🏷️  Versión del dataset publicada: {version['version']}")
+        return version
+
     configuration = load_config()
     bucket_ready = ensure_bucket(configuration)
     exports = export_tables(configuration)
@@ -247,4 +683,6 @@ with DAG(
     crawler_name = ensure_glue_crawler(configuration)
     crawler_run = run_glue_crawler(configuration, crawler_name)
 
-    bucket_ready >> exports >> database >> crawler_name >> crawler_run
\ No newline at end of file
+    dataset_version = publish_dataset_version(configuration, exports, crawler_run)
+
+    bucket_ready >> exports >> database >> crawler_name >> crawler_run >> dataset_version
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""
+Exportación de tablas DynamoDB con scan paralelo (Segment/TotalSegments)
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from boto3.dynamodb.types import TypeDeserializer
+from decimal import Decimal
+
+# Segmentos de scan por tabla y tablas exportadas a la vez
+ANALITICA_SCAN_SEGMENTOS = int(os.environ.get("ANALITICA_SCAN_SEGMENTOS", "8"))
+ANALITICA_TABLAS_PARALELO = int(os.environ.get("ANALITICA_TABLAS_PARALELO", "4"))
+
+ERRORES_THROTTLING = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+BACKOFF_BASE_SEGUNDOS = 0.1
+BACKOFF_MAX_SEGUNDOS = 10.0
+
+# S3 exige partes de al menos 5 MB (salvo la última)
+ANALITICA_TAMANO_PARTE_MB = max(5, int(os.environ.get("ANALITICA_TAMANO_PARTE_MB", "8")))
+
+_deserializer = TypeDeserializer()
+
+
+def _cliente_dynamodb(region):
+    # El cliente de bajo nivel es thread-safe y se comparte entre segmentos
+    return boto3.client(
+        "dynamodb",
+        region_name=region,
+        config=Config(
+            max_pool_connections=ANALITICA_SCAN_SEGMENTOS * ANALITICA_TABLAS_PARALELO,
+            retries={"max_attempts": 2, "mode": "standard"},
+        ),
+    )
+
+
+def escanear_segmento(client, table_name, segmento, total_segmentos, procesar_pagina):
+    """
+    Lee un segmento del scan paralelo y entrega cada página (lista de items
+    ya deserializados, con Decimal) a `procesar_pagina`.
+
+    Ante throttling espera con backoff exponencial con jitter y vuelve a
+    intentar la misma página; tras una lectura exitosa la espera vuelve a
+    la base. Sin throttling no hay pausas entre páginas.
+    """
+    kwargs = {
+        "TableName": table_name,
+        "Segment": segmento,
+        "TotalSegments": total_segmentos,
+    }
+    espera = BACKOFF_BASE_SEGUNDOS
+    leidos = 0
+
+    while True:
+        try:
+            response = client.scan(**kwargs)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ERRORES_THROTTLING:
+                raise
+            pausa = random.uniform(0, espera)
+            print(f"  ⏳ {table_name} segmento {segmento}: throttling, reintento en {pausa:.2f}s")
+            time.sleep(pausa)
+            espera = min(espera * 2, BACKOFF_MAX_SEGUNDOS)
+            continue
+
+        espera = BACKOFF_BASE_SEGUNDOS
+        items = [
+            {k: _deserializer.deserialize(v) for k, v in item.items()}
+            for item in response.get("Items", [])
+        ]
+        if items:
+            procesar_pagina(items)
+            leidos += len(items)
+
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key:
+            return leidos
+        kwargs["ExclusiveStartKey"] = last_evaluated_key
+
+
+def escanear_tabla(client, table_name, procesar_pagina, total_segmentos=None):
+    """
+    Scan paralelo de toda la tabla: un hilo por segmento. `procesar_pagina`
+    se llama desde varios hilos, debe ser thread-safe.
+
+    Returns:
+        int: items leídos
+    """
+    total_segmentos = max(1, total_segmentos or ANALITICA_SCAN_SEGMENTOS)
+    with ThreadPoolExecutor(max_workers=total_segmentos) as pool:
+        futuros = [
+            pool.submit(escanear_segmento, client, table_name, segmento, total_segmentos, procesar_pagina)
+            for segmento in range(total_segmentos)
+        ]
+        return sum(futuro.result() for futuro in futuros)
+
+
+def exportar_tablas(tables, exportar_tabla, region=None):
+    """
+    Exporta varias tablas a la vez (ANALITICA_TABLAS_PARALELO).
+
+    Args:
+        tables: {nombre_logico: nombre_tabla}
+        exportar_tabla: función (client, logical_name, table_name) -> dict
+            con el resultado de la tabla (o None si no exportó nada)
+
+    Returns:
+        list: resultados en el mismo orden que `tables`
+    """
+    client = _cliente_dynamodb(region or os.environ.get("AWS_REGION", "us-east-1"))
+    with ThreadPoolExecutor(max_workers=max(1, min(ANALITICA_TABLAS_PARALELO, len(tables)))) as pool:
+        futuros = [
+            pool.submit(exportar_tabla, client, logical_name, table_name)
+            for logical_name, table_name in tables.items()
+        ]
+        return [futuro.result() for futuro in futuros]
+
+
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj) if obj % 1 else int(obj)
+    # String sets de DynamoDB (p. ej. evidencias_procesadas)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    raise TypeError(f"No serializable type: {type(obj)}")
+
+
+class EscritorJsonlS3:
+    """
+    Escribe items como JSON Lines en un objeto S3 mediante multipart upload.
+
+    Cada página se serializa al llegar y se acumula en un buffer; al
+    superar el tamaño de parte se sube como una parte y se libera. La
+    memoria queda acotada por el tamaño de parte (por hilo escritor), no
+    por el tamaño de la tabla. Es thread-safe para usarse como
+    `procesar_pagina` del scan paralelo.
+    """
+
+    def __init__(self, s3, bucket, key, tamano_parte_mb=None, content_type="application/x-ndjson"):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.tamano_parte = (tamano_parte_mb or ANALITICA_TAMANO_PARTE_MB) * 1024 * 1024
+        self.content_type = content_type
+        self.upload_id = None
+        self.partes = {}
+        self.siguiente_parte = 1
+        self.buffer = bytearray()
+        self.registros = 0
+        self.lock = threading.Lock()
+
+    def _iniciar(self):
+        if self.upload_id is None:
+            response = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )
+            self.upload_id = response["UploadId"]
+
+    def _subir_parte(self, numero, datos):
+        response = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=numero,
+            Body=bytes(datos),
+        )
+        with self.lock:
+            self.partes[numero] = response["ETag"]
+
+    def escribir(self, items):
+        datos = "".join(
+            json.dumps(item, default=_json_default, ensure_ascii=False) + "\n"
+            for item in items
+        ).encode("utf-8")
+
+        with self.lock:
+            self.buffer.extend(datos)
+            self.registros += len(items)
+            if len(self.buffer) < self.tamano_parte:
+                return
+            self._iniciar()
+            parte, self.buffer = self.buffer, bytearray()
+            numero = self.siguiente_parte
+            self.siguiente_parte += 1
+
+        # La subida ocurre fuera del lock: los demás segmentos siguen escribiendo
+        self._subir_parte(numero, parte)
+
+    def cerrar(self):
+        """
+        Sube lo que quede y completa el upload. Si todo cupo en una sola
+        parte se usa put_object. Retorna la cantidad de registros escritos.
+        """
+        if self.upload_id is None:
+            if self.registros:
+                self.s3.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=bytes(self.buffer),
+                    ContentType=self.content_type,
+                )
+            self.buffer = bytearray()
+            return self.registros
+
+        if self.buffer:
+            self._subir_parte(self.siguiente_parte, self.buffer)
+            self.buffer = bytearray()
+
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": numero, "ETag": etag}
+                    for numero, etag in sorted(self.partes.items())
+                ]
+            },
+        )
+        return self.registros
+
+    def abortar(self):
+        if self.upload_id is not None:
+            try:
+                self.s3.abort_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+                )
+            except ClientError as e:
+                print(f"⚠️ No se pudo abortar el multipart upload de {self.key}: {e}")
+        self.buffer = bytearray()
@@ -6,20 +6,17 @@ import json
 import os
 import time
 from datetime import datetime
-from decimal import Decimal
 import boto3
 from pathlib import Path
 import base64
 import requests
 
-S3_PREFIX = "analitica/ingesta"
-
+import cache_athena
+import motor_local
+import motor_rollups
+from exportacion import EscritorJsonlS3, escanear_tabla, exportar_tablas
 
-def _decimal_default(obj):
-    """Convierte Decimal a tipo serializable JSON"""
-    if isinstance(obj, Decimal):
-        return float(obj) if obj % 1 else int(obj)
-    raise TypeError(f"No serializable type: {type(obj)}")
+S3_PREFIX = "analitica/ingesta"
 
 
 def _parse_table_mapping(raw_value: str):
@@ -50,47 +47,33 @@ def etl_dynamodb_to_s3(event, context):
         bucket = os.environ["ANALITICA_S3_BUCKET"]
         region = os.environ.get("AWS_REGION", "us-east-1")
 
-        dynamodb = boto3.resource("dynamodb", region_name=region)
         s3 = boto3.client("s3", region_name=region)
         timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
 
-        results = []
-
-        # Exportar cada tabla
-        for logical_name, table_name in tables.items():
+        def exportar_tabla(client, logical_name, table_name):
             print(f"📊 Exportando {table_name} como {logical_name}...")
 
-            table = dynamodb.Table(table_name)
-            items = []
-            last_evaluated_key = None
-
-            # Paginación: leer toda la tabla
-            while True:
-                response = table.scan(
-                    ExclusiveStartKey=last_evaluated_key
-                ) if last_evaluated_key else table.scan()
-
-                items.extend(response.get("Items", []))
-                last_evaluated_key = response.get("LastEvaluatedKey")
-
-                if not last_evaluated_key:
-                    break
-                time.sleep(1)  # Evitar throttling
-
-            # Guardar en S3
-            if items:
-                file_name = f"{S3_PREFIX}/{logical_name}/{timestamp}_{logical_name}.json"
-                s3.put_object(
-                    Bucket=bucket,
-                    Key=file_name,
-                    Body=json.dumps(items, default=_decimal_default).encode("utf-8"),
-                    ContentType="application/json",
-                )
-                results.append({
-                    "table": logical_name,
-                    "s3_path": f"s3://{bucket}/{file_name}",
-                    "row_count": len(items),
-                })
+            # JSON Lines en streaming: cada página se sube en partes multipart
+            file_name = f"{S3_PREFIX}/{logical_name}/{timestamp}_{logical_name}.jsonl"
+            escritor = EscritorJsonlS3(s3, bucket, file_name)
+            try:
+                escanear_tabla(client, table_name, escritor.escribir)
+                row_count = escritor.cerrar()
+            except Exception:
+                escritor.abortar()
+                raise
+
+            if not row_count:
+                return None
+
+            return {
+                "table": logical_name,
+                "s3_path": f"s3://{bucket}/{file_name}",
+                "row_count": row_count,
+            }
+
+        # Exportar las tablas en paralelo (scan por segmentos en cada una)
+        results = [r for r in exportar_tablas(tables, exportar_tabla, region) if r]
 
         return {
             "statusCode": 200,
@@ -116,95 +99,213 @@ def etl_dynamodb_to_s3(event, context):
 athena_client = boto3.client('athena')
 s3_client = boto3.client('s3')
 ecs_client = boto3.client('ecs')
+lambda_client = boto3.client('lambda')
 
 # Configuración
 ANALITICA_S3_BUCKET = os.environ.get('ANALITICA_S3_BUCKET', 'alerta-utec-analitica')
 ANALITICA_GLUE_DATABASE = os.environ.get('ANALITICA_GLUE_DATABASE', 'alerta_utec_analitica')
 ATHENA_OUTPUT_LOCATION = f"s3://{ANALITICA_S3_BUCKET}/athena-results/"
+# 'athena', 'local' (motor en proceso de motor_local, para datasets pequeños)
+# o 'rollups' (agregados en vivo de TABLE_ROLLUPS, ver motor_rollups)
+ANALITICA_MOTOR = os.environ.get('ANALITICA_MOTOR', 'athena').lower()
+# Lambda que cachea en segundo plano los resultados de más de una página
+LAMBDA_CACHEAR_CONSULTA = os.environ.get('LAMBDA_CACHEAR_CONSULTA')
+
+
+# Espera bloqueante: backoff exponencial entre consultas de estado, con un
+# límite total por debajo de los 29 s de API Gateway
+ATHENA_ESPERA_INICIAL = 0.25
+ATHENA_ESPERA_MAXIMA = 4.0
+ATHENA_TIEMPO_MAXIMO = float(os.environ.get('ATHENA_TIEMPO_MAXIMO', '25'))
+ATHENA_FILAS_POR_PAGINA = 1000
+
+
+# Consultas disponibles para los endpoints de analítica
+QUERY_INCIDENTES_POR_PISO = """
+    SELECT 
+        piso,
+        estado,
+        COUNT(*) as total_incidentes
+    FROM incidentes
+    GROUP BY piso, estado
+    ORDER BY piso, estado
+    """
+
+QUERY_INCIDENTES_POR_TIPO = """
+    SELECT 
+        tipo,
+        nivel_urgencia,
+        COUNT(*) as cantidad,
+        ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(), 2) as porcentaje
+    FROM incidentes
+    GROUP BY tipo, nivel_urgencia
+    ORDER BY tipo, nivel_urgencia
+    """
+
+QUERY_TIEMPO_RESOLUCION = """
+    SELECT 
+        incidente_id,
+        titulo,
+        tipo,
+        nivel_urgencia,
+        creado_en,
+        actualizado_en,
+        estado,
+        CASE 
+            WHEN actualizado_en IS NOT NULL AND estado = 'resuelto' 
+            THEN date_diff('hour', 
+                          from_iso8601_timestamp(creado_en), 
+                          from_iso8601_timestamp(actualizado_en))
+            ELSE NULL 
+        END as horas_resolucion
+    FROM incidentes
+    WHERE estado = 'resuelto'
+    ORDER BY horas_resolucion
+    """
+
+QUERY_REPORTES_POR_USUARIO = """
+    SELECT 
+        i.usuario_correo,
+        u.nombre,
+        u.rol,
+        COUNT(*) as total_reportes,
+        SUM(CASE WHEN i.estado = 'resuelto' THEN 1 ELSE 0 END) as reportes_resueltos,
+        SUM(CASE WHEN i.estado = 'en_progreso' THEN 1 ELSE 0 END) as reportes_en_progreso,
+        SUM(CASE WHEN i.estado = 'reportado' THEN 1 ELSE 0 END) as reportes_pendientes
+    FROM incidentes i
+    LEFT JOIN usuarios u ON i.usuario_correo = u.correo
+    WHERE u.rol = 'estudiante' OR u.rol IS NULL
+    GROUP BY i.usuario_correo, u.nombre, u.rol
+    ORDER BY total_reportes DESC
+    LIMIT 20
+    """
+
+CONSULTAS = {
+    "incidentes-por-piso": {"query": QUERY_INCIDENTES_POR_PISO, "descripcion": "Incidentes por piso y estado"},
+    "incidentes-por-tipo": {"query": QUERY_INCIDENTES_POR_TIPO, "descripcion": "Incidentes por tipo y urgencia"},
+    "tiempo-resolucion": {"query": QUERY_TIEMPO_RESOLUCION, "descripcion": "Tiempo de resolución"},
+    "reportes-por-usuario": {"query": QUERY_REPORTES_POR_USUARIO, "descripcion": "Reportes por usuario"},
+}
+
+
+def _iniciar_query_athena(query: str):
+    response = athena_client.start_query_execution(
+        QueryString=query,
+        QueryExecutionContext={'Database': ANALITICA_GLUE_DATABASE},
+        ResultConfiguration={'OutputLocation': ATHENA_OUTPUT_LOCATION}
+    )
+    return response['QueryExecutionId']
+
+
+def _ejecucion_query_athena(query_execution_id: str):
+    """Retorna (estado, motivo_error, texto de la query)."""
+    execution = athena_client.get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']
+    status = execution['Status']
+    return status['State'], status.get('StateChangeReason'), execution.get('Query', '')
+
 
+def _estado_query_athena(query_execution_id: str):
+    """Retorna (estado, motivo_error)."""
+    estado, motivo, _ = _ejecucion_query_athena(query_execution_id)
+    return estado, motivo
 
-def _ejecutar_query_athena(query: str, descripcion: str = "Consulta"):
+
+def _esperar_query_athena(query_execution_id: str, tiempo_maximo: float = None):
+    """
+    Espera a que la query termine consultando el estado con backoff
+    exponencial (0.25 s, 0.5 s, 1 s... hasta 4 s). Retorna (estado, motivo).
+    """
+    limite = time.monotonic() + (tiempo_maximo or ATHENA_TIEMPO_MAXIMO)
+    espera = ATHENA_ESPERA_INICIAL
+    while True:
+        estado, motivo = _estado_query_athena(query_execution_id)
+        if estado in ('SUCCEEDED', 'FAILED', 'CANCELLED'):
+            return estado, motivo
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            return estado, 'Timeout esperando resultados de la query'
+        time.sleep(min(espera, restante))
+        espera = min(espera * 2, ATHENA_ESPERA_MAXIMA)
+
+
+def _pagina_resultados_athena(query_execution_id: str, next_token: str = None, max_results: int = ATHENA_FILAS_POR_PAGINA):
     """
-    Ejecuta una consulta en Athena y retorna los resultados
+    Lee una página de resultados. La fila de encabezados sólo viene en la
+    primera página y se descarta; los nombres de columna salen de la metadata.
+
+    Returns:
+        tuple: (columnas, filas, next_token)
     """
+    kwargs = {'QueryExecutionId': query_execution_id, 'MaxResults': max_results}
+    if next_token:
+        kwargs['NextToken'] = next_token
+    results = athena_client.get_query_results(**kwargs)
+
+    columns = [c['Name'] for c in results['ResultSet']['ResultSetMetadata']['ColumnInfo']]
+    rows = results['ResultSet']['Rows']
+    if not next_token and rows and [c.get('VarCharValue') for c in rows[0]['Data']] == columns:
+        rows = rows[1:]
+
+    data = []
+    for row in rows:
+        row_data = {}
+        for i, col in enumerate(row['Data']):
+            row_data[columns[i]] = col.get('VarCharValue', None)
+        data.append(row_data)
+    return columns, data, results.get('NextToken')
+
+
+def _resultados_completos_athena(query_execution_id: str):
+    """Todas las filas de una query terminada, en el formato que se cachea."""
+    columns, data, next_token = _pagina_resultados_athena(query_execution_id)
+    while next_token:
+        _, pagina, next_token = _pagina_resultados_athena(query_execution_id, next_token)
+        data.extend(pagina)
+    return {
+        'success': True,
+        'data': data,
+        'columns': columns,
+        'row_count': len(data)
+    }
+
+
+def _ejecutar_query_athena(query: str, descripcion: str = "Consulta", usar_cache: bool = True):
+    """
+    Ejecuta una consulta en Athena y retorna todos los resultados (paginando
+    get_query_results más allá de las primeras 1000 filas).
+
+    Los resultados exitosos se cachean por texto de query y versión del
+    dataset (ver cache_athena); mientras el DAG no publique una versión
+    nueva, la misma query se responde sin ir a Athena.
+    """
+    if usar_cache:
+        cacheado = cache_athena.leer(query)
+        if cacheado is not None:
+            print(f"⚡ Resultado desde cache: {descripcion}")
+            return cacheado
+
     try:
         print(f"📊 Ejecutando query: {descripcion}")
         
-        # Iniciar ejecución de query
-        response = athena_client.start_query_execution(
-            QueryString=query,
-            QueryExecutionContext={'Database': ANALITICA_GLUE_DATABASE},
-            ResultConfiguration={'OutputLocation': ATHENA_OUTPUT_LOCATION}
-        )
-        
-        query_execution_id = response['QueryExecutionId']
+        query_execution_id = _iniciar_query_athena(query)
         print(f"🔍 Query ID: {query_execution_id}")
         
-        # Esperar a que complete (máximo 30 segundos)
-        max_attempts = 30
-        attempt = 0
-        
-        while attempt < max_attempts:
-            query_status = athena_client.get_query_execution(
-                QueryExecutionId=query_execution_id
-            )
-            
-            status = query_status['QueryExecution']['Status']['State']
-            
-            if status == 'SUCCEEDED':
-                print(f"✅ Query completada exitosamente")
-                break
-            elif status in ['FAILED', 'CANCELLED']:
-                error_msg = query_status['QueryExecution']['Status'].get('StateChangeReason', 'Unknown error')
-                print(f"❌ Query falló: {error_msg}")
-                return {
-                    'success': False,
-                    'error': error_msg
-                }
-            
-            time.sleep(1)
-            attempt += 1
-        
-        if attempt >= max_attempts:
+        estado, motivo = _esperar_query_athena(query_execution_id)
+        if estado != 'SUCCEEDED':
+            print(f"❌ Query no completada ({estado}): {motivo}")
             return {
                 'success': False,
-                'error': 'Timeout esperando resultados de la query'
-            }
-        
-        # Obtener resultados
-        results = athena_client.get_query_results(
-            QueryExecutionId=query_execution_id
-        )
-        
-        # Parsear resultados
-        rows = results['ResultSet']['Rows']
-        
-        if len(rows) == 0:
-            return {
-                'success': True,
-                'data': [],
-                'columns': []
+                'error': motivo or estado,
+                'query_id': query_execution_id
             }
+        print(f"✅ Query completada exitosamente")
         
-        # Primera fila son los headers
-        columns = [col['VarCharValue'] for col in rows[0]['Data']]
+        resultado = _resultados_completos_athena(query_execution_id)
+        print(f"📈 Resultados: {resultado['row_count']} filas")
         
-        # Resto son los datos
-        data = []
-        for row in rows[1:]:
-            row_data = {}
-            for i, col in enumerate(row['Data']):
-                row_data[columns[i]] = col.get('VarCharValue', None)
-            data.append(row_data)
-        
-        print(f"📈 Resultados: {len(data)} filas")
-        
-        return {
-            'success': True,
-            'data': data,
-            'columns': columns,
-            'row_count': len(data)
-        }
+        if usar_cache:
+            cache_athena.guardar(query, resultado)
+        return resultado
         
     except Exception as e:
         print(f"❌ Error ejecutando query: {e}")
@@ -214,21 +315,24 @@ def _ejecutar_query_athena(query: str, descripcion: str = "Consulta"):
         }
 
 
+def _ejecutar_consulta(nombre: str):
+    """Ejecuta una consulta registrada con el motor configurado en ANALITICA_MOTOR."""
+    if ANALITICA_MOTOR == 'local':
+        resultado = motor_local.ejecutar(nombre)
+        if not resultado.get('motor_no_disponible'):
+            return resultado
+        print(f"↩️  Consulta {nombre} se resuelve con Athena")
+    elif ANALITICA_MOTOR == 'rollups':
+        return motor_rollups.ejecutar(nombre)
+    consulta = CONSULTAS[nombre]
+    return _ejecutar_query_athena(consulta['query'], consulta['descripcion'])
+
+
 def analisis_incidentes_por_piso(event, context):
     """
     Lambda 1: Análisis de incidentes por piso y estado
     """
-    query = """
-    SELECT 
-        piso,
-        estado,
-        COUNT(*) as total_incidentes
-    FROM incidentes
-    GROUP BY piso, estado
-    ORDER BY piso, estado
-    """
-    
-    resultado = _ejecutar_query_athena(query, "Incidentes por piso y estado")
+    resultado = _ejecutar_consulta("incidentes-por-piso")
     
     if not resultado['success']:
         return {
@@ -260,18 +364,7 @@ def analisis_incidentes_por_tipo(event, context):
     """
     Lambda 2: Análisis de incidentes por tipo y nivel de urgencia
     """
-    query = """
-    SELECT 
-        tipo,
-        nivel_urgencia,
-        COUNT(*) as cantidad,
-        ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(), 2) as porcentaje
-    FROM incidentes
-    GROUP BY tipo, nivel_urgencia
-    ORDER BY tipo, nivel_urgencia
-    """
-    
-    resultado = _ejecutar_query_athena(query, "Incidentes por tipo y urgencia")
+    resultado = _ejecutar_consulta("incidentes-por-tipo")
     
     if not resultado['success']:
         return {
@@ -303,28 +396,7 @@ def analisis_tiempo_resolucion(event, context):
     """
     Lambda 3: Análisis de tiempo de resolución de incidentes
     """
-    query = """
-    SELECT 
-        incidente_id,
-        titulo,
-        tipo,
-        nivel_urgencia,
-        creado_en,
-        actualizado_en,
-        estado,
-        CASE 
-            WHEN actualizado_en IS NOT NULL AND estado = 'resuelto' 
-            THEN date_diff('hour', 
-                          from_iso8601_timestamp(creado_en), 
-                          from_iso8601_timestamp(actualizado_en))
-            ELSE NULL 
-        END as horas_resolucion
-    FROM incidentes
-    WHERE estado = 'resuelto'
-    ORDER BY horas_resolucion
-    """
-    
-    resultado = _ejecutar_query_athena(query, "Tiempo de resolución")
+    resultado = _ejecutar_consulta("tiempo-resolucion")
     
     if not resultado['success']:
         return {
@@ -356,24 +428,7 @@ def analisis_reportes_por_usuario(event, context):
     """
     Lambda 4: Análisis de reportes por usuario estudiante
     """
-    query = """
-    SELECT 
-        i.usuario_correo,
-        u.nombre,
-        u.rol,
-        COUNT(*) as total_reportes,
-        SUM(CASE WHEN i.estado = 'resuelto' THEN 1 ELSE 0 END) as reportes_resueltos,
-        SUM(CASE WHEN i.estado = 'en_progreso' THEN 1 ELSE 0 END) as reportes_en_progreso,
-        SUM(CASE WHEN i.estado = 'reportado' THEN 1 ELSE 0 END) as reportes_pendientes
-    FROM incidentes i
-    LEFT JOIN usuarios u ON i.usuario_correo = u.correo
-    WHERE u.rol = 'estudiante' OR u.rol IS NULL
-    GROUP BY i.usuario_correo, u.nombre, u.rol
-    ORDER BY total_reportes DESC
-    LIMIT 20
-    """
-    
-    resultado = _ejecutar_query_athena(query, "Reportes por usuario")
+    resultado = _ejecutar_consulta("reportes-por-usuario")
     
     if not resultado['success']:
         return {
@@ -401,6 +456,175 @@ def analisis_reportes_por_usuario(event, context):
     }
 
 
+def _respuesta_json(status_code: int, cuerpo: dict):
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(cuerpo)
+    }
+
+
+def enviar_consulta(event, context):
+    """
+    Modo asíncrono: inicia una consulta registrada y retorna su query_id sin
+    esperar a Athena. Si el resultado ya está en cache se responde directo.
+
+    POST /analitica/consultas  body: {"consulta": "incidentes-por-piso"}
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except (TypeError, ValueError):
+        return _respuesta_json(400, {'error': 'Body JSON inválido'})
+
+    nombre = body.get('consulta')
+    if nombre not in CONSULTAS:
+        return _respuesta_json(400, {
+            'error': f"Consulta desconocida: {nombre}",
+            'consultas_disponibles': sorted(CONSULTAS)
+        })
+
+    if ANALITICA_MOTOR in ('local', 'rollups'):
+        resultado = _ejecutar_consulta(nombre)
+        if not resultado['success']:
+            return _respuesta_json(500, {'error': resultado['error']})
+        return _respuesta_json(200, {
+            'consulta': nombre,
+            'estado': 'SUCCEEDED',
+            'resultados': resultado['data'],
+            'total_filas': resultado['row_count']
+        })
+
+    consulta = CONSULTAS[nombre]
+    cacheado = cache_athena.leer(consulta['query'])
+    if cacheado is not None:
+        print(f"⚡ Resultado desde cache: {consulta['descripcion']}")
+        return _respuesta_json(200, {
+            'consulta': nombre,
+            'estado': 'SUCCEEDED',
+            'resultados': cacheado['data'],
+            'total_filas': cacheado['row_count']
+        })
+
+    try:
+        query_execution_id = _iniciar_query_athena(consulta['query'])
+    except Exception as e:
+        print(f"❌ Error iniciando query: {e}")
+        return _respuesta_json(500, {'error': str(e)})
+
+    print(f"🔍 Query enviada ({nombre}): {query_execution_id}")
+    return _respuesta_json(202, {
+        'consulta': nombre,
+        'query_id': query_execution_id,
+        'estado': 'QUEUED'
+    })
+
+
+def _es_consulta_registrada(query: str):
+    normalizada = ' '.join(query.split())
+    return any(' '.join(c['query'].split()) == normalizada for c in CONSULTAS.values())
+
+
+def _cachear_consulta_asincrona(query_execution_id: str, query: str, primera_pagina: dict = None):
+    """
+    Guarda en cache_athena el resultado de una consulta asíncrona terminada,
+    con la misma clave que el modo síncrono, para que el próximo
+    enviar_consulta de esa consulta no vuelva a ejecutar Athena. Sólo se
+    cachean las consultas registradas en CONSULTAS.
+
+    Si la primera página ya trae todas las filas se guarda tal cual. Si no,
+    la lectura completa se delega a la Lambda CachearConsulta con
+    InvocationType=Event para no alargar la respuesta.
+    """
+    if not _es_consulta_registrada(query) or cache_athena.leer(query) is not None:
+        return
+    try:
+        if primera_pagina is not None:
+            cache_athena.guardar(query, primera_pagina)
+            print(f"💾 Resultado de {query_execution_id} guardado en cache")
+        elif LAMBDA_CACHEAR_CONSULTA:
+            lambda_client.invoke(
+                FunctionName=LAMBDA_CACHEAR_CONSULTA,
+                InvocationType='Event',
+                Payload=json.dumps({'query_id': query_execution_id}).encode('utf-8')
+            )
+        else:
+            print("LAMBDA_CACHEAR_CONSULTA no configurado, no se cachea el resultado.")
+    except Exception as e:
+        print(f"⚠️ No se pudo cachear el resultado de {query_execution_id}: {e}")
+
+
+def cachear_consulta(event, context):
+    """
+    Worker asíncrono (invocado desde resultado_consulta): lee todas las
+    páginas de una consulta terminada y las guarda en cache_athena.
+
+    event: {"query_id": "..."}
+    """
+    query_execution_id = event.get('query_id')
+    estado, _, query = _ejecucion_query_athena(query_execution_id)
+    if estado != 'SUCCEEDED' or not _es_consulta_registrada(query):
+        return {'cacheado': False}
+    if cache_athena.leer(query) is not None:
+        return {'cacheado': False}
+    resultado = _resultados_completos_athena(query_execution_id)
+    cache_athena.guardar(query, resultado)
+    print(f"💾 Resultado de {query_execution_id} guardado en cache ({resultado['row_count']} filas)")
+    return {'cacheado': True, 'filas': resultado['row_count']}
+
+
+def resultado_consulta(event, context):
+    """
+    Modo asíncrono: retorna el estado de una consulta y, si terminó, una
+    página de resultados.
+
+    GET /analitica/consultas/{query_id}?next_token=...&max_results=...
+    """
+    query_execution_id = (event.get('pathParameters') or {}).get('query_id')
+    if not query_execution_id:
+        return _respuesta_json(400, {'error': "Falta 'query_id'"})
+
+    params = event.get('queryStringParameters') or {}
+    next_token = params.get('next_token')
+    try:
+        max_results = max(1, min(int(params.get('max_results') or ATHENA_FILAS_POR_PAGINA), ATHENA_FILAS_POR_PAGINA))
+    except ValueError:
+        return _respuesta_json(400, {'error': "'max_results' debe ser un entero"})
+
+    try:
+        estado, motivo, query = _ejecucion_query_athena(query_execution_id)
+        if estado in ('QUEUED', 'RUNNING'):
+            return _respuesta_json(202, {'query_id': query_execution_id, 'estado': estado})
+        if estado != 'SUCCEEDED':
+            return _respuesta_json(500, {
+                'query_id': query_execution_id,
+                'estado': estado,
+                'error': motivo or estado
+            })
+
+        columns, data, siguiente = _pagina_resultados_athena(query_execution_id, next_token, max_results)
+
+        if not next_token:
+            completa = None
+            if not siguiente:
+                completa = {'success': True, 'data': data, 'columns': columns, 'row_count': len(data)}
+            _cachear_consulta_asincrona(query_execution_id, query, completa)
+    except Exception as e:
+        print(f"❌ Error obteniendo resultados de {query_execution_id}: {e}")
+        return _respuesta_json(500, {'query_id': query_execution_id, 'error': str(e)})
+
+    return _respuesta_json(200, {
+        'query_id': query_execution_id,
+        'estado': estado,
+        'columnas': columns,
+        'resultados': data,
+        'total_filas': len(data),
+        'next_token': siguiente
+    })
+
+
 def trigger_etl_pipeline(event, context):
     """
     Lambda 5: Triggerea el DAG de Airflow directamente via API REST
@@ -0,0 +1,294 @@
+"""
+Motor de analítica en proceso: alternativa a Athena para datasets pequeños
+
+Carga el dataset exportado por el DAG (`analitica-results/{tabla}/`, JSONL o
+Parquet) una vez por contenedor, lo guarda por columnas y resuelve las
+consultas registradas en handler.CONSULTAS con el mismo formato de resultado
+que Athena (valores como texto). Se recarga cuando el DAG publica una versión
+nueva del dataset.
+
+Uso offline:
+    python motor_local.py incidentes.jsonl usuarios.jsonl [consulta]
+"""
+
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+ANALITICA_S3_BUCKET = os.environ.get("ANALITICA_S3_BUCKET", "alerta-utec-analitica")
+S3_PREFIX = "analitica-results"
+TABLAS = ("incidentes", "usuarios")
+SIN_VALOR_PARTICION = "__sin_valor__"
+
+# Cliente S3 creado al cargar el dataset, así el motor se puede usar offline
+_clientes = {}
+
+
+
+class MotorNoDisponible(RuntimeError):
+    """El dataset no se puede leer en este entorno (p. ej. Parquet sin pyarrow)."""
+
+
+# Dataset cargado en el contenedor: {"version": ..., "tablas": {tabla: {columna: [valores]}}}
+_dataset = {"version": None, "tablas": None}
+
+
+def _normalizar_fila(fila):
+    """Mismos nombres de fecha que el dataset de Athena (creado_en/actualizado_en)."""
+    if "creado_en" not in fila and "created_at" in fila:
+        fila["creado_en"] = fila["created_at"]
+    if "actualizado_en" not in fila and "updated_at" in fila:
+        fila["actualizado_en"] = fila["updated_at"]
+    return fila
+
+
+def a_columnas(filas):
+    """Convierte una lista de filas (dicts) en {columna: [valores]}."""
+    columnas = sorted({campo for fila in filas for campo in fila})
+    return {c: [fila.get(c) for fila in filas] for c in columnas}
+
+
+def _filas_jsonl(lineas):
+    for linea in lineas:
+        linea = linea.strip()
+        if linea:
+            yield _normalizar_fila(json.loads(linea))
+
+
+def _filas_parquet(cuerpo, key):
+    try:
+        import pyarrow.parquet as pq
+        import pyarrow as pa
+    except ImportError:
+        # Omitir el archivo daría resultados vacíos como si fueran reales
+        raise MotorNoDisponible(f"pyarrow no está instalado y el dataset es Parquet ({key})")
+
+    filas = pq.read_table(pa.BufferReader(cuerpo)).to_pylist()
+    # Las columnas de partición (salvo fecha, que es derivada) viven en la ruta
+    particion = {}
+    for parte in key.split("/"):
+        if "=" in parte:
+            columna, valor = parte.split("=", 1)
+            if columna != "fecha":
+                particion[columna] = None if valor == SIN_VALOR_PARTICION else valor
+    return [_normalizar_fila({**fila, **particion}) for fila in filas]
+
+
+def _s3():
+    if "s3" not in _clientes:
+        import boto3
+        _clientes["s3"] = boto3.client("s3")
+    return _clientes["s3"]
+
+
+def _cargar_tabla_s3(tabla):
+    s3 = _s3()
+    filas = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for pagina in paginator.paginate(Bucket=ANALITICA_S3_BUCKET, Prefix=f"{S3_PREFIX}/{tabla}/"):
+        for obj in pagina.get("Contents", []):
+            key = obj["Key"]
+            if not key.endswith((".jsonl", ".parquet")):
+                continue
+            cuerpo = s3.get_object(Bucket=ANALITICA_S3_BUCKET, Key=key)["Body"].read()
+            if key.endswith(".parquet"):
+                filas.extend(_filas_parquet(cuerpo, key))
+            else:
+                filas.extend(_filas_jsonl(cuerpo.decode("utf-8").splitlines()))
+    return a_columnas(filas)
+
+
+def tablas_cargadas():
+    """Tablas del dataset actual; se leen de S3 sólo si cambió la versión."""
+    import cache_athena
+
+    version = cache_athena.version_dataset()
+    if _dataset["tablas"] is None or _dataset["version"] != version:
+        inicio = time.time()
+        _dataset["tablas"] = {tabla: _cargar_tabla_s3(tabla) for tabla in TABLAS}
+        _dataset["version"] = version
+        filas = len(next(iter(_dataset["tablas"]["incidentes"].values()), []))
+        print(f"📦 Dataset local cargado (versión {version}): {filas} incidentes en {time.time() - inicio:.2f}s")
+    return _dataset["tablas"]
+
+
+# ----------------------------------------------------------------------
+# Utilidades de columnas
+# ----------------------------------------------------------------------
+
+def _num_filas(tabla):
+    return len(next(iter(tabla.values()), []))
+
+
+def _columna(tabla, nombre):
+    return tabla.get(nombre) or [None] * _num_filas(tabla)
+
+
+def _texto(valor):
+    """Formato de VarCharValue de Athena: todo como texto, nulos como None."""
+    return None if valor is None else str(valor)
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _orden(valor):
+    """Clave de orden con nulos al final, como ORDER BY ... ASC en Athena."""
+    return (valor is None, valor if valor is not None else 0)
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        fecha = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+
+def _agrupar(*columnas):
+    """{tupla de valores: [índices de fila]} para GROUP BY."""
+    grupos = defaultdict(list)
+    for i, clave in enumerate(zip(*columnas)):
+        grupos[clave].append(i)
+    return grupos
+
+
+def _resultado(columnas, filas):
+    data = [{c: _texto(v) for c, v in zip(columnas, fila)} for fila in filas]
+    return {"success": True, "data": data, "columns": list(columnas), "row_count": len(data)}
+
+
+# ----------------------------------------------------------------------
+# Consultas (mismos resultados que las queries de handler.CONSULTAS)
+# ----------------------------------------------------------------------
+
+def incidentes_por_piso(tablas):
+    incidentes = tablas["incidentes"]
+    pisos = [_entero(p) for p in _columna(incidentes, "piso")]
+    grupos = _agrupar(pisos, _columna(incidentes, "estado"))
+    filas = sorted(
+        ((piso, estado, len(indices)) for (piso, estado), indices in grupos.items()),
+        key=lambda f: (_orden(f[0]), _orden(f[1])),
+    )
+    return _resultado(("piso", "estado", "total_incidentes"), filas)
+
+
+def incidentes_por_tipo(tablas):
+    incidentes = tablas["incidentes"]
+    grupos = _agrupar(_columna(incidentes, "tipo"), _columna(incidentes, "nivel_urgencia"))
+    total = _num_filas(incidentes)
+    filas = sorted(
+        (
+            (tipo, nivel, len(indices), round(len(indices) * 100.0 / total, 2))
+            for (tipo, nivel), indices in grupos.items()
+        ),
+        key=lambda f: (_orden(f[0]), _orden(f[1])),
+    )
+    return _resultado(("tipo", "nivel_urgencia", "cantidad", "porcentaje"), filas)
+
+
+def tiempo_resolucion(tablas):
+    incidentes = tablas["incidentes"]
+    columnas = ("incidente_id", "titulo", "tipo", "nivel_urgencia", "creado_en", "actualizado_en", "estado")
+    valores = {c: _columna(incidentes, c) for c in columnas}
+
+    filas = []
+    for i, estado in enumerate(valores["estado"]):
+        if estado != "resuelto":
+            continue
+        horas = None
+        creado, actualizado = _fecha(valores["creado_en"][i]), _fecha(valores["actualizado_en"][i])
+        if creado and actualizado:
+            # date_diff('hour', ...) trunca hacia cero
+            horas = int((actualizado - creado).total_seconds() / 3600)
+        filas.append(tuple(valores[c][i] for c in columnas) + (horas,))
+
+    filas.sort(key=lambda f: _orden(f[-1]))
+    return _resultado(columnas + ("horas_resolucion",), filas)
+
+
+def reportes_por_usuario(tablas, limite=20):
+    incidentes, usuarios = tablas["incidentes"], tablas["usuarios"]
+    por_correo = {
+        correo: (nombre, rol)
+        for correo, nombre, rol in zip(
+            _columna(usuarios, "correo"), _columna(usuarios, "nombre"), _columna(usuarios, "rol")
+        )
+    }
+
+    contadores = defaultdict(lambda: [0, 0, 0, 0])
+    for correo, estado in zip(_columna(incidentes, "usuario_correo"), _columna(incidentes, "estado")):
+        nombre, rol = por_correo.get(correo, (None, None))
+        if rol not in ("estudiante", None):
+            continue
+        contador = contadores[(correo, nombre, rol)]
+        contador[0] += 1
+        if estado == "resuelto":
+            contador[1] += 1
+        elif estado == "en_progreso":
+            contador[2] += 1
+        elif estado == "reportado":
+            contador[3] += 1
+
+    filas = sorted(
+        (clave + tuple(contador) for clave, contador in contadores.items()),
+        key=lambda f: (-f[3], _orden(f[0])),
+    )[:limite]
+    return _resultado(
+        ("usuario_correo", "nombre", "rol", "total_reportes",
+         "reportes_resueltos", "reportes_en_progreso", "reportes_pendientes"),
+        filas,
+    )
+
+
+CONSULTAS_LOCALES = {
+    "incidentes-por-piso": incidentes_por_piso,
+    "incidentes-por-tipo": incidentes_por_tipo,
+    "tiempo-resolucion": tiempo_resolucion,
+    "reportes-por-usuario": reportes_por_usuario,
+}
+
+
+def ejecutar(nombre, tablas=None):
+    """
+    Ejecuta una consulta registrada. Retorna el mismo dict que
+    handler._ejecutar_query_athena ({success, data, columns, row_count}).
+
+    Si el dataset no se puede leer aquí, el error incluye
+    `motor_no_disponible: True` para que el llamador use Athena.
+    """
+    try:
+        inicio = time.time()
+        resultado = CONSULTAS_LOCALES[nombre](tablas or tablas_cargadas())
+        print(f"⚡ Consulta local {nombre}: {resultado['row_count']} filas en {(time.time() - inicio) * 1000:.1f} ms")
+        return resultado
+    except MotorNoDisponible as e:
+        print(f"⚠️ Motor local no disponible para {nombre}: {e}")
+        return {"success": False, "error": str(e), "motor_no_disponible": True}
+    except Exception as e:
+        print(f"❌ Error en consulta local {nombre}: {e}")
+        return {"success": False, "error": str(e)}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Uso: python motor_local.py incidentes.jsonl usuarios.jsonl [consulta]")
+        sys.exit(1)
+
+    tablas = {}
+    for tabla, ruta in zip(TABLAS, sys.argv[1:3]):
+        with open(ruta, encoding="utf-8") as f:
+            tablas[tabla] = a_columnas(list(_filas_jsonl(f)))
+
+    nombres = sys.argv[3:] or list(CONSULTAS_LOCALES)
+    for nombre in nombres:
+        print(json.dumps({nombre: ejecutar(nombre, tablas)}, ensure_ascii=False, indent=2))
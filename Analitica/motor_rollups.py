@@ -0,0 +1,180 @@
+"""
+Motor de analítica sobre los rollups mantenidos desde el stream de incidentes
+
+Incidentes/CRUD/rollups.py actualiza TABLE_ROLLUPS (dimension, clave) con ADD
+atómicos en cada alta o cambio de un incidente; aquí cada consulta es una
+Query por dimensión, así los números están al día sin esperar al DAG.
+"""
+
+import os
+import time
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+TABLE_ROLLUPS = os.environ.get("TABLE_ROLLUPS")
+TABLE_USUARIOS = os.environ.get("TABLE_USUARIOS")
+
+# Mismos límites que HISTOGRAMA_HORAS en Incidentes/CRUD/rollups.py
+HISTOGRAMA_HORAS = (1, 4, 24, 72)
+RANGOS_HISTOGRAMA = [f"h_lt_{h}" for h in HISTOGRAMA_HORAS] + [f"h_ge_{HISTOGRAMA_HORAS[-1]}"]
+
+# BatchGetItem acepta como máximo 100 claves por llamada
+MAX_CLAVES_BATCH_GET = 100
+
+dynamodb = boto3.resource("dynamodb")
+
+
+def _leer_dimension(dimension):
+    """Todos los items de una dimensión como (valores de la clave, item)."""
+    table = dynamodb.Table(TABLE_ROLLUPS)
+    kwargs = {"KeyConditionExpression": Key("dimension").eq(dimension)}
+    filas = []
+    while True:
+        resp = table.query(**kwargs)
+        for item in resp.get("Items", []):
+            if dimension == "usuario":
+                valores = {"usuario_correo": item["clave"]}
+            else:
+                valores = dict(parte.split("=", 1) for parte in item["clave"].split("|"))
+            filas.append((valores, item))
+        if "LastEvaluatedKey" not in resp:
+            return filas
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def _usuarios(correos):
+    """{correo: (nombre, rol)} con BatchGetItem sobre la tabla de usuarios."""
+    encontrados = {}
+    if not TABLE_USUARIOS:
+        return encontrados
+    correos = [c for c in correos if c]
+    for inicio in range(0, len(correos), MAX_CLAVES_BATCH_GET):
+        pendientes = {TABLE_USUARIOS: {
+            "Keys": [{"correo": c} for c in correos[inicio:inicio + MAX_CLAVES_BATCH_GET]],
+            "ProjectionExpression": "correo, nombre, rol",
+        }}
+        while pendientes:
+            resp = dynamodb.batch_get_item(RequestItems=pendientes)
+            for item in resp.get("Responses", {}).get(TABLE_USUARIOS, []):
+                encontrados[item["correo"]] = (item.get("nombre"), item.get("rol"))
+            pendientes = resp.get("UnprocessedKeys") or None
+    return encontrados
+
+
+def _entero(valor):
+    return int(valor or 0)
+
+
+def _texto(valor):
+    """Formato de VarCharValue de Athena: todo como texto, nulos como None."""
+    return None if valor in (None, "") else str(valor)
+
+
+def _orden(valor):
+    return (valor in (None, ""), valor or "")
+
+
+def _resultado(columnas, filas):
+    data = [{c: _texto(v) for c, v in zip(columnas, fila)} for fila in filas]
+    return {"success": True, "data": data, "columns": list(columnas), "row_count": len(data)}
+
+
+def incidentes_por_piso():
+    filas = []
+    for valores, item in _leer_dimension("piso_estado"):
+        total = _entero(item.get("total"))
+        if total > 0:
+            piso = int(valores["piso"]) if valores["piso"].lstrip("-").isdigit() else None
+            filas.append((piso, valores["estado"], total))
+    filas.sort(key=lambda f: ((f[0] is None, f[0] or 0), _orden(f[1])))
+    return _resultado(("piso", "estado", "total_incidentes"), filas)
+
+
+def incidentes_por_tipo():
+    grupos = [
+        (valores["tipo"], valores["nivel_urgencia"], _entero(item.get("total")))
+        for valores, item in _leer_dimension("tipo_nivel")
+    ]
+    grupos = [g for g in grupos if g[2] > 0]
+    total = sum(g[2] for g in grupos)
+    filas = sorted(
+        ((tipo, nivel, n, round(n * 100.0 / total, 2)) for tipo, nivel, n in grupos),
+        key=lambda f: (_orden(f[0]), _orden(f[1])),
+    )
+    return _resultado(("tipo", "nivel_urgencia", "cantidad", "porcentaje"), filas)
+
+
+def tiempo_resolucion():
+    """
+    Agregado por tipo y urgencia (no por incidente, como la query de Athena):
+    resueltos, promedio de horas e histograma de tiempo de resolución.
+    """
+    filas = []
+    for valores, item in _leer_dimension("resolucion"):
+        resueltos = _entero(item.get("resueltos"))
+        if resueltos <= 0:
+            continue
+        promedio = round(_entero(item.get("suma_horas")) / resueltos, 2)
+        filas.append(
+            (valores["tipo"], valores["nivel_urgencia"], resueltos, promedio)
+            + tuple(_entero(item.get(rango)) for rango in RANGOS_HISTOGRAMA)
+        )
+    filas.sort(key=lambda f: (_orden(f[0]), _orden(f[1])))
+    return _resultado(
+        ("tipo", "nivel_urgencia", "incidentes_resueltos", "horas_resolucion_promedio") + tuple(RANGOS_HISTOGRAMA),
+        filas,
+    )
+
+
+def reportes_por_usuario(limite=20):
+    candidatos = [
+        (valores["usuario_correo"], item)
+        for valores, item in _leer_dimension("usuario")
+        if _entero(item.get("total")) > 0
+    ]
+    usuarios = _usuarios([correo for correo, _ in candidatos])
+
+    filas = []
+    for correo, item in candidatos:
+        nombre, rol = usuarios.get(correo, (None, None))
+        if rol not in ("estudiante", None):
+            continue
+        filas.append((
+            correo, nombre, rol,
+            _entero(item.get("total")),
+            _entero(item.get("estado_resuelto")),
+            _entero(item.get("estado_en_progreso")),
+            _entero(item.get("estado_reportado")),
+        ))
+    filas.sort(key=lambda f: (-f[3], f[0]))
+    return _resultado(
+        ("usuario_correo", "nombre", "rol", "total_reportes",
+         "reportes_resueltos", "reportes_en_progreso", "reportes_pendientes"),
+        filas[:limite],
+    )
+
+
+CONSULTAS_ROLLUPS = {
+    "incidentes-por-piso": incidentes_por_piso,
+    "incidentes-por-tipo": incidentes_por_tipo,
+    "tiempo-resolucion": tiempo_resolucion,
+    "reportes-por-usuario": reportes_por_usuario,
+}
+
+
+def ejecutar(nombre):
+    """
+    Ejecuta una consulta registrada sobre los rollups. Retorna el mismo dict
+    que handler._ejecutar_query_athena ({success, data, columns, row_count}).
+    """
+    if not TABLE_ROLLUPS:
+        return {"success": False, "error": "TABLE_ROLLUPS no configurada"}
+    try:
+        inicio = time.time()
+        resultado = CONSULTAS_ROLLUPS[nombre]()
+        print(f"⚡ Consulta sobre rollups {nombre}: {resultado['row_count']} filas en {(time.time() - inicio) * 1000:.1f} ms")
+        return resultado
+    except Exception as e:
+        print(f"❌ Error en consulta sobre rollups {nombre}: {e}")
+        return {"success": False, "error": str(e)}
@@ -8,6 +8,7 @@ from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
 import random as random_module
+from datetime import datetime, timezone
 
 # Cargar variables de entorno
 load_dotenv()
@@ -26,6 +27,8 @@ TABLE_INCIDENTES = os.getenv('TABLE_INCIDENTES')
 TABLE_EMPLEADOS = os.getenv('TABLE_EMPLEADOS')
 TABLE_LOGS = os.getenv('TABLE_LOGS')
 TABLE_CONEXIONES = os.getenv('TABLE_CONEXIONES')
+TABLE_CONTADORES = os.getenv('TABLE_CONTADORES')
+TABLE_ROLLUPS = os.getenv('TABLE_ROLLUPS')
 
 # Nombre del bucket
 S3_BUCKET_NAME = f"alerta-utec-data-{AWS_ACCOUNT_ID}"
@@ -259,6 +262,14 @@ def populate_table(filename, table_config):
         return True
     
     print(f"   📊 Total de items: {len(items)}")
+
+    # Los datos de ejemplo usan creado_en/actualizado_en; los handlers e índices usan created_at/updated_at
+    if table_name == TABLE_INCIDENTES:
+        for item in items:
+            if 'created_at' not in item and 'creado_en' in item:
+                item['created_at'] = item['creado_en']
+            if 'updated_at' not in item and 'actualizado_en' in item:
+                item['updated_at'] = item['actualizado_en']
     
     # Validar que los items tengan las claves requeridas
     if items:
@@ -407,6 +418,213 @@ def create_dynamodb_table(table_name, key_schema, attribute_definitions,
             return False
 
 
+def _gsi_created_at(index_name, partition_key):
+    """Definición de un GSI <partition_key> + created_at con proyección completa"""
+    return {
+        'IndexName': index_name,
+        'KeySchema': [
+            {'AttributeName': partition_key, 'KeyType': 'HASH'},
+            {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+
+
+def ensure_global_secondary_indexes(table_name, attribute_definitions, global_secondary_indexes):
+    """Agrega a una tabla existente los GSI que le falten (uno por vez, como exige DynamoDB)"""
+    try:
+        description = dynamodb_client.describe_table(TableName=table_name)['Table']
+        existentes = {gsi['IndexName'] for gsi in description.get('GlobalSecondaryIndexes', [])}
+
+        for gsi in global_secondary_indexes:
+            if gsi['IndexName'] in existentes:
+                continue
+
+            print(f"   🔨 Agregando índice '{gsi['IndexName']}' a '{table_name}'...")
+            atributos = {key['AttributeName'] for key in gsi['KeySchema']}
+            dynamodb_client.update_table(
+                TableName=table_name,
+                AttributeDefinitions=[
+                    attr for attr in attribute_definitions if attr['AttributeName'] in atributos
+                ],
+                GlobalSecondaryIndexUpdates=[{'Create': gsi}]
+            )
+
+            # Esperar a que el índice termine de construirse antes de crear el siguiente
+            while True:
+                time.sleep(5)
+                description = dynamodb_client.describe_table(TableName=table_name)['Table']
+                estados = {
+                    idx['IndexName']: idx['IndexStatus']
+                    for idx in description.get('GlobalSecondaryIndexes', [])
+                }
+                if estados.get(gsi['IndexName']) == 'ACTIVE':
+                    break
+
+            print(f"   ✅ Índice '{gsi['IndexName']}' activo")
+
+        return True
+    except Exception as e:
+        print(f"   ❌ Error al agregar índices a '{table_name}': {str(e)}")
+        return False
+
+
+def ensure_stream(table_name):
+    """Habilita el stream NEW_AND_OLD_IMAGES en una tabla existente que no lo tenga"""
+    try:
+        description = dynamodb_client.describe_table(TableName=table_name)['Table']
+        if description.get('StreamSpecification', {}).get('StreamEnabled'):
+            return True
+
+        print(f"   🔨 Habilitando stream en '{table_name}'...")
+        dynamodb_client.update_table(
+            TableName=table_name,
+            StreamSpecification={
+                'StreamEnabled': True,
+                'StreamViewType': 'NEW_AND_OLD_IMAGES'
+            }
+        )
+        dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
+        print(f"   ✅ Stream habilitado en '{table_name}'")
+        return True
+    except Exception as e:
+        print(f"   ❌ Error al habilitar stream en '{table_name}': {str(e)}")
+        return False
+
+
+def _claves_contador_incidente(estado, tipo, nivel_urgencia):
+    """Mismas 8 claves (valor real | '*') que Incidentes/CRUD/contadores.py"""
+    claves = []
+    for e in (estado, '*'):
+        for t in (tipo, '*'):
+            for n in (nivel_urgencia, '*'):
+                claves.append(f"incidentes|estado={e}|tipo={t}|nivel_urgencia={n}")
+    return claves
+
+
+def rebuild_counters():
+    """
+    Recalcula desde cero los contadores materializados de incidentes y logs.
+    Las Lambdas de contadores consumen los streams desde LATEST, así que los
+    datos cargados aquí se cuentan con esta reconstrucción.
+    """
+    if not TABLE_CONTADORES:
+        print("\n⚠️  TABLE_CONTADORES no definida, no se recalculan contadores")
+        return True
+
+    print(f"\n🔢 Recalculando contadores en '{TABLE_CONTADORES}'...")
+    try:
+        totales = {}
+        scan_kwargs = {
+            'ProjectionExpression': '#e, tipo, nivel_urgencia',
+            'ExpressionAttributeNames': {'#e': 'estado'}
+        }
+        table = dynamodb.Table(TABLE_INCIDENTES)
+        while True:
+            response = table.scan(**scan_kwargs)
+            for item in response.get('Items', []):
+                for clave in _claves_contador_incidente(
+                    item.get('estado', ''), item.get('tipo', ''), item.get('nivel_urgencia', '')
+                ):
+                    totales[clave] = totales.get(clave, 0) + 1
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        totales.setdefault(_claves_contador_incidente('*', '*', '*')[0], 0)
+
+        total_logs = 0
+        scan_kwargs = {'Select': 'COUNT'}
+        logs = dynamodb.Table(TABLE_LOGS)
+        while True:
+            response = logs.scan(**scan_kwargs)
+            total_logs += response.get('Count', 0)
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        totales['logs|total'] = total_logs
+
+        contadores = dynamodb.Table(TABLE_CONTADORES)
+        delete_all_items_from_table(TABLE_CONTADORES, 'contador_id')
+        with contadores.batch_writer() as batch:
+            for clave, total in totales.items():
+                batch.put_item(Item={'contador_id': clave, 'total': total})
+
+        print(f"   ✅ {len(totales)} contadores escritos")
+        return True
+    except Exception as e:
+        print(f"   ❌ Error al recalcular contadores: {str(e)}")
+        return False
+
+
+def _aportes_rollup_incidente(item):
+    """Mismos rollups (dimension, clave) que Incidentes/CRUD/rollups.py"""
+    piso = str(item.get('piso', ''))
+    estado = item.get('estado', '')
+    tipo = item.get('tipo', '')
+    nivel = item.get('nivel_urgencia', '')
+    aportes = {
+        ('piso_estado', f"piso={piso}|estado={estado}"): {'total': 1},
+        ('tipo_nivel', f"tipo={tipo}|nivel_urgencia={nivel}"): {'total': 1},
+    }
+    if item.get('usuario_correo'):
+        aportes[('usuario', item['usuario_correo'])] = {'total': 1, f"estado_{estado}": 1}
+    if estado == 'resuelto':
+        try:
+            creado = datetime.fromisoformat(str(item.get('created_at') or item.get('creado_en')).replace('Z', '+00:00'))
+            actualizado = datetime.fromisoformat(str(item.get('updated_at') or item.get('actualizado_en')).replace('Z', '+00:00'))
+            if creado.tzinfo is None:
+                creado = creado.replace(tzinfo=timezone.utc)
+            if actualizado.tzinfo is None:
+                actualizado = actualizado.replace(tzinfo=timezone.utc)
+        except ValueError:
+            return aportes
+        horas = max(int((actualizado - creado).total_seconds() // 3600), 0)
+        rango = next((f"h_lt_{h}" for h in (1, 4, 24, 72) if horas < h), "h_ge_72")
+        aportes[('resolucion', f"tipo={tipo}|nivel_urgencia={nivel}")] = {
+            'resueltos': 1, 'suma_horas': horas, rango: 1
+        }
+    return aportes
+
+
+def rebuild_rollups():
+    """
+    Recalcula desde cero los rollups de analítica. Igual que los contadores,
+    el stream se consume desde LATEST y no ve los datos cargados aquí.
+    """
+    if not TABLE_ROLLUPS:
+        print("\n⚠️  TABLE_ROLLUPS no definida, no se recalculan rollups")
+        return True
+
+    print(f"\n📈 Recalculando rollups en '{TABLE_ROLLUPS}'...")
+    try:
+        rollups = {}
+        scan_kwargs = {}
+        table = dynamodb.Table(TABLE_INCIDENTES)
+        while True:
+            response = table.scan(**scan_kwargs)
+            for item in response.get('Items', []):
+                for clave, atributos in _aportes_rollup_incidente(item).items():
+                    acumulado = rollups.setdefault(clave, {})
+                    for atributo, n in atributos.items():
+                        acumulado[atributo] = acumulado.get(atributo, 0) + n
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        tabla_rollups = dynamodb.Table(TABLE_ROLLUPS)
+        delete_all_items_from_table(TABLE_ROLLUPS, 'dimension', 'clave')
+        with tabla_rollups.batch_writer() as batch:
+            for (dimension, clave), atributos in rollups.items():
+                batch.put_item(Item={'dimension': dimension, 'clave': clave, **atributos})
+
+        print(f"   ✅ {len(rollups)} rollups escritos")
+        return True
+    except Exception as e:
+        print(f"   ❌ Error al recalcular rollups: {str(e)}")
+        return False
+
+
 def create_all_resources():
     """Crea todas las tablas DynamoDB y el bucket S3"""
     print("\n" + "=" * 60)
@@ -428,25 +646,35 @@ def create_all_resources():
         return False
     
     # Crear tabla de Incidentes
+    # Los GSI usan created_at (lo escriben los handlers) como sort key para
+    # que list_report / historial_list puedan hacer query en vez de scan.
+    incidentes_attribute_definitions = [
+        {'AttributeName': 'incidente_id', 'AttributeType': 'S'},
+        {'AttributeName': 'created_at', 'AttributeType': 'S'},
+        {'AttributeName': 'estado', 'AttributeType': 'S'},
+        {'AttributeName': 'tipo', 'AttributeType': 'S'},
+        {'AttributeName': 'nivel_urgencia', 'AttributeType': 'S'},
+        {'AttributeName': 'usuario_correo', 'AttributeType': 'S'}
+    ]
+    incidentes_gsis = [
+        _gsi_created_at('EstadoCreatedAtIndex', 'estado'),
+        _gsi_created_at('TipoCreatedAtIndex', 'tipo'),
+        _gsi_created_at('NivelUrgenciaCreatedAtIndex', 'nivel_urgencia'),
+        _gsi_created_at('UsuarioCorreoCreatedAtIndex', 'usuario_correo')
+    ]
     if not create_dynamodb_table(
         table_name=TABLE_INCIDENTES,
         key_schema=[{'AttributeName': 'incidente_id', 'KeyType': 'HASH'}],
-        attribute_definitions=[
-            {'AttributeName': 'incidente_id', 'AttributeType': 'S'},
-            {'AttributeName': 'fecha_reporte', 'AttributeType': 'S'},
-            {'AttributeName': 'estado', 'AttributeType': 'S'}
-        ],
-        global_secondary_indexes=[{
-            'IndexName': 'EstadoIndex',
-            'KeySchema': [
-                {'AttributeName': 'estado', 'KeyType': 'HASH'},
-                {'AttributeName': 'fecha_reporte', 'KeyType': 'RANGE'}
-            ],
-            'Projection': {'ProjectionType': 'ALL'}
-        }],
+        attribute_definitions=incidentes_attribute_definitions,
+        global_secondary_indexes=incidentes_gsis,
         stream_enabled=True
     ):
         return False
+
+    if not ensure_global_secondary_indexes(
+        TABLE_INCIDENTES, incidentes_attribute_definitions, incidentes_gsis
+    ):
+        return False
     
     # Crear tabla de Empleados
     if not create_dynamodb_table(
@@ -475,9 +703,13 @@ def create_all_resources():
             {'AttributeName': 'registro_id', 'AttributeType': 'S'},
             {'AttributeName': 'marca_tiempo', 'AttributeType': 'S'}
         ],
+        stream_enabled=True,
         ttl_attribute='ttl'
     ):
         return False
+
+    if not ensure_stream(TABLE_INCIDENTES) or not ensure_stream(TABLE_LOGS):
+        return False
     
     # Crear tabla de Conexiones
     if not create_dynamodb_table(
@@ -496,6 +728,30 @@ def create_all_resources():
     ):
         return False
     
+    # Crear tabla de Contadores (totales materializados desde los streams)
+    if not create_dynamodb_table(
+        table_name=TABLE_CONTADORES,
+        key_schema=[{'AttributeName': 'contador_id', 'KeyType': 'HASH'}],
+        attribute_definitions=[
+            {'AttributeName': 'contador_id', 'AttributeType': 'S'}
+        ]
+    ):
+        return False
+    
+    # Crear tabla de Rollups de analítica (agregados materializados desde el stream)
+    if TABLE_ROLLUPS and not create_dynamodb_table(
+        table_name=TABLE_ROLLUPS,
+        key_schema=[
+            {'AttributeName': 'dimension', 'KeyType': 'HASH'},
+            {'AttributeName': 'clave', 'KeyType': 'RANGE'}
+        ],
+        attribute_definitions=[
+            {'AttributeName': 'dimension', 'AttributeType': 'S'},
+            {'AttributeName': 'clave', 'AttributeType': 'S'}
+        ]
+    ):
+        return False
+    
     print("\n✅ Todos los recursos creados exitosamente")
     return True
 
@@ -527,6 +783,9 @@ def main():
             results[filename] = success
         time.sleep(1)
 
+    rebuild_counters()
+    rebuild_rollups()
+
     print("\n" + "=" * 60)
     print("📋 RESUMEN")
     print("=" * 60)
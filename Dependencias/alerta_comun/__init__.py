@@ -0,0 +1,7 @@
+"""
+Código compartido por los microservicios de Alerta UTEC.
+
+setup_backend.sh copia este paquete dentro de la Lambda Layer
+(python-dependencies/python/alerta_comun), por lo que los handlers lo
+importan como cualquier otra dependencia: `from alerta_comun.logs import ...`.
+"""
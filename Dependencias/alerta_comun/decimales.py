@@ -0,0 +1,41 @@
+import json
+from decimal import Decimal
+
+
+def json_default(obj):
+    """
+    Hook `default` de json.dumps: serializa Decimal como int/float (y los
+    sets de DynamoDB como listas) durante la misma pasada del encoder, sin
+    construir una copia convertida.
+    """
+    if isinstance(obj, Decimal):
+        if obj == obj.to_integral_value():
+            return int(obj)
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        # String/Number sets de DynamoDB
+        return sorted(obj)
+    raise TypeError(f"Objeto de tipo {type(obj).__name__} no es serializable a JSON")
+
+
+def dumps(obj, **kwargs):
+    """json.dumps con soporte de Decimal y ensure_ascii=False por defecto."""
+    kwargs.setdefault("ensure_ascii", False)
+    return json.dumps(obj, default=json_default, **kwargs)
+
+
+def a_dynamodb(obj):
+    """
+    Convierte recursivamente int/float -> Decimal para escribir en DynamoDB.
+    Deja bool, None, str, Decimal, etc. tal cual.
+    Evita el error 'Float types are not supported'.
+    """
+    if isinstance(obj, dict):
+        return {k: a_dynamodb(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [a_dynamodb(x) for x in obj]
+    if isinstance(obj, bool) or obj is None or isinstance(obj, Decimal):
+        return obj
+    if isinstance(obj, (int, float)):
+        return Decimal(str(obj))
+    return obj
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import uuid
+import functools
+from datetime import datetime, timezone
+
+import boto3
+from botocore.exceptions import ClientError
+
+from alerta_comun.decimales import a_dynamodb
+
+TABLE_LOGS = os.environ.get("TABLE_LOGS")
+
+# BatchWriteItem acepta como máximo 25 escrituras por llamada
+MAX_ITEMS_BATCH = 25
+MAX_REINTENTOS_BATCH = 5
+
+dynamodb = boto3.resource("dynamodb")
+
+
+class BufferLogs:
+    """
+    Acumula los registros de log de una invocación y los persiste juntos
+    con BatchWriteItem (lotes de 25, reintentando los UnprocessedItems con
+    backoff). Cada registro se imprime al momento para CloudWatch.
+    """
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.pendientes = []
+
+    def agregar(self, registro):
+        registro_ddb = a_dynamodb(registro)
+        print("[LOG]", json.dumps(registro_ddb, default=str))
+
+        if not self.table_name:
+            print("[LOG_WARNING] TABLE_LOGS no configurada, no se persiste el log.")
+            return
+        self.pendientes.append(registro_ddb)
+
+    def vaciar(self):
+        """Escribe los registros pendientes. Nunca lanza excepción."""
+        pendientes, self.pendientes = self.pendientes, []
+        for inicio in range(0, len(pendientes), MAX_ITEMS_BATCH):
+            lote = pendientes[inicio:inicio + MAX_ITEMS_BATCH]
+            self._escribir_lote([{"PutRequest": {"Item": item}} for item in lote])
+
+    def _escribir_lote(self, peticiones):
+        request_items = {self.table_name: peticiones}
+        for intento in range(MAX_REINTENTOS_BATCH):
+            try:
+                resp = dynamodb.batch_write_item(RequestItems=request_items)
+            except ClientError as e:
+                print("[LOG_ERROR] Error al guardar logs en DynamoDB:", repr(e))
+                return
+
+            request_items = resp.get("UnprocessedItems") or {}
+            if not request_items:
+                return
+            time.sleep(0.05 * (2 ** intento))
+
+        restantes = sum(len(v) for v in request_items.values())
+        print(f"[LOG_ERROR] {restantes} logs sin persistir tras {MAX_REINTENTOS_BATCH} intentos")
+
+
+buffer_logs = BufferLogs(TABLE_LOGS)
+
+
+def registrar_log_sistema(nivel, mensaje, servicio, contexto=None):
+    """
+    Crea un log de tipo 'sistema' siguiendo el esquema.
+    nivel: INFO | WARNING | ERROR | CRITICAL | AUDIT
+    """
+    if contexto is None:
+        contexto = {}
+
+    registro = {
+        "registro_id": str(uuid.uuid4()),
+        "nivel": nivel,
+        "tipo": "sistema",
+        "marca_tiempo": datetime.now(timezone.utc).isoformat(),
+        "detalles_sistema": {
+            "mensaje": mensaje,
+            "servicio": servicio,
+            "contexto": contexto
+        }
+    }
+
+    buffer_logs.agregar(registro)
+
+
+def registrar_log_auditoria(
+    usuario_correo,
+    entidad,
+    entidad_id,
+    operacion,
+    valores_previos=None,
+    valores_nuevos=None,
+    nivel="AUDIT"
+):
+    """
+    Crea un log de tipo 'auditoria' siguiendo el esquema.
+    operacion: creacion | actualizacion | eliminacion | consulta
+    """
+    if valores_previos is None:
+        valores_previos = {}
+    if valores_nuevos is None:
+        valores_nuevos = {}
+
+    registro = {
+        "registro_id": str(uuid.uuid4()),
+        "nivel": nivel,
+        "tipo": "auditoria",
+        "marca_tiempo": datetime.now(timezone.utc).isoformat(),
+        "detalles_auditoria": {
+            "usuario_correo": usuario_correo,
+            "entidad": entidad,
+            "entidad_id": entidad_id,
+            "operacion": operacion,
+            "valores_previos": valores_previos,
+            "valores_nuevos": valores_nuevos,
+        }
+    }
+
+    buffer_logs.agregar(registro)
+
+
+def con_logs(handler):
+    """
+    Decorador para lambda_handler: persiste en un solo paso los logs
+    acumulados durante la invocación, retorne o lance excepción.
+    """
+    @functools.wraps(handler)
+    def envoltura(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            buffer_logs.vaciar()
+    return envoltura
@@ -0,0 +1,51 @@
+from alerta_comun.decimales import dumps
+
+CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+
+
+def responder(codigo, cuerpo, headers=None):
+    """
+    Respuesta HTTP para API Gateway con CORS. Los Decimal de DynamoDB se
+    serializan directamente en json.dumps (ver decimales.json_default).
+    """
+    return {
+        "statusCode": codigo,
+        "headers": headers or CORS_HEADERS,
+        "body": dumps(cuerpo),
+    }
+
+
+def safe_int(valor, default):
+    try:
+        return int(valor)
+    except Exception:
+        return default
+
+
+def extraer_token(event):
+    """Token del header Authorization, con o sin el prefijo 'Bearer '."""
+    headers = event.get("headers") or {}
+    auth_header = headers.get("Authorization") or headers.get("authorization") or ""
+    if auth_header.lower().startswith("bearer "):
+        auth_header = auth_header.split(" ", 1)[1].strip()
+    return auth_header
+
+
+def autenticar(event, validar_token):
+    """
+    Usuario autenticado de la request, con el mismo formato que validar_token.
+
+    Si el API Gateway Authorizer ya validó el token, se usa su contexto
+    (API Gateway lo cachea por token durante resultTtlInSeconds) sin decodificar
+    el JWT aquí; si no hay authorizer (invocación directa o local) se valida
+    el token del header con `validar_token`.
+    """
+    authorizer = (event.get("requestContext") or {}).get("authorizer") or {}
+    if authorizer.get("correo"):
+        return {
+            "valido": True,
+            "correo": authorizer.get("correo"),
+            "rol": authorizer.get("rol"),
+            "nombre": authorizer.get("nombre", ""),
+        }
+    return validar_token(extraer_token(event))
@@ -0,0 +1,60 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Cache de claims ya verificados, por contenedor. Un token repetido (p. ej. un
+# dashboard que consulta los listados cada pocos segundos) se resuelve sin
+# volver a verificar la firma ni decodificar el JSON.
+JWT_CACHE_MAX = int(os.getenv("JWT_CACHE_MAX", "1024"))
+JWT_CACHE_TTL_SECONDS = int(os.getenv("JWT_CACHE_TTL_SECONDS", "300"))
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _clave(token, secret, algoritmo):
+    texto = f"{algoritmo}\n{secret or ''}\n{token}"
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def decodificar_token(token, secret, algoritmo="HS256"):
+    """
+    Igual que jwt.decode(token, secret, algorithms=[algoritmo]) pero con cache
+    LRU de los claims verificados.
+
+    Cada entrada vence a los JWT_CACHE_TTL_SECONDS o en el `exp` del token, lo
+    que ocurra primero, así un token expirado nunca se acepta desde la cache.
+    Los tokens inválidos no se cachean: se propagan las excepciones de jwt.
+
+    Returns:
+        dict: copia de los claims del token
+    """
+    clave = _clave(token, secret, algoritmo)
+    ahora = time.time()
+
+    with _lock:
+        entrada = _cache.get(clave)
+        if entrada:
+            if entrada[0] > ahora:
+                _cache.move_to_end(clave)
+                return dict(entrada[1])
+            del _cache[clave]
+
+    import jwt
+
+    payload = jwt.decode(token, secret, algorithms=[algoritmo])
+
+    expira_en = ahora + JWT_CACHE_TTL_SECONDS
+    if isinstance(payload.get("exp"), (int, float)):
+        expira_en = min(expira_en, payload["exp"])
+
+    if JWT_CACHE_MAX > 0:
+        with _lock:
+            _cache[clave] = (expira_en, payload)
+            _cache.move_to_end(clave)
+            while len(_cache) > JWT_CACHE_MAX:
+                _cache.popitem(last=False)
+
+    return dict(payload)
@@ -0,0 +1,193 @@
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+# Índices GSI de la tabla de incidentes, en orden de preferencia (más selectivo primero).
+# Todos usan created_at como sort key para devolver los incidentes más recientes primero.
+INDICES_INCIDENTES = [
+    ("usuario_correo", "UsuarioCorreoCreatedAtIndex"),
+    ("tipo", "TipoCreatedAtIndex"),
+    ("nivel_urgencia", "NivelUrgenciaCreatedAtIndex"),
+    ("estado", "EstadoCreatedAtIndex"),
+]
+
+# Índices que DynamoDB reportó como inexistentes en este contenedor
+_indices_no_disponibles = set()
+
+
+class CursorExpirado(Exception):
+    """
+    El índice del plan dejó de estar disponible a mitad de una lectura
+    paginada: la clave de inicio ya no sirve para el plan alternativo.
+    """
+
+
+def _filtro(filtros):
+    filter_expr = None
+    for atributo, valor in filtros.items():
+        cond = Attr(atributo).eq(valor)
+        filter_expr = cond if filter_expr is None else (filter_expr & cond)
+    return filter_expr
+
+
+def planificar_consulta(filtros):
+    """
+    Elige cómo leer incidentes según los filtros recibidos.
+
+    Si algún filtro tiene un GSI disponible se usa table.query sobre ese
+    índice (el costo crece con el resultado, no con la tabla) y el resto de
+    filtros va como FilterExpression. Sin filtros indexables se hace scan.
+
+    Returns:
+        dict: {
+            "operacion": "query" | "scan",
+            "indice": str | None,
+            "kwargs": dict (argumentos para table.query / table.scan)
+        }
+    """
+    activos = {k: v for k, v in filtros.items() if v}
+
+    for atributo, indice in INDICES_INCIDENTES:
+        if atributo not in activos or indice in _indices_no_disponibles:
+            continue
+
+        resto = {k: v for k, v in activos.items() if k != atributo}
+        kwargs = {
+            "IndexName": indice,
+            "KeyConditionExpression": Key(atributo).eq(activos[atributo]),
+            "ScanIndexForward": False,
+        }
+        filter_expr = _filtro(resto)
+        if filter_expr is not None:
+            kwargs["FilterExpression"] = filter_expr
+        return {"operacion": "query", "indice": indice, "kwargs": kwargs, "filtros": activos}
+
+    kwargs = {}
+    filter_expr = _filtro(activos)
+    if filter_expr is not None:
+        kwargs["FilterExpression"] = filter_expr
+    return {"operacion": "scan", "indice": None, "kwargs": kwargs, "filtros": activos}
+
+
+def ejecutar_consulta(table, plan, **extra):
+    """
+    Ejecuta el plan (query o scan) con argumentos adicionales como Limit,
+    Select o ExclusiveStartKey.
+
+    Si el índice elegido no existe en la tabla (p. ej. una tabla creada antes
+    de agregar los GSI) se marca como no disponible y el plan se reemplaza
+    en sitio por el siguiente, terminando en scan. Si la lectura traía
+    ExclusiveStartKey no se puede continuar con el plan nuevo (la clave es
+    del índice anterior): se lanza CursorExpirado en lugar de reiniciar la
+    lectura en silencio desde la primera página.
+    """
+    try:
+        if plan["operacion"] == "query":
+            return table.query(**plan["kwargs"], **extra)
+        return table.scan(**plan["kwargs"], **extra)
+    except ClientError as e:
+        error = e.response.get("Error", {})
+        if (
+            plan["operacion"] == "query"
+            and error.get("Code") == "ValidationException"
+            and "index" in error.get("Message", "").lower()
+        ):
+            print(f"[CONSULTAS] Índice {plan['indice']} no disponible, usando plan alternativo")
+            indice = plan["indice"]
+            _indices_no_disponibles.add(indice)
+            plan.update(planificar_consulta(plan["filtros"]))
+            if "ExclusiveStartKey" in extra:
+                raise CursorExpirado(f"El índice {indice} ya no está disponible") from e
+            return ejecutar_consulta(table, plan, **extra)
+        raise
+
+
+def leer_pagina(table, plan, size, exclusive_start_key=None):
+    """
+    Lee hasta `size` items a partir de `exclusive_start_key` (modo keyset).
+    Sin filtros extra es una sola lectura; con FilterExpression se repite
+    sólo lo necesario para completar la página.
+
+    Returns:
+        tuple: (items, last_evaluated_key)
+
+    Raises:
+        CursorExpirado: si se pidió continuar un cursor y el índice del plan
+            dejó de existir
+    """
+    try:
+        return _leer_pagina(table, plan, size, exclusive_start_key)
+    except CursorExpirado:
+        if exclusive_start_key:
+            raise
+        # La primera página se puede volver a leer entera con el plan nuevo
+        return _leer_pagina(table, plan, size, None)
+
+
+def _leer_pagina(table, plan, size, exclusive_start_key):
+    items = []
+    kwargs = {}
+    lek = exclusive_start_key
+    while True:
+        kwargs["Limit"] = size - len(items)
+        if lek:
+            kwargs["ExclusiveStartKey"] = lek
+        resp = ejecutar_consulta(table, plan, **kwargs)
+        items.extend(resp.get("Items", []))
+        lek = resp.get("LastEvaluatedKey")
+        if not lek or len(items) >= size:
+            return items, lek
+
+
+def leer_ventana(table, plan, inicio, fin, max_por_lectura=1000):
+    """
+    Devuelve los items en las posiciones [inicio, fin) del resultado sin
+    cargar el resto en memoria: se deja de leer en cuanto se vieron `fin`
+    items y sólo se conservan los de la ventana.
+    """
+    try:
+        return _leer_ventana(table, plan, inicio, fin, max_por_lectura)
+    except CursorExpirado:
+        # El plan ya se reemplazó: la ventana se cuenta de nuevo desde el inicio
+        return _leer_ventana(table, plan, inicio, fin, max_por_lectura)
+
+
+def _leer_ventana(table, plan, inicio, fin, max_por_lectura):
+    ventana = []
+    vistos = 0
+    kwargs = {}
+    lek = None
+    while vistos < fin:
+        kwargs["Limit"] = min(fin - vistos, max_por_lectura)
+        if lek:
+            kwargs["ExclusiveStartKey"] = lek
+        resp = ejecutar_consulta(table, plan, **kwargs)
+        for item in resp.get("Items", []):
+            if inicio <= vistos < fin:
+                ventana.append(item)
+            vistos += 1
+        lek = resp.get("LastEvaluatedKey")
+        if not lek:
+            break
+    return ventana
+
+
+def contar(table, plan):
+    """Cuenta los items del plan con Select=COUNT (no trae items a memoria)."""
+    try:
+        return _contar(table, plan)
+    except CursorExpirado:
+        return _contar(table, plan)
+
+
+def _contar(table, plan):
+    total = 0
+    kwargs = {"Select": "COUNT"}
+    lek = None
+    while True:
+        if lek:
+            kwargs["ExclusiveStartKey"] = lek
+        resp = ejecutar_consulta(table, plan, **kwargs)
+        total += resp.get("Count", 0)
+        lek = resp.get("LastEvaluatedKey")
+        if not lek:
+            return total
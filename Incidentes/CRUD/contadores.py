@@ -0,0 +1,83 @@
+import os
+import hashlib
+from itertools import product
+
+import boto3
+
+TABLE_CONTADORES = os.environ.get("TABLE_CONTADORES")
+
+# Dimensiones contadas. Cada incidente suma en las 8 combinaciones de
+# (valor real | "*") de estas dimensiones, así cualquier filtro de
+# list_report se responde con un solo GetItem.
+DIMENSIONES = ("estado", "tipo", "nivel_urgencia")
+COMODIN = "*"
+
+# TransactWriteItems acepta como máximo 100 acciones por llamada
+MAX_ACCIONES_TRANSACCION = 100
+
+dynamodb = boto3.resource("dynamodb")
+dynamodb_client = boto3.client("dynamodb")
+contadores_table = dynamodb.Table(TABLE_CONTADORES) if TABLE_CONTADORES else None
+
+
+def clave_contador(estado=None, tipo=None, nivel_urgencia=None):
+    """
+    Clave del contador para una combinación de filtros. Los filtros vacíos
+    se representan con "*"; sin filtros es el contador global.
+    """
+    valores = {"estado": estado, "tipo": tipo, "nivel_urgencia": nivel_urgencia}
+    partes = [f"{dim}={valores[dim] or COMODIN}" for dim in DIMENSIONES]
+    return "incidentes|" + "|".join(partes)
+
+
+def claves_de_incidente(valores):
+    """Las 8 claves de contador en las que suma un incidente con estos valores."""
+    opciones = [(valores.get(dim) or "", COMODIN) for dim in DIMENSIONES]
+    return [
+        clave_contador(**dict(zip(DIMENSIONES, combinacion)))
+        for combinacion in product(*opciones)
+    ]
+
+
+def leer_contador(clave):
+    """
+    Lee un contador (una sola lectura consistente). Retorna None si la
+    tabla de contadores no está configurada o el contador aún no existe
+    (el stream arranca en LATEST y DataPoblator.rebuild_counters no se
+    ejecutó), para que el llamador use su conteo alternativo.
+    """
+    if not contadores_table:
+        return None
+    resp = contadores_table.get_item(Key={"contador_id": clave}, ConsistentRead=True)
+    item = resp.get("Item")
+    return int(item.get("total", 0)) if item else None
+
+
+def aplicar_deltas(deltas, token_base):
+    """
+    Aplica {clave: delta} con ADD atómicos en TransactWriteItems.
+
+    `token_base` (derivado de los números de secuencia del stream) se usa
+    como ClientRequestToken, de modo que un reintento del mismo lote no
+    vuelve a sumar.
+    """
+    acciones = [
+        {
+            "Update": {
+                "TableName": TABLE_CONTADORES,
+                "Key": {"contador_id": {"S": clave}},
+                "UpdateExpression": "ADD #total :delta",
+                "ExpressionAttributeNames": {"#total": "total"},
+                "ExpressionAttributeValues": {":delta": {"N": str(delta)}},
+            }
+        }
+        for clave, delta in sorted(deltas.items())
+        if delta
+    ]
+
+    for inicio in range(0, len(acciones), MAX_ACCIONES_TRANSACCION):
+        lote = acciones[inicio:inicio + MAX_ACCIONES_TRANSACCION]
+        token = hashlib.sha256(f"{token_base}:{inicio}".encode("utf-8")).hexdigest()[:36]
+        dynamodb_client.transact_write_items(TransactItems=lote, ClientRequestToken=token)
+
+    return len(acciones)
@@ -1,219 +1,61 @@
 import os
 import json
 import uuid
-import base64
 import boto3
 from datetime import datetime, timezone
 from CRUD.utils import validar_token
+from CRUD.evidencias import decodificar_evidencias, subir_evidencias
+from alerta_comun.respuestas import autenticar
+from alerta_comun.decimales import a_dynamodb, json_default
 from botocore.exceptions import ClientError
 from decimal import Decimal, InvalidOperation
-import requests  # NUEVO
+from alerta_comun.logs import registrar_log_sistema, con_logs
 
 dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client('s3')
 CORS_HEADERS = { "Access-Control-Allow-Origin": "*" }
 
 table_name = os.environ.get('TABLE_INCIDENTES')
 incidentes_table = dynamodb.Table(table_name)
 INCIDENTES_BUCKET = os.environ.get('INCIDENTES_BUCKET')
 
-logs_table_name = os.environ.get('TABLE_LOGS')
-logs_table = dynamodb.Table(logs_table_name) if logs_table_name else None
-
-BREVO_API_KEY = os.environ.get("BREVO_API_KEY")
-EMAIL_FROM = os.environ.get("EMAIL_FROM", "no-reply@example.com")
-
 TIPO_ENUM = ["limpieza", "TI" ,"seguridad", "mantenimiento", "otro"]
 NIVEL_URGENCIA_ENUM = ["bajo", "medio", "alto", "critico"]
 ESTADO_ENUM = ["reportado", "en_progreso", "resuelto"]
 PISO_RANGO = range(-2, 12)
 
 lambda_client = boto3.client("lambda")
-LAMBDA_NOTIFY_INCIDENTE = os.environ.get("LAMBDA_NOTIFY_INCIDENTE")
-
-def _notificar_incidente_ws(tipo, titulo, mensaje, incidente_id, destinatarios=None):
-    """
-    Invoca la Lambda de notificaciones por WebSocket (NotifyIncidente).
-    """
-    if not LAMBDA_NOTIFY_INCIDENTE:
-        print("LAMBDA_NOTIFY_INCIDENTE no configurado, no se envía notificación WS.")
-        return
-
-    payload = {
-        "tipo": tipo,
-        "titulo": titulo,
-        "mensaje": mensaje,
-        "incidente_id": incidente_id,
-    }
-
-    if destinatarios:
-        payload["destinatarios"] = destinatarios
-
-    try:
-        lambda_client.invoke(
-            FunctionName=LAMBDA_NOTIFY_INCIDENTE,
-            InvocationType="Event",
-            Payload=json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        )
-        print("Notificación WS disparada (crear incidente):", payload)
-    except Exception as e:
-        print("Error al invocar NotifyIncidente desde crear_incidencia:", repr(e))
-
-
-def _to_dynamodb_numbers(obj):
-    """
-    Convierte recursivamente int/float -> Decimal.
-    Deja bool, None, str, Decimal, etc. tal cual.
-    Evita el error 'Float types are not supported'.
-    """
-    if isinstance(obj, dict):
-        return {k: _to_dynamodb_numbers(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_to_dynamodb_numbers(x) for x in obj]
-    if isinstance(obj, bool) or obj is None:
-        return obj
-    if isinstance(obj, Decimal):
-        return obj
-    if isinstance(obj, (int, float)):
-        return Decimal(str(obj))
-    return obj
-
-
-def _guardar_log_en_dynamodb(registro):
-    """
-    Guarda el registro en la tabla de logs y lo imprime para CloudWatch.
-    Respeta el esquema de logs.
-    """
-    if not logs_table:
-        print("[LOG_WARNING] TABLE_LOGS no configurada, no se persiste el log.")
-        print("[LOG]", json.dumps(registro, default=str))
-        return
+LAMBDA_EFECTOS_INCIDENTE = os.environ.get("LAMBDA_EFECTOS_INCIDENTE")
 
-    registro_ddb = _to_dynamodb_numbers(registro)
 
-    print("[LOG]", json.dumps(registro_ddb, default=str))
-
-    try:
-        logs_table.put_item(Item=registro_ddb)
-    except ClientError as e:
-        print("[LOG_ERROR] Error al guardar log en DynamoDB:", repr(e))
-
-
-def registrar_log_sistema(nivel, mensaje, servicio, contexto=None):
-    """
-    Crea un log de tipo 'sistema' siguiendo el esquema.
-    nivel: INFO | WARNING | ERROR | CRITICAL | AUDIT
-    """
-    if contexto is None:
-        contexto = {}
-
-    registro = {
-        "registro_id": str(uuid.uuid4()),
-        "nivel": nivel,
-        "tipo": "sistema",
-        "marca_tiempo": datetime.now(timezone.utc).isoformat(),
-        "detalles_sistema": {
-            "mensaje": mensaje,
-            "servicio": servicio,
-            "contexto": contexto
-        }
-    }
-
-    _guardar_log_en_dynamodb(registro)
-
-
-def registrar_log_auditoria(
-    usuario_correo,
-    entidad,
-    entidad_id,
-    operacion,
-    valores_previos=None,
-    valores_nuevos=None,
-    nivel="AUDIT"
-):
+def _encolar_efectos(evento):
     """
-    Crea un log de tipo 'auditoria' siguiendo el esquema.
-    operacion: creacion | actualizacion | eliminacion | consulta
-    """
-    if valores_previos is None:
-        valores_previos = {}
-    if valores_nuevos is None:
-        valores_nuevos = {}
-
-    registro = {
-        "registro_id": str(uuid.uuid4()),
-        "nivel": nivel,
-        "tipo": "auditoria",
-        "marca_tiempo": datetime.now(timezone.utc).isoformat(),
-        "detalles_auditoria": {
-            "usuario_correo": usuario_correo,
-            "entidad": entidad,
-            "entidad_id": entidad_id,
-            "operacion": operacion,
-            "valores_previos": valores_previos,
-            "valores_nuevos": valores_nuevos,
-        }
-    }
-
-    _guardar_log_en_dynamodb(registro)
+    Dispara los efectos secundarios (auditoría, logs, correo, notificación WS)
+    en la Lambda ProcesarEfectosIncidente con InvocationType=Event, de modo
+    que la respuesta no espera al proveedor de correo.
 
-
-def enviar_correo_incidencia(correo_destino, nombre, incidente):
-    """
-    Envía un correo al usuario indicando que su incidencia fue registrada.
-    No rompe la Lambda si falla el envío.
+    Si la invocación asíncrona no es posible se ejecutan aquí mismo para no
+    perder los efectos.
     """
-    if not BREVO_API_KEY or not EMAIL_FROM:
-        print("Brevo no configurado (falta BREVO_API_KEY o EMAIL_FROM)")
-        return
+    payload = json.dumps(evento, ensure_ascii=False, default=json_default).encode("utf-8")
 
-    asunto = "Hemos recibido tu incidencia - Alerta UTEC"
-
-    if nombre:
-        saludo = f"Hola <strong>{nombre}</strong>,"
+    if LAMBDA_EFECTOS_INCIDENTE:
+        try:
+            lambda_client.invoke(
+                FunctionName=LAMBDA_EFECTOS_INCIDENTE,
+                InvocationType="Event",
+                Payload=payload
+            )
+            return
+        except Exception as e:
+            print("Error al invocar ProcesarEfectosIncidente, se ejecutan en línea:", repr(e))
     else:
-        saludo = "Hola,"
-
-    html = f"""
-        <p>{saludo}</p>
-        <p>Hemos recibido correctamente tu incidencia en la aplicación <strong>Alerta UTEC</strong> ✅.</p>
-        <p>En los próximos momentos nuestro equipo revisará el caso y comenzará a atenderlo.</p>
-        <p><strong>Resumen de la incidencia:</strong></p>
-        <ul>
-            <li><strong>Título:</strong> {incidente.get("titulo")}</li>
-            <li><strong>Tipo:</strong> {incidente.get("tipo")}</li>
-            <li><strong>Nivel de urgencia:</strong> {incidente.get("nivel_urgencia")}</li>
-            <li><strong>Código de seguimiento:</strong> {incidente.get("incidente_id")}</li>
-        </ul>
-        <p>Gracias por ayudarnos a mantener UTEC segura y en buen estado. 🏫</p>
-        <p><em>Por favor, no respondas a este correo. Ha sido generado automáticamente.</em></p>
-    """
+        print("LAMBDA_EFECTOS_INCIDENTE no configurado, se ejecutan los efectos en línea.")
 
-    url = "https://api.brevo.com/v3/smtp/email"
-    payload = {
-        "sender": {"email": EMAIL_FROM},
-        "to": [{"email": correo_destino}],
-        "subject": asunto,
-        "htmlContent": html,
-    }
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "api-key": BREVO_API_KEY,
-    }
-
-    try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=10)
-        print(
-            "Correo de incidencia enviado. Status:",
-            resp.status_code,
-            "Body:",
-            resp.text,
-        )
-    except Exception as e:
-        print("Error al enviar correo de incidencia:", repr(e))
+    from CRUD.efectos_incidente import procesar_evento
+    procesar_evento(json.loads(payload))
 
 
+@con_logs
 def lambda_handler(event, context):
     registrar_log_sistema(
         nivel="INFO",
@@ -222,13 +64,7 @@ def lambda_handler(event, context):
         contexto={"request_id": getattr(context, "aws_request_id", None)}
     )
 
-    headers = event.get("headers") or {}
-    auth_header = headers.get("Authorization") or headers.get("authorization") or ""
-    if auth_header.lower().startswith("bearer "):
-        auth_header = auth_header.split(" ", 1)[1].strip()
-    token = auth_header
-    
-    resultado_validacion = validar_token(token)
+    resultado_validacion = autenticar(event, validar_token)
     
     if not resultado_validacion.get("valido"):
         registrar_log_sistema(
@@ -343,33 +179,16 @@ def lambda_handler(event, context):
     incidente_id = str(uuid.uuid4())
     created_at = datetime.now(timezone.utc).isoformat()
     
-    evidencia_url = None
+    evidencias_urls = []
     
     if 'evidencias' in body and body['evidencias'] is not None:
-        image_data = body['evidencias']
-        
-        if not isinstance(image_data, dict):
-            return {
-                "statusCode": 400,
-                "headers": CORS_HEADERS,
-                "body": json.dumps({"message": "'evidencias' debe ser un objeto con 'file_base64'"})
-            }
-        
-        file_b64 = image_data.get("file_base64")
-        if not file_b64:
-            return {
-                "statusCode": 400,
-                "headers": CORS_HEADERS,
-                "body": json.dumps({"message": "'file_base64' es requerido en 'evidencias'"})
-            }
-        
         try:
-            file_bytes = base64.b64decode(file_b64)
-        except Exception as e:
+            archivos = decodificar_evidencias(body['evidencias'])
+        except ValueError as e:
             return {
                 "statusCode": 400,
                 "headers": CORS_HEADERS,
-                "body": json.dumps({"message": f"file_base64 inválido: {e}"})
+                "body": json.dumps({"message": str(e)})
             }
         
         if not INCIDENTES_BUCKET:
@@ -379,17 +198,8 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "INCIDENTES_BUCKET no configurado"})
             }
         
-        key = f"evidencia_{incidente_id}"
-        content_type = "image/png"
-        
         try:
-            s3.put_object(
-                Bucket=INCIDENTES_BUCKET,
-                Key=key,
-                Body=file_bytes,
-                ContentType=content_type
-            )
-            evidencia_url = f"s3://{INCIDENTES_BUCKET}/{key}"
+            evidencias_urls = subir_evidencias(incidente_id, archivos)
         except ClientError as e:
             code = e.response.get("Error", {}).get("Code")
             if code == "AccessDenied":
@@ -424,11 +234,12 @@ def lambda_handler(event, context):
         "ubicacion": body["ubicacion"],
         "tipo": body["tipo"],
         "nivel_urgencia": body["nivel_urgencia"],
-        "evidencias": [evidencia_url] if evidencia_url else [],
+        "evidencias": evidencias_urls,
         "estado": "reportado",
         "usuario_correo": usuario_autenticado["correo"],
         "created_at": created_at,
-        "updated_at": created_at
+        "updated_at": created_at,
+        "version": 1
     }
 
     if coordenadas is not None:
@@ -437,49 +248,19 @@ def lambda_handler(event, context):
             "lng": lng
         }
 
-    incidente_ddb = _to_dynamodb_numbers(incidente)
+    incidente_ddb = a_dynamodb(incidente)
     
     try:
         incidentes_table.put_item(Item=incidente_ddb)
 
-        registrar_log_auditoria(
-            usuario_correo=usuario_autenticado["correo"],
-            entidad="incidente",
-            entidad_id=incidente_id,
-            operacion="creacion",
-            valores_previos={},
-            valores_nuevos=incidente
-        )
-
-        registrar_log_sistema(
-            nivel="INFO",
-            mensaje="Incidente creado correctamente",
-            servicio="crear_incidencia",
-            contexto={
-                "incidente_id": incidente_id,
-                "usuario_correo": usuario_autenticado["correo"],
-                "tipo": body["tipo"],
-                "nivel_urgencia": body["nivel_urgencia"]
+        _encolar_efectos({
+            "evento": "incidente_creado",
+            "incidente": incidente,
+            "usuario": {
+                "correo": usuario_autenticado["correo"],
+                "nombre": usuario_autenticado.get("nombre")
             }
-        )
-
-        enviar_correo_incidencia(
-            correo_destino=usuario_autenticado["correo"],
-            nombre=usuario_autenticado.get("nombre"),
-            incidente=incidente
-        )
-
-        mensaje_notif = (
-            f"Se creó el incidente {incidente_id} en el piso {piso_val} "
-            f"con urgencia '{body['nivel_urgencia']}'."
-        )
-
-        _notificar_incidente_ws(
-            tipo="incidente_creado",
-            titulo="Nuevo incidente reportado",
-            mensaje=mensaje_notif,
-            incidente_id=incidente_id,
-        )
+        })
 
         return {
             "statusCode": 201,
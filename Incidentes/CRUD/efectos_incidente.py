@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import boto3
+import requests
+from alerta_comun.logs import registrar_log_sistema, registrar_log_auditoria, con_logs
+
+BREVO_API_KEY = os.environ.get("BREVO_API_KEY")
+EMAIL_FROM = os.environ.get("EMAIL_FROM", "no-reply@example.com")
+
+lambda_client = boto3.client("lambda")
+LAMBDA_NOTIFY_INCIDENTE = os.environ.get("LAMBDA_NOTIFY_INCIDENTE")
+
+
+def enviar_correo_incidencia(correo_destino, nombre, incidente):
+    """
+    Envía un correo al usuario indicando que su incidencia fue registrada.
+    No rompe la Lambda si falla el envío.
+    """
+    if not BREVO_API_KEY or not EMAIL_FROM:
+        print("Brevo no configurado (falta BREVO_API_KEY o EMAIL_FROM)")
+        return
+
+    asunto = "Hemos recibido tu incidencia - Alerta UTEC"
+
+    if nombre:
+        saludo = f"Hola <strong>{nombre}</strong>,"
+    else:
+        saludo = "Hola,"
+
+    html = f"""
+        <p>{saludo}</p>
+        <p>Hemos recibido correctamente tu incidencia en la aplicación <strong>Alerta UTEC</strong> ✅.</p>
+        <p>En los próximos momentos nuestro equipo revisará el caso y comenzará a atenderlo.</p>
+        <p><strong>Resumen de la incidencia:</strong></p>
+        <ul>
+            <li><strong>Título:</strong> {incidente.get("titulo")}</li>
+            <li><strong>Tipo:</strong> {incidente.get("tipo")}</li>
+            <li><strong>Nivel de urgencia:</strong> {incidente.get("nivel_urgencia")}</li>
+            <li><strong>Código de seguimiento:</strong> {incidente.get("incidente_id")}</li>
+        </ul>
+        <p>Gracias por ayudarnos a mantener UTEC segura y en buen estado. 🏫</p>
+        <p><em>Por favor, no respondas a este correo. Ha sido generado automáticamente.</em></p>
+    """
+
+    url = "https://api.brevo.com/v3/smtp/email"
+    payload = {
+        "sender": {"email": EMAIL_FROM},
+        "to": [{"email": correo_destino}],
+        "subject": asunto,
+        "htmlContent": html,
+    }
+    headers = {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "api-key": BREVO_API_KEY,
+    }
+
+    try:
+        resp = requests.post(url, json=payload, headers=headers, timeout=10)
+        print(
+            "Correo de incidencia enviado. Status:",
+            resp.status_code,
+            "Body:",
+            resp.text,
+        )
+    except Exception as e:
+        print("Error al enviar correo de incidencia:", repr(e))
+
+
+def _notificar_incidente_ws(tipo, titulo, mensaje, incidente_id, destinatarios=None):
+    """
+    Invoca la Lambda de notificaciones por WebSocket (NotifyIncidente).
+    """
+    if not LAMBDA_NOTIFY_INCIDENTE:
+        print("LAMBDA_NOTIFY_INCIDENTE no configurado, no se envía notificación WS.")
+        return
+
+    payload = {
+        "tipo": tipo,
+        "titulo": titulo,
+        "mensaje": mensaje,
+        "incidente_id": incidente_id,
+    }
+
+    if destinatarios:
+        payload["destinatarios"] = destinatarios
+
+    try:
+        lambda_client.invoke(
+            FunctionName=LAMBDA_NOTIFY_INCIDENTE,
+            InvocationType="Event",
+            Payload=json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        )
+        print("Notificación WS disparada (crear incidente):", payload)
+    except Exception as e:
+        print("Error al invocar NotifyIncidente desde efectos_incidente:", repr(e))
+
+
+# Destinos reales de cada efecto. procesar_evento recibe otro dict con la
+# misma forma para ejecutarse localmente contra sustitutos.
+DESTINOS = {
+    "log_auditoria": registrar_log_auditoria,
+    "log_sistema": registrar_log_sistema,
+    "correo": enviar_correo_incidencia,
+    "notificacion_ws": _notificar_incidente_ws,
+}
+
+
+def procesar_evento(evento, destinos=None):
+    """
+    Ejecuta los efectos secundarios de la creación de un incidente:
+    auditoría, log de sistema, correo al creador y notificación WebSocket.
+
+    Args:
+        evento: {"evento": "incidente_creado", "incidente": dict, "usuario": {"correo", "nombre"}}
+        destinos: dict con las funciones a usar (por defecto DESTINOS)
+    """
+    destinos = destinos or DESTINOS
+    tipo_evento = evento.get("evento")
+    incidente = evento.get("incidente") or {}
+    usuario = evento.get("usuario") or {}
+
+    if tipo_evento != "incidente_creado":
+        print("Evento de efectos no soportado:", tipo_evento)
+        return {"procesado": False}
+
+    incidente_id = incidente.get("incidente_id")
+
+    destinos["log_auditoria"](
+        usuario_correo=usuario.get("correo"),
+        entidad="incidente",
+        entidad_id=incidente_id,
+        operacion="creacion",
+        valores_previos={},
+        valores_nuevos=incidente
+    )
+
+    destinos["log_sistema"](
+        nivel="INFO",
+        mensaje="Incidente creado correctamente",
+        servicio="crear_incidencia",
+        contexto={
+            "incidente_id": incidente_id,
+            "usuario_correo": usuario.get("correo"),
+            "tipo": incidente.get("tipo"),
+            "nivel_urgencia": incidente.get("nivel_urgencia")
+        }
+    )
+
+    destinos["correo"](
+        correo_destino=usuario.get("correo"),
+        nombre=usuario.get("nombre"),
+        incidente=incidente
+    )
+
+    mensaje_notif = (
+        f"Se creó el incidente {incidente_id} en el piso {incidente.get('piso')} "
+        f"con urgencia '{incidente.get('nivel_urgencia')}'."
+    )
+
+    destinos["notificacion_ws"](
+        tipo="incidente_creado",
+        titulo="Nuevo incidente reportado",
+        mensaje=mensaje_notif,
+        incidente_id=incidente_id,
+    )
+
+    return {"procesado": True, "incidente_id": incidente_id}
+
+
+@con_logs
+def lambda_handler(event, context):
+    """
+    Worker asíncrono (invocado con InvocationType=Event desde create_report).
+    Si lanza una excepción, Lambda reintenta el evento según la
+    configuración de invocación asíncrona de la función.
+    """
+    return procesar_evento(event)
+
+if __name__ == "__main__":
+    # Ejecución local contra sustitutos que sólo imprimen:
+    #   python -m CRUD.efectos_incidente evento.json
+    def _sustituto(nombre):
+        def _imprimir(**kwargs):
+            print(f"[{nombre}]", json.dumps(kwargs, ensure_ascii=False, default=str))
+        return _imprimir
+
+    with open(sys.argv[1], encoding="utf-8") as f:
+        evento_local = json.load(f)
+
+    print(procesar_evento(evento_local, {nombre: _sustituto(nombre) for nombre in DESTINOS}))
@@ -0,0 +1,91 @@
+import os
+import json
+import boto3
+from datetime import datetime, timezone
+from CRUD.utils import validar_token
+from CRUD.evidencias import INCIDENTES_BUCKET, TIPOS_EVIDENCIA, s3, es_clave_de_incidente, url_evidencia
+from CRUD.versiones import INCREMENTO_VERSION, VALORES_INCREMENTO
+from alerta_comun.respuestas import autenticar, responder
+from botocore.exceptions import ClientError
+from alerta_comun.logs import registrar_log_sistema, con_logs
+
+dynamodb = boto3.resource('dynamodb')
+table_name = os.environ.get('TABLE_INCIDENTES')
+incidentes_table = dynamodb.Table(table_name)
+
+
+@con_logs
+def lambda_handler(event, context):
+    """
+    Paso 2 de la subida de evidencias: verifica que el objeto subido con el
+    POST prefirmado existe y lo agrega a `evidencias` del incidente.
+    """
+    resultado_validacion = autenticar(event, validar_token)
+    if not resultado_validacion.get("valido"):
+        return responder(401, {"message": resultado_validacion.get("error")})
+
+    correo_usuario = resultado_validacion.get("correo")
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except (TypeError, ValueError):
+        return responder(400, {"message": "Body JSON inválido"})
+
+    incidente_id = body.get("incidente_id")
+    key = body.get("key")
+
+    if not incidente_id or not key:
+        return responder(400, {"message": "Se requieren 'incidente_id' y 'key'"})
+    if not es_clave_de_incidente(key, incidente_id):
+        return responder(400, {"message": "La 'key' no corresponde a una evidencia del incidente"})
+
+    try:
+        objeto = s3.head_object(Bucket=INCIDENTES_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return responder(404, {"message": "La evidencia aún no se ha subido a S3"})
+        return responder(500, {"error": f"Error S3: {e}"})
+
+    if objeto.get("ContentType") not in TIPOS_EVIDENCIA:
+        return responder(400, {"message": "El archivo subido no es una imagen permitida"})
+
+    evidencia = url_evidencia(key)
+
+    try:
+        incidentes_table.update_item(
+            Key={'incidente_id': incidente_id},
+            UpdateExpression="SET evidencias = list_append(if_not_exists(evidencias, :vacia), :nueva), updated_at = :ahora, " + INCREMENTO_VERSION,
+            ConditionExpression="usuario_correo = :correo AND NOT contains(evidencias, :evidencia)",
+            ExpressionAttributeValues={
+                ":vacia": [],
+                ":nueva": [evidencia],
+                ":evidencia": evidencia,
+                ":ahora": datetime.now(timezone.utc).isoformat(),
+                ":correo": correo_usuario,
+                **VALORES_INCREMENTO,
+            },
+            ReturnValuesOnConditionCheckFailure="ALL_OLD"
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            actual = e.response.get("Item")
+            if not actual:
+                return responder(404, {"message": "Incidente no encontrado"})
+            if actual.get("usuario_correo", {}).get("S") != correo_usuario:
+                return responder(403, {"message": "Solo puedes adjuntar evidencias a tus propios incidentes"})
+            return responder(409, {"message": "La evidencia ya está registrada"})
+        registrar_log_sistema(
+            nivel="ERROR",
+            mensaje="Error al registrar evidencia en DynamoDB",
+            servicio="confirmar_evidencia",
+            contexto={"incidente_id": incidente_id, "key": key, "error": str(e)}
+        )
+        return responder(500, {"message": f"Error al registrar la evidencia: {str(e)}"})
+
+    registrar_log_sistema(
+        nivel="INFO",
+        mensaje="Evidencia registrada",
+        servicio="confirmar_evidencia",
+        contexto={"incidente_id": incidente_id, "key": key, "bytes": objeto.get("ContentLength")}
+    )
+    return responder(200, {"message": "Evidencia registrada", "incidente_id": incidente_id, "evidencia": evidencia})
@@ -0,0 +1,59 @@
+import os
+import json
+import boto3
+from CRUD.utils import validar_token
+from CRUD.evidencias import INCIDENTES_BUCKET, TIPOS_EVIDENCIA, generar_subida
+from alerta_comun.respuestas import autenticar, responder
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+table_name = os.environ.get('TABLE_INCIDENTES')
+incidentes_table = dynamodb.Table(table_name)
+
+
+def lambda_handler(event, context):
+    """
+    Paso 1 de la subida de evidencias: retorna un POST prefirmado para que
+    el cliente suba la imagen directo a S3. Después se llama a
+    incidentes/evidencia/confirmar con la `key` recibida.
+    """
+    resultado_validacion = autenticar(event, validar_token)
+    if not resultado_validacion.get("valido"):
+        return responder(401, {"message": resultado_validacion.get("error")})
+
+    correo_usuario = resultado_validacion.get("correo")
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except (TypeError, ValueError):
+        return responder(400, {"message": "Body JSON inválido"})
+
+    incidente_id = body.get("incidente_id")
+    content_type = body.get("content_type", "image/jpeg")
+
+    if not incidente_id:
+        return responder(400, {"message": "Falta 'incidente_id' en el body"})
+    if content_type not in TIPOS_EVIDENCIA:
+        return responder(400, {"message": f"'content_type' debe ser uno de: {', '.join(TIPOS_EVIDENCIA)}"})
+    if not INCIDENTES_BUCKET:
+        return responder(500, {"error": "INCIDENTES_BUCKET no configurado"})
+
+    try:
+        response = incidentes_table.get_item(
+            Key={'incidente_id': incidente_id},
+            ProjectionExpression="usuario_correo"
+        )
+    except ClientError as e:
+        return responder(500, {"message": f"Error al obtener el incidente: {str(e)}"})
+
+    if 'Item' not in response:
+        return responder(404, {"message": "Incidente no encontrado"})
+    if response['Item'].get("usuario_correo") != correo_usuario:
+        return responder(403, {"message": "Solo puedes adjuntar evidencias a tus propios incidentes"})
+
+    try:
+        subida = generar_subida(incidente_id, content_type)
+    except ClientError as e:
+        return responder(500, {"error": f"Error S3: {e}"})
+
+    return responder(200, {"incidente_id": incidente_id, **subida})
@@ -0,0 +1,101 @@
+import io
+import os
+import boto3
+from urllib.parse import unquote_plus
+from botocore.exceptions import ClientError
+from CRUD.evidencias import VARIANTES, clave_variante, incidente_de_clave, s3, url_evidencia
+
+dynamodb = boto3.resource('dynamodb')
+table_name = os.environ.get('TABLE_INCIDENTES')
+incidentes_table = dynamodb.Table(table_name)
+
+CALIDAD_WEBP = int(os.environ.get("EVIDENCIA_CALIDAD_WEBP", "80"))
+
+
+def generar_variantes(datos):
+    """
+    Redimensiona una imagen a cada variante (lado mayor en píxeles) y la
+    comprime como WebP. Retorna {variante: bytes}.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(datos)) as original:
+        # Las fotos de celular suelen venir rotadas por EXIF
+        imagen = ImageOps.exif_transpose(original)
+        if imagen.mode not in ("RGB", "RGBA"):
+            imagen = imagen.convert("RGBA" if "A" in imagen.getbands() else "RGB")
+
+        variantes = {}
+        for nombre, lado in VARIANTES.items():
+            copia = imagen.copy()
+            copia.thumbnail((lado, lado), Image.LANCZOS)
+            buffer = io.BytesIO()
+            copia.save(buffer, format="WEBP", quality=CALIDAD_WEBP, method=4)
+            variantes[nombre] = buffer.getvalue()
+        return variantes
+
+
+def procesar_objeto(bucket, key):
+    incidente_id = incidente_de_clave(key)
+    if not incidente_id:
+        print("Objeto fuera del esquema evidencia_{id}, se ignora:", key)
+        return None
+
+    try:
+        datos = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "NoSuchKey":
+            # Evidencia de una actualización rechazada, ya borrada
+            print("La evidencia ya no existe, se ignora:", key)
+            return None
+        raise
+    try:
+        variantes = generar_variantes(datos)
+    except Exception as e:
+        # Archivo que Pillow no puede abrir (p. ej. HEIC sin plugin): se
+        # sigue sirviendo el original
+        print(f"No se pudieron generar variantes de {key}: {e!r}")
+        return None
+
+    for nombre, contenido in variantes.items():
+        s3.put_object(
+            Bucket=bucket,
+            Key=clave_variante(key, nombre),
+            Body=contenido,
+            ContentType="image/webp",
+            CacheControl="public, max-age=31536000, immutable",
+        )
+
+    try:
+        incidentes_table.update_item(
+            Key={'incidente_id': incidente_id},
+            UpdateExpression="ADD evidencias_procesadas :evidencia",
+            ConditionExpression="attribute_exists(incidente_id)",
+            ExpressionAttributeValues={":evidencia": {url_evidencia(key)}}
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            # create_report sube las evidencias antes de guardar el incidente:
+            # se falla para que Lambda reintente el evento más tarde
+            raise RuntimeError(f"El incidente {incidente_id} aún no existe") from e
+        raise
+
+    print(f"Variantes generadas para {key}: " + ", ".join(
+        f"{nombre}={len(contenido)}B" for nombre, contenido in variantes.items()
+    ) + f" (original {len(datos)}B)")
+    return list(variantes)
+
+
+def lambda_handler(event, context):
+    """
+    Worker disparado por S3 (ObjectCreated en evidencia_*): genera las
+    variantes comprimidas de cada evidencia bajo variantes/ y marca la
+    evidencia como procesada en el incidente.
+    """
+    procesadas = 0
+    for record in event.get("Records", []):
+        bucket = record["s3"]["bucket"]["name"]
+        key = unquote_plus(record["s3"]["object"]["key"])
+        if procesar_objeto(bucket, key):
+            procesadas += 1
+    return {"procesadas": procesadas}
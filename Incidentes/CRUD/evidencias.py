@@ -0,0 +1,230 @@
+import io
+import os
+import uuid
+import base64
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+INCIDENTES_BUCKET = os.environ.get("INCIDENTES_BUCKET")
+
+# Subida directa a S3: el cliente recibe un POST prefirmado y la Lambda nunca
+# toca los bytes de la imagen.
+EVIDENCIA_URL_EXPIRACION = int(os.environ.get("EVIDENCIA_URL_EXPIRACION", "900"))
+EVIDENCIA_MAX_MB = int(os.environ.get("EVIDENCIA_MAX_MB", "15"))
+TIPOS_EVIDENCIA = ["image/png", "image/jpeg", "image/webp", "image/heic", "image/gif"]
+
+# Evidencias enviadas en base64 dentro del body (crear/actualizar): se suben
+# en paralelo y las grandes con multipart upload
+EVIDENCIAS_MAX = int(os.environ.get("EVIDENCIAS_MAX", "10"))
+EVIDENCIAS_MAX_WORKERS = int(os.environ.get("EVIDENCIAS_MAX_WORKERS", "5"))
+TRANSFER_CONCURRENCIA = 4
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=TRANSFER_CONCURRENCIA,
+)
+# Cada subida en paralelo abre hasta max_concurrency conexiones; el pool del
+# cliente debe alcanzar para todas o las subidas se quedan esperando
+S3_MAX_CONEXIONES = max(10, EVIDENCIAS_MAX_WORKERS * TRANSFER_CONCURRENCIA)
+
+# Variantes comprimidas (WebP, lado mayor en píxeles) que genera
+# evidencia_variantes.py bajo variantes/{clave original}/{variante}.webp
+VARIANTES = {"miniatura": 320, "media": 1280}
+PREFIJO_VARIANTES = "variantes"
+
+# SigV4 es obligatorio para URLs prefirmadas en buckets de regiones nuevas
+s3 = boto3.client("s3", config=Config(signature_version="s3v4", max_pool_connections=S3_MAX_CONEXIONES))
+
+
+def clave_evidencia(incidente_id, sufijo=None):
+    """Clave S3 de una evidencia: evidencia_{incidente_id}[_{sufijo}]."""
+    return f"evidencia_{incidente_id}" + (f"_{sufijo}" if sufijo else "")
+
+
+def incidente_de_clave(key):
+    """incidente_id de una clave evidencia_{id}[_{sufijo}] (el id es un UUID, sin '_')."""
+    if not key.startswith("evidencia_"):
+        return None
+    return key[len("evidencia_"):].split("_", 1)[0] or None
+
+
+def clave_variante(key, variante):
+    return f"{PREFIJO_VARIANTES}/{key}/{variante}.webp"
+
+
+def es_clave_de_incidente(key, incidente_id):
+    base = clave_evidencia(incidente_id)
+    return key == base or key.startswith(base + "_")
+
+
+def url_evidencia(key):
+    """Referencia guardada en la lista `evidencias` del incidente."""
+    return f"s3://{INCIDENTES_BUCKET}/{key}"
+
+
+def url_firmada(key):
+    """URL GET prefirmada (el bucket no es público)."""
+    return s3.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": INCIDENTES_BUCKET, "Key": key},
+        ExpiresIn=EVIDENCIA_URL_EXPIRACION,
+    )
+
+
+def urls_evidencias(incidente, variantes):
+    """
+    URLs prefirmadas de las evidencias de un incidente, una por evidencia:
+    {"original": url, <variante>: url, ...}. Mientras el worker no haya
+    procesado una evidencia, sus variantes apuntan al original.
+
+    Firmar es un cálculo local (sin llamadas a S3), así que no agrega
+    latencia apreciable a los listados.
+    """
+    procesadas = incidente.get("evidencias_procesadas") or set()
+    prefijo = f"s3://{INCIDENTES_BUCKET}/"
+    resultado = []
+    for evidencia in incidente.get("evidencias") or []:
+        if not isinstance(evidencia, str) or not evidencia.startswith(prefijo):
+            continue
+        key = evidencia[len(prefijo):]
+        urls = {"original": url_firmada(key)}
+        for variante in variantes:
+            urls[variante] = url_firmada(clave_variante(key, variante)) if evidencia in procesadas else urls["original"]
+        resultado.append(urls)
+    return resultado
+
+
+def generar_subida(incidente_id, content_type):
+    """
+    POST prefirmado para subir una evidencia directo a S3. La política fija
+    la clave, el Content-Type y el tamaño máximo, así el cliente no puede
+    escribir fuera de `evidencia_{incidente_id}_*`.
+
+    Returns:
+        dict: {"key", "url", "fields", "expira_en_segundos"}
+    """
+    key = clave_evidencia(incidente_id, uuid.uuid4().hex[:12])
+    presigned = s3.generate_presigned_post(
+        Bucket=INCIDENTES_BUCKET,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, EVIDENCIA_MAX_MB * 1024 * 1024],
+        ],
+        ExpiresIn=EVIDENCIA_URL_EXPIRACION,
+    )
+    return {
+        "key": key,
+        "url": presigned["url"],
+        "fields": presigned["fields"],
+        "expira_en_segundos": EVIDENCIA_URL_EXPIRACION,
+    }
+
+
+def detectar_content_type(datos):
+    """Content-Type de una imagen según sus primeros bytes, o None si no se reconoce."""
+    if datos.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if datos.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if datos[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if datos[:4] == b"RIFF" and datos[8:12] == b"WEBP":
+        return "image/webp"
+    if datos[4:8] == b"ftyp" and datos[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return None
+
+
+def decodificar_evidencias(evidencias):
+    """
+    Normaliza `evidencias` del body: un objeto {"file_base64": ...} o una
+    lista de ellos. Retorna [(bytes, content_type)].
+
+    Raises:
+        ValueError: con el mensaje para responder 400
+    """
+    archivos = evidencias if isinstance(evidencias, list) else [evidencias]
+    if len(archivos) > EVIDENCIAS_MAX:
+        raise ValueError(f"Se permiten como máximo {EVIDENCIAS_MAX} evidencias")
+
+    resultado = []
+    for i, archivo in enumerate(archivos):
+        if not isinstance(archivo, dict):
+            raise ValueError("'evidencias' debe ser un objeto o una lista de objetos con 'file_base64'")
+        file_b64 = archivo.get("file_base64")
+        if not file_b64:
+            raise ValueError(f"'file_base64' es requerido en la evidencia {i}")
+        try:
+            datos = base64.b64decode(file_b64)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"file_base64 inválido en la evidencia {i}: {e}")
+        content_type = detectar_content_type(datos)
+        if content_type not in TIPOS_EVIDENCIA:
+            raise ValueError(f"La evidencia {i} no es una imagen permitida ({', '.join(TIPOS_EVIDENCIA)})")
+        resultado.append((datos, content_type))
+    return resultado
+
+
+def _subir(key, datos, content_type):
+    s3.upload_fileobj(
+        io.BytesIO(datos),
+        INCIDENTES_BUCKET,
+        key,
+        ExtraArgs={"ContentType": content_type},
+        Config=TRANSFER_CONFIG,
+    )
+    return url_evidencia(key)
+
+
+def subir_evidencias(incidente_id, archivos, claves_unicas=False):
+    """
+    Sube [(bytes, content_type)] en paralelo. Una sola evidencia conserva la
+    clave `evidencia_{incidente_id}`; varias usan `evidencia_{incidente_id}_{i}`.
+    Con `claves_unicas` cada archivo va a `evidencia_{incidente_id}_{uuid}`,
+    así un intento que después se descarta no pisa las evidencias vigentes.
+
+    Returns:
+        list: referencias s3:// en el mismo orden que `archivos`
+    """
+    if not archivos:
+        return []
+    if claves_unicas:
+        sufijos = [uuid.uuid4().hex[:12] for _ in archivos]
+    else:
+        sufijos = [None] if len(archivos) == 1 else [str(i) for i in range(len(archivos))]
+    with ThreadPoolExecutor(max_workers=min(EVIDENCIAS_MAX_WORKERS, len(archivos))) as pool:
+        futuros = [
+            pool.submit(_subir, clave_evidencia(incidente_id, sufijo), datos, content_type)
+            for sufijo, (datos, content_type) in zip(sufijos, archivos)
+        ]
+        return [futuro.result() for futuro in futuros]
+
+
+def borrar_evidencias(referencias):
+    """
+    Borra evidencias (referencias s3:// del bucket) y sus variantes. Un
+    error sólo se registra: quedan objetos huérfanos pero la respuesta no
+    depende de esto.
+    """
+    prefijo = f"s3://{INCIDENTES_BUCKET}/"
+    claves = []
+    for referencia in referencias or []:
+        if isinstance(referencia, str) and referencia.startswith(prefijo):
+            key = referencia[len(prefijo):]
+            claves.append(key)
+            claves.extend(clave_variante(key, variante) for variante in VARIANTES)
+    try:
+        for inicio in range(0, len(claves), 1000):
+            s3.delete_objects(
+                Bucket=INCIDENTES_BUCKET,
+                Delete={"Objects": [{"Key": k} for k in claves[inicio:inicio + 1000]], "Quiet": True},
+            )
+    except ClientError as e:
+        print(f"No se pudieron borrar evidencias descartadas {claves}: {e!r}")
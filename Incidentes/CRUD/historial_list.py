@@ -1,55 +1,112 @@
 import os
 import json
 import math
+import time
 import boto3
-from boto3.dynamodb.conditions import Attr
-from CRUD.utils import validar_token
-from decimal import Decimal
+from CRUD.utils import validar_token, firmar_cursor, leer_cursor
+from CRUD.consultas import CursorExpirado, planificar_consulta, leer_pagina, leer_ventana, contar
+from CRUD.rollups import leer_total_usuario
+from alerta_comun.respuestas import responder, safe_int, autenticar
 
 TABLE_INCIDENTES = os.environ.get("TABLE_INCIDENTES")
-CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+TOTAL_CACHE_TTL_SECONDS = int(os.environ.get("TOTAL_CACHE_TTL_SECONDS", "60"))
 
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(TABLE_INCIDENTES)
 
+# Cache de totalElements por usuario y filtros (vive mientras el contenedor esté caliente)
+_total_cache = {}
+
+
+def _contar_total(plan, clave_cache):
+    """
+    Total del historial para los filtros del plan.
+
+    Sin filtros o filtrando sólo por estado se lee del rollup `usuario`
+    (un GetItem). Con otros filtros se cuenta con Select=COUNT y se cachea
+    TOTAL_CACHE_TTL_SECONDS para no repetir el conteo en cada página.
+    """
+    filtros = plan["filtros"]
+    if not filtros.get("tipo") and not filtros.get("nivel_urgencia"):
+        total = leer_total_usuario(filtros.get("usuario_correo"), filtros.get("estado"))
+        if total is not None:
+            return total
+
+    cacheado = _total_cache.get(clave_cache)
+    if cacheado and cacheado[1] > time.time():
+        return cacheado[0]
+
+    total = contar(table, plan)
+
+    _total_cache[clave_cache] = (total, time.time() + TOTAL_CACHE_TTL_SECONDS)
+    return total
+
+
+def _clave_filtros(plan):
+    """Contexto al que se liga el cursor: índice del plan, usuario y filtros."""
+    filtros = plan["filtros"]
+    return (
+        f"{plan['indice'] or ''}|{filtros.get('usuario_correo') or ''}|{filtros.get('tipo') or ''}|"
+        f"{filtros.get('nivel_urgencia') or ''}|{filtros.get('estado') or ''}"
+    )
+
+
+def _formatear_items(items):
+    return [
+        {
+            "incidente_id": item.get("incidente_id"),
+            "titulo": item.get("titulo"),
+            "descripcion": item.get("descripcion"),
+            "piso": item.get("piso"),
+            "ubicacion": item.get("ubicacion"),
+            "tipo": item.get("tipo"),
+            "nivel_urgencia": item.get("nivel_urgencia"),
+            "evidencias": item.get("evidencias", []),
+            "estado": item.get("estado"),
+            "usuario_correo": item.get("usuario_correo"),
+            "created_at": item.get("created_at"),
+            "updated_at": item.get("updated_at"),
+            "coordenadas": item.get("coordenadas"),
+        }
+        for item in items
+    ]
 
-def _convert_decimals(obj):
-    if isinstance(obj, list):
-        return [_convert_decimals(x) for x in obj]
-    if isinstance(obj, dict):
-        return {k: _convert_decimals(v) for k, v in obj.items()}
-    if isinstance(obj, Decimal):
-        if obj % 1 == 0:
-            return int(obj)
-        return float(obj)
-    return obj
-
-
-def _resp(code, body):
-    safe_body = _convert_decimals(body)
-    return {
-        "statusCode": code,
-        "headers": CORS_HEADERS,
-        "body": json.dumps(safe_body, ensure_ascii=False),
-    }
 
+def _historial_con_cursor(body, size, plan, clave_filtros):
+    """
+    Modo keyset: cada página es una query con Limit sobre el índice del
+    usuario, sin importar cuántos reportes tenga en total.
+    """
+    lek = None
+    if body.get("cursor"):
+        lek = leer_cursor(body["cursor"], clave_filtros)
+        if lek is None:
+            return responder(400, {"error": "Cursor inválido o no corresponde a los filtros enviados"})
 
-def _safe_int(v, default):
     try:
-        return int(v)
-    except Exception:
-        return default
-    
-def lambda_handler(event, context):
-    headers = event.get("headers") or {}
-    auth_header = headers.get("Authorization") or headers.get("authorization") or ""
-    if auth_header.lower().startswith("bearer "):
-        auth_header = auth_header.split(" ", 1)[1].strip()
-    token = auth_header
+        items, lek = leer_pagina(table, plan, size, lek)
+    except CursorExpirado:
+        return responder(400, {"error": "Cursor expirado: vuelve a pedir la primera página"})
+
+    # Si el plan cambió de índice al leer, el siguiente cursor se liga al nuevo
+    clave_filtros = _clave_filtros(plan)
+    respuesta = {
+        "contents": _formatear_items(items),
+        "size": size,
+        "next_cursor": firmar_cursor(lek, clave_filtros),
+    }
+    if body.get("incluir_total"):
+        total = _contar_total(plan, clave_filtros)
+        respuesta["totalElements"] = total
+        respuesta["totalPages"] = math.ceil(total / size) if size > 0 else 0
 
-    resultado_validacion = validar_token(token)
+    return responder(200, respuesta)
+
+
+def lambda_handler(event, context):
+    resultado_validacion = autenticar(event, validar_token)
     if not resultado_validacion.get("valido"):
-        return _resp(401, {"error": resultado_validacion.get("error")})
+        return responder(401, {"error": resultado_validacion.get("error")})
 
     usuario_autenticado = {
         "correo": resultado_validacion.get("correo"),
@@ -60,11 +117,14 @@ def lambda_handler(event, context):
     correo_usuario = usuario_autenticado["correo"]
 
     if rol not in ["estudiante", "personal_administrativo", "autoridad"]:
-        return _resp(403, {"error": "No tienes permisos para listar incidentes"})
+        return responder(403, {"error": "No tienes permisos para listar incidentes"})
+
+    if not correo_usuario:
+        return responder(401, {"error": "El token no contiene el correo del usuario"})
 
     body = json.loads(event.get("body") or "{}")
-    page = _safe_int(body.get("page", 0), 0)
-    size = _safe_int(body.get("size", body.get("limit", 10)), 10)
+    page = safe_int(body.get("page", 0), 0)
+    size = safe_int(body.get("size", body.get("limit", 10)), 10)
 
     if size <= 0 or size > 100:
         size = 10
@@ -75,63 +135,35 @@ def lambda_handler(event, context):
     filtro_nivel = body.get("nivel_urgencia")
     filtro_estado = body.get("estado")
 
-    filter_expr = Attr("usuario_correo").eq(correo_usuario)
+    plan = planificar_consulta({
+        "usuario_correo": correo_usuario,
+        "tipo": filtro_tipo,
+        "nivel_urgencia": filtro_nivel,
+        "estado": filtro_estado,
+    })
 
-    if filtro_tipo:
-        filter_expr = filter_expr & Attr("tipo").eq(filtro_tipo)
-    if filtro_nivel:
-        filter_expr = filter_expr & Attr("nivel_urgencia").eq(filtro_nivel)
-    if filtro_estado:
-        filter_expr = filter_expr & Attr("estado").eq(filtro_estado)
+    clave_filtros = _clave_filtros(plan)
 
-    scan_kwargs = {"FilterExpression": filter_expr}
-    all_items = []
-    lek = None
-    while True:
-        if lek:
-            scan_kwargs["ExclusiveStartKey"] = lek
-        resp = table.scan(**scan_kwargs)
-        all_items.extend(resp.get("Items", []))
-        lek = resp.get("LastEvaluatedKey")
-        if not lek:
-            break
-
-    total = len(all_items)
-    total_pages = math.ceil(total / size) if size > 0 else 0
-
-    if total_pages and page >= total_pages:
-        return _resp(200, {
-            "contents": [],
-            "page": page,
-            "size": size,
-            "totalElements": total,
-            "totalPages": total_pages,
-        })
+    if "cursor" in body:
+        return _historial_con_cursor(body, size, plan, clave_filtros)
 
+    # Se deja de leer al llegar a page*size+size items; sólo la ventana pedida queda en memoria
     start = page * size
     end = start + size
-    items = all_items[start:end]
+    items = leer_ventana(table, plan, start, end)
 
-    items = [
-        {
-            "incidente_id": item.get("incidente_id"),
-            "titulo": item.get("titulo"),
-            "descripcion": item.get("descripcion"),
-            "piso": item.get("piso"),
-            "ubicacion": item.get("ubicacion"),
-            "tipo": item.get("tipo"),
-            "nivel_urgencia": item.get("nivel_urgencia"),
-            "evidencias": item.get("evidencias", []),
-            "estado": item.get("estado"),
-            "usuario_correo": item.get("usuario_correo"),
-            "created_at": item.get("created_at"),
-            "updated_at": item.get("updated_at"),
-            "coordenadas": item.get("coordenadas"),
-        }
-        for item in items
-    ]
+    # El total sale del rollup del usuario o de un conteo cacheado, no de
+    # recorrer todo su historial en cada página
+    if body.get("incluir_total", True):
+        total = _contar_total(plan, clave_filtros)
+        total_pages = math.ceil(total / size) if size > 0 else 0
+    else:
+        total = None
+        total_pages = None
+
+    items = _formatear_items(items)
 
-    return _resp(200, {
+    return responder(200, {
         "contents": items,
         "page": page,
         "size": size,
@@ -1,56 +1,154 @@
 import os
 import json
 import math
+import time
 import boto3
-from boto3.dynamodb.conditions import Attr
-from CRUD.utils import validar_token
-from decimal import Decimal
+from CRUD.utils import validar_token, firmar_cursor, leer_cursor
+from CRUD.consultas import CursorExpirado, planificar_consulta, ejecutar_consulta, leer_pagina, contar
+from CRUD.contadores import clave_contador, leer_contador
+from CRUD.evidencias import urls_evidencias
+from alerta_comun.respuestas import responder, safe_int, autenticar
 
 TABLE_INCIDENTES = os.environ.get("TABLE_INCIDENTES")
-CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+TOTAL_CACHE_TTL_SECONDS = int(os.environ.get("TOTAL_CACHE_TTL_SECONDS", "60"))
 
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(TABLE_INCIDENTES)
 
+# Cache de totalElements por combinación de filtros (vive mientras el contenedor esté caliente)
+_total_cache = {}
 
-def _convert_decimals(obj):
-    if isinstance(obj, list):
-        return [_convert_decimals(x) for x in obj]
-    if isinstance(obj, dict):
-        return {k: _convert_decimals(v) for k, v in obj.items()}
-    if isinstance(obj, Decimal):
-        if obj % 1 == 0:
-            return int(obj)
-        return float(obj)
-    return obj
-
-
-def _resp(code, body):
-    safe_body = _convert_decimals(body)
-    return {
-        "statusCode": code,
-        "headers": CORS_HEADERS,
-        "body": json.dumps(safe_body, ensure_ascii=False),
-    }
 
+def _contar_total(plan, clave_cache):
+    """
+    Total de incidentes para los filtros del plan.
+
+    Se lee del contador materializado (un GetItem) cuando TABLE_CONTADORES
+    está configurada. Si no, se cuenta con Select=COUNT (query sobre el GSI
+    o scan) y se cachea TOTAL_CACHE_TTL_SECONDS para no repetir el conteo
+    en cada página.
+    """
+    filtros = plan["filtros"]
+    total = leer_contador(clave_contador(
+        estado=filtros.get("estado"),
+        tipo=filtros.get("tipo"),
+        nivel_urgencia=filtros.get("nivel_urgencia"),
+    ))
+    if total is not None:
+        return total
+
+    cacheado = _total_cache.get(clave_cache)
+    if cacheado and cacheado[1] > time.time():
+        return cacheado[0]
+
+    total = contar(table, plan)
+
+    _total_cache[clave_cache] = (total, time.time() + TOTAL_CACHE_TTL_SECONDS)
+    return total
+
+
+def _clave_filtros(plan):
+    """Contexto al que se liga el cursor: índice del plan y filtros."""
+    filtros = plan["filtros"]
+    return (
+        f"{plan['indice'] or ''}|{filtros.get('tipo') or ''}|"
+        f"{filtros.get('nivel_urgencia') or ''}|{filtros.get('estado') or ''}"
+    )
+
+
+def _formatear_items(items, rol):
+    if rol == "estudiante":
+        return [
+            {
+                "titulo": item.get("titulo"),
+                "piso": item.get("piso"),
+                "tipo": item.get("tipo"),
+                "nivel_urgencia": item.get("nivel_urgencia"),
+                "estado": item.get("estado"),
+                "created_at": item.get("created_at"),
+                "updated_at": item.get("updated_at"),
+            }
+            for item in items
+        ]
+    return [
+        {
+            "incidente_id": item.get("incidente_id"),
+            "titulo": item.get("titulo"),
+            "descripcion": item.get("descripcion"),
+            "piso": item.get("piso"),
+            "ubicacion": item.get("ubicacion"),
+            "tipo": item.get("tipo"),
+            "nivel_urgencia": item.get("nivel_urgencia"),
+            "evidencias": item.get("evidencias", []),
+            "evidencias_urls": urls_evidencias(item, ["miniatura"]),
+            "estado": item.get("estado"),
+            "usuario_correo": item.get("usuario_correo"),
+            "created_at": item.get("created_at"),
+            "updated_at": item.get("updated_at"),
+            "coordenadas": item.get("coordenadas"),
+        }
+        for item in items
+    ]
+
+
+def _leer_pagina_n(plan, page, size):
+    """Items de la página `page` saltando las anteriores de `size` en `size`."""
+    qargs = {"Limit": size}
+
+    lek = None
+    for _ in range(page):
+        if lek:
+            qargs["ExclusiveStartKey"] = lek
+        rskip = ejecutar_consulta(table, plan, **qargs)
+        lek = rskip.get("LastEvaluatedKey")
+        if not lek:
+            return []
+
+    if lek:
+        qargs["ExclusiveStartKey"] = lek
+    rpage = ejecutar_consulta(table, plan, **qargs)
+    return rpage.get("Items", [])
+
+
+def _listar_con_cursor(body, size, plan, clave_filtros, rol):
+    """
+    Modo cursor: una página = una lectura (o las necesarias para llenar
+    `size` cuando hay filtros no indexados), sin importar qué tan profundo
+    esté el usuario.
+    """
+    cursor = body.get("cursor")
+
+    lek = None
+    if cursor:
+        lek = leer_cursor(cursor, clave_filtros)
+        if lek is None:
+            return responder(400, {"error": "Cursor inválido o no corresponde a los filtros enviados"})
 
-def _safe_int(v, default):
     try:
-        return int(v)
-    except Exception:
-        return default
+        items, lek = leer_pagina(table, plan, size, lek)
+    except CursorExpirado:
+        return responder(400, {"error": "Cursor expirado: vuelve a pedir la primera página"})
+
+    # Si el plan cambió de índice al leer, el siguiente cursor se liga al nuevo
+    clave_filtros = _clave_filtros(plan)
+    respuesta = {
+        "contents": _formatear_items(items, rol),
+        "size": size,
+        "next_cursor": firmar_cursor(lek, clave_filtros),
+    }
 
+    if body.get("incluir_total"):
+        total = _contar_total(plan, clave_filtros)
+        respuesta["totalElements"] = total
+        respuesta["totalPages"] = math.ceil(total / size) if size > 0 else 0
+
+    return responder(200, respuesta)
 
-def lambda_handler(event, context):
-    headers = event.get("headers") or {}
-    auth_header = headers.get("Authorization") or headers.get("authorization") or ""
-    if auth_header.lower().startswith("bearer "):
-        auth_header = auth_header.split(" ", 1)[1].strip()
-    token = auth_header
 
-    resultado_validacion = validar_token(token)
+def lambda_handler(event, context):
+    resultado_validacion = autenticar(event, validar_token)
     if not resultado_validacion.get("valido"):
-        return _resp(401, {"error": resultado_validacion.get("error")})
+        return responder(401, {"error": resultado_validacion.get("error")})
 
     usuario_autenticado = {
         "correo": resultado_validacion.get("correo"),
@@ -60,11 +158,11 @@ def lambda_handler(event, context):
     rol = usuario_autenticado["rol"]
 
     if rol not in ["estudiante", "personal_administrativo", "autoridad"]:
-        return _resp(403, {"error": "No tienes permisos para listar incidentes"})
+        return responder(403, {"error": "No tienes permisos para listar incidentes"})
 
     body = json.loads(event.get("body") or "{}")
-    page = _safe_int(body.get("page", 0), 0)
-    size = _safe_int(body.get("size", body.get("limit", 10)), 10)
+    page = safe_int(body.get("page", 0), 0)
+    size = safe_int(body.get("size", body.get("limit", 10)), 10)
 
     if size <= 0 or size > 100:
         size = 10
@@ -75,36 +173,22 @@ def lambda_handler(event, context):
     filtro_nivel = body.get("nivel_urgencia")
     filtro_estado = body.get("estado")
 
-    filter_expr = None
-    if filtro_tipo:
-        cond = Attr("tipo").eq(filtro_tipo)
-        filter_expr = cond if filter_expr is None else (filter_expr & cond)
-    if filtro_nivel:
-        cond = Attr("nivel_urgencia").eq(filtro_nivel)
-        filter_expr = cond if filter_expr is None else (filter_expr & cond)
-    if filtro_estado:
-        cond = Attr("estado").eq(filtro_estado)
-        filter_expr = cond if filter_expr is None else (filter_expr & cond)
-
-    total = 0
-    count_args = {"Select": "COUNT"}
-    if filter_expr is not None:         
-        count_args["FilterExpression"] = filter_expr
+    plan = planificar_consulta({
+        "tipo": filtro_tipo,
+        "nivel_urgencia": filtro_nivel,
+        "estado": filtro_estado,
+    })
+    clave_filtros = _clave_filtros(plan)
 
-    lek = None
-    while True:
-        if lek:
-            count_args["ExclusiveStartKey"] = lek
-        rcount = table.scan(**count_args)
-        total += rcount.get("Count", 0)
-        lek = rcount.get("LastEvaluatedKey")
-        if not lek:
-            break
+    if "cursor" in body:
+        return _listar_con_cursor(body, size, plan, clave_filtros, rol)
+
+    total = _contar_total(plan, clave_filtros)
 
     total_pages = math.ceil(total / size) if size > 0 else 0
 
     if total_pages and page >= total_pages:
-        return _resp(200, {
+        return responder(200, {
             "contents": [],
             "page": page,
             "size": size,
@@ -112,64 +196,15 @@ def lambda_handler(event, context):
             "totalPages": total_pages,
         })
 
-    qargs = {"Limit": size}
-    if filter_expr is not None:        
-        qargs["FilterExpression"] = filter_expr
-
-    lek = None
-    for _ in range(page):
-        if lek:
-            qargs["ExclusiveStartKey"] = lek
-        rskip = table.scan(**qargs)
-        lek = rskip.get("LastEvaluatedKey")
-        if not lek:
-            return _resp(200, {
-                "contents": [],
-                "page": page,
-                "size": size,
-                "totalElements": total,
-                "totalPages": total_pages,
-            })
-
-    if lek:
-        qargs["ExclusiveStartKey"] = lek
-    rpage = table.scan(**qargs)
-    items = rpage.get("Items", [])
-
-    if rol == "estudiante":
-        items = [
-            {
-                "titulo": item.get("titulo"),
-                "piso": item.get("piso"),
-                "tipo": item.get("tipo"),
-                "nivel_urgencia": item.get("nivel_urgencia"),
-                "estado": item.get("estado"),
-                "created_at": item.get("created_at"),
-                "updated_at": item.get("updated_at"),
-            }
-            for item in items
-        ]
-    else:
-        items = [
-            {
-                "incidente_id": item.get("incidente_id"),
-                "titulo": item.get("titulo"),
-                "descripcion": item.get("descripcion"),
-                "piso": item.get("piso"),
-                "ubicacion": item.get("ubicacion"),
-                "tipo": item.get("tipo"),
-                "nivel_urgencia": item.get("nivel_urgencia"),
-                "evidencias": item.get("evidencias", []),
-                "estado": item.get("estado"),
-                "usuario_correo": item.get("usuario_correo"),
-                "created_at": item.get("created_at"),
-                "updated_at": item.get("updated_at"),
-                "coordenadas": item.get("coordenadas"),
-            }
-            for item in items
-        ]
-
-    return _resp(200, {
+    try:
+        items = _leer_pagina_n(plan, page, size)
+    except CursorExpirado:
+        # El índice desapareció a mitad del recorrido y el plan ya se
+        # reemplazó: se recorre de nuevo desde el inicio con el plan nuevo
+        items = _leer_pagina_n(plan, page, size)
+    items = _formatear_items(items, rol)
+
+    return responder(200, {
         "contents": items,
         "page": page,
         "size": size,
@@ -0,0 +1,174 @@
+import os
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import boto3
+
+TABLE_ROLLUPS = os.environ.get("TABLE_ROLLUPS")
+
+# Agregados de analítica mantenidos desde el stream de incidentes. Cada item
+# es (dimension, clave) con contadores numéricos que sólo se modifican con
+# ADD, así Analítica los lee con una Query por dimensión:
+#   piso_estado  "piso=3|estado=resuelto"        -> total
+#   tipo_nivel   "tipo=TI|nivel_urgencia=alto"   -> total
+#   usuario      "<correo>"                       -> total, estado_<estado>
+#   resolucion   "tipo=TI|nivel_urgencia=alto"   -> resueltos, suma_horas, h_<rango>
+
+# Límites (en horas) del histograma de tiempo de resolución
+HISTOGRAMA_HORAS = (1, 4, 24, 72)
+
+# TransactWriteItems acepta como máximo 100 acciones por llamada
+MAX_ACCIONES_TRANSACCION = 100
+
+dynamodb_client = boto3.client("dynamodb")
+
+
+def _valor(imagen, campo):
+    """Valor S o N de una imagen del stream (formato tipado), o None."""
+    tipado = imagen.get(campo) or {}
+    return tipado.get("S", tipado.get("N"))
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        fecha = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+
+def rango_histograma(horas):
+    for limite in HISTOGRAMA_HORAS:
+        if horas < limite:
+            return f"h_lt_{limite}"
+    return f"h_ge_{HISTOGRAMA_HORAS[-1]}"
+
+
+def horas_resolucion(creado_en, actualizado_en):
+    """Horas completas entre creación y última actualización (como date_diff('hour'))."""
+    creado, actualizado = _fecha(creado_en), _fecha(actualizado_en)
+    if not creado or not actualizado:
+        return None
+    return max(int((actualizado - creado).total_seconds() // 3600), 0)
+
+
+def aportes_de_incidente(imagen):
+    """
+    Lo que suma un incidente en cada rollup: {(dimension, clave): {atributo: n}}.
+    """
+    if not imagen:
+        return {}
+
+    piso = _valor(imagen, "piso") or ""
+    estado = _valor(imagen, "estado") or ""
+    tipo = _valor(imagen, "tipo") or ""
+    nivel = _valor(imagen, "nivel_urgencia") or ""
+    correo = _valor(imagen, "usuario_correo") or ""
+
+    aportes = {
+        ("piso_estado", f"piso={piso}|estado={estado}"): {"total": 1},
+        ("tipo_nivel", f"tipo={tipo}|nivel_urgencia={nivel}"): {"total": 1},
+    }
+    # La clave de DynamoDB no admite texto vacío
+    if correo:
+        aportes[("usuario", correo)] = {"total": 1, f"estado_{estado}": 1}
+
+    if estado == "resuelto":
+        horas = horas_resolucion(
+            _valor(imagen, "created_at") or _valor(imagen, "creado_en"),
+            _valor(imagen, "updated_at") or _valor(imagen, "actualizado_en"),
+        )
+        if horas is not None:
+            aportes[("resolucion", f"tipo={tipo}|nivel_urgencia={nivel}")] = {
+                "resueltos": 1,
+                "suma_horas": horas,
+                rango_histograma(horas): 1,
+            }
+    return aportes
+
+
+def calcular_deltas(records):
+    """
+    Convierte los registros del stream en deltas por rollup: se resta lo que
+    aportaba la imagen anterior y se suma lo que aporta la nueva.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        datos = record.get("dynamodb", {})
+        anteriores = aportes_de_incidente(datos.get("OldImage"))
+        nuevos = aportes_de_incidente(datos.get("NewImage"))
+        if anteriores == nuevos:
+            continue
+
+        for clave, atributos in anteriores.items():
+            for atributo, n in atributos.items():
+                deltas[clave][atributo] -= n
+        for clave, atributos in nuevos.items():
+            for atributo, n in atributos.items():
+                deltas[clave][atributo] += n
+
+    resultado = {}
+    for clave, atributos in deltas.items():
+        atributos = {a: n for a, n in atributos.items() if n}
+        if atributos:
+            resultado[clave] = atributos
+    return resultado
+
+
+def aplicar_deltas(deltas, token_base):
+    """
+    Aplica los deltas con ADD atómicos en TransactWriteItems. Igual que en
+    contadores.aplicar_deltas, el ClientRequestToken derivado de la
+    secuencia del stream evita sumar dos veces un lote reintentado.
+    """
+    acciones = []
+    for (dimension, clave), atributos in sorted(deltas.items()):
+        nombres = {}
+        valores = {}
+        partes = []
+        for i, (atributo, n) in enumerate(sorted(atributos.items())):
+            nombres[f"#a{i}"] = atributo
+            valores[f":v{i}"] = {"N": str(n)}
+            partes.append(f"#a{i} :v{i}")
+        acciones.append({
+            "Update": {
+                "TableName": TABLE_ROLLUPS,
+                "Key": {"dimension": {"S": dimension}, "clave": {"S": clave}},
+                "UpdateExpression": "ADD " + ", ".join(partes),
+                "ExpressionAttributeNames": nombres,
+                "ExpressionAttributeValues": valores,
+            }
+        })
+
+    for inicio in range(0, len(acciones), MAX_ACCIONES_TRANSACCION):
+        lote = acciones[inicio:inicio + MAX_ACCIONES_TRANSACCION]
+        token = hashlib.sha256(f"rollups:{token_base}:{inicio}".encode("utf-8")).hexdigest()[:36]
+        dynamodb_client.transact_write_items(TransactItems=lote, ClientRequestToken=token)
+
+    return len(acciones)
+
+
+def leer_total_usuario(correo, estado=None):
+    """
+    Reportes de un usuario (todos o los de un estado) desde el rollup
+    `usuario`, con un solo GetItem. Retorna None si TABLE_ROLLUPS no está
+    configurada o el usuario aún no tiene rollup (rollups sin reconstruir),
+    para que el llamador cuente de otra forma.
+    """
+    if not TABLE_ROLLUPS or not correo:
+        return None
+    atributo = f"estado_{estado}" if estado else "total"
+    resp = dynamodb_client.get_item(
+        TableName=TABLE_ROLLUPS,
+        Key={"dimension": {"S": "usuario"}, "clave": {"S": correo}},
+        ProjectionExpression="#a, clave",
+        ExpressionAttributeNames={"#a": atributo},
+        ConsistentRead=True,
+    )
+    if "Item" not in resp:
+        return None
+    valor = resp["Item"].get(atributo)
+    return max(int(valor["N"]), 0) if valor else 0
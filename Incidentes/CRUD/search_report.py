@@ -1,8 +1,10 @@
 import os
 import json
 import boto3
-from decimal import Decimal
 from CRUD.utils import validar_token
+from CRUD.evidencias import urls_evidencias
+from alerta_comun.respuestas import autenticar
+from alerta_comun.decimales import dumps
 from botocore.exceptions import ClientError
 
 dynamodb = boto3.resource('dynamodb')
@@ -10,28 +12,8 @@ CORS_HEADERS = { "Access-Control-Allow-Origin": "*" }
 table_name = os.environ.get('TABLE_INCIDENTES')
 incidentes_table = dynamodb.Table(table_name)
 
-def _convert_decimals(obj):
-    """
-    Convierte recursivamente Decimal -> int/float para que sea JSON serializable.
-    """
-    if isinstance(obj, list):
-        return [_convert_decimals(x) for x in obj]
-    if isinstance(obj, dict):
-        return {k: _convert_decimals(v) for k, v in obj.items()}
-    if isinstance(obj, Decimal):
-        if obj % 1 == 0:
-            return int(obj)
-        return float(obj)
-    return obj
-
 def lambda_handler(event, context):
-    headers = event.get("headers") or {}
-    auth_header = headers.get("Authorization") or headers.get("authorization") or ""
-    if auth_header.lower().startswith("bearer "):
-        auth_header = auth_header.split(" ", 1)[1].strip()
-    token = auth_header
-
-    resultado_validacion = validar_token(token)
+    resultado_validacion = autenticar(event, validar_token)
     
     if not resultado_validacion.get("valido"):
         return {
@@ -92,13 +74,12 @@ def lambda_handler(event, context):
             "body": json.dumps({"message": "No tienes permisos para ver incidentes"})
         }
 
-    incidente_sin_decimals = _convert_decimals(incidente)
-    
     return {
         "statusCode": 200,
         "headers": CORS_HEADERS,
-        "body": json.dumps({
+        "body": dumps({
             "message": "Incidente encontrado",
-            "incidente": incidente_sin_decimals
+            "incidente": incidente,
+            "evidencias_urls": urls_evidencias(incidente, ["miniatura", "media"])
         })
     }
@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from CRUD.contadores import DIMENSIONES, TABLE_CONTADORES, claves_de_incidente, aplicar_deltas
+from CRUD import rollups
+
+
+def _valores(imagen):
+    """Extrae estado/tipo/nivel_urgencia de una imagen del stream (formato tipado)."""
+    if not imagen:
+        return None
+    return {dim: (imagen.get(dim) or {}).get("S", "") for dim in DIMENSIONES}
+
+
+def calcular_deltas(records):
+    """
+    Convierte los registros del stream de incidentes en deltas por contador.
+
+    INSERT suma 1, REMOVE resta 1 y MODIFY mueve el incidente de su
+    combinación anterior a la nueva (sólo si cambió alguna dimensión).
+    """
+    deltas = defaultdict(int)
+    for record in records:
+        datos = record.get("dynamodb", {})
+        anterior = _valores(datos.get("OldImage"))
+        nuevo = _valores(datos.get("NewImage"))
+
+        if anterior == nuevo:
+            continue
+        if anterior:
+            for clave in claves_de_incidente(anterior):
+                deltas[clave] -= 1
+        if nuevo:
+            for clave in claves_de_incidente(nuevo):
+                deltas[clave] += 1
+
+    return {clave: delta for clave, delta in deltas.items() if delta}
+
+
+def lambda_handler(event, context):
+    """
+    Consumidor del stream (NEW_AND_OLD_IMAGES) de la tabla de incidentes que
+    mantiene los contadores exactos usados por list_report y los rollups de
+    analítica (TABLE_ROLLUPS).
+    """
+    records = event.get("Records", [])
+    secuencias = [r.get("dynamodb", {}).get("SequenceNumber", "") for r in records]
+    token_base = f"{secuencias[0]}-{secuencias[-1]}" if secuencias else ""
+
+    actualizados = 0
+    if TABLE_CONTADORES:
+        deltas = calcular_deltas(records)
+        actualizados = aplicar_deltas(deltas, token_base) if deltas else 0
+    else:
+        print("TABLE_CONTADORES no configurada, se ignoran", len(records), "registros")
+
+    rollups_actualizados = 0
+    if rollups.TABLE_ROLLUPS:
+        deltas_rollups = rollups.calcular_deltas(records)
+        rollups_actualizados = rollups.aplicar_deltas(deltas_rollups, token_base) if deltas_rollups else 0
+
+    print(f"Contadores actualizados: {actualizados}, rollups: {rollups_actualizados} (registros: {len(records)})")
+    return {
+        "procesados": len(records),
+        "contadores_actualizados": actualizados,
+        "rollups_actualizados": rollups_actualizados,
+    }
@@ -3,10 +3,12 @@ import json
 from datetime import datetime, timezone
 import boto3
 from CRUD.utils import validar_token
+from CRUD.versiones import INCREMENTO_VERSION, VALORES_INCREMENTO, condicion_version, item_actual, leer_version
+from alerta_comun.respuestas import autenticar
+from alerta_comun.decimales import dumps
 from botocore.exceptions import ClientError
-from decimal import Decimal
-import uuid
 import requests
+from alerta_comun.logs import registrar_log_sistema, registrar_log_auditoria, con_logs
 
 lambda_client = boto3.client("lambda")
 LAMBDA_NOTIFY_INCIDENTE = os.environ.get("LAMBDA_NOTIFY_INCIDENTE")
@@ -15,12 +17,15 @@ dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('TABLE_INCIDENTES')
 incidentes_table = dynamodb.Table(table_name)
 
-logs_table_name = os.environ.get('TABLE_LOGS')
-logs_table = dynamodb.Table(logs_table_name) if logs_table_name else None
-
 CORS_HEADERS = { "Access-Control-Allow-Origin": "*" }
 ESTADO_ENUM = ["reportado", "en_progreso", "resuelto"]
 ADMIN_ESTADOS_PERMITIDOS = ["en_progreso", "resuelto"]
+# Estado nuevo -> estados desde los que se puede llegar (en_progreso admite
+# reasignar el empleado; un incidente resuelto ya no cambia)
+TRANSICIONES_PERMITIDAS = {
+    "en_progreso": ["reportado", "en_progreso"],
+    "resuelto": ["reportado", "en_progreso"],
+}
 
 BREVO_API_KEY = os.environ.get("BREVO_API_KEY")
 EMAIL_FROM = os.environ.get("EMAIL_FROM", "no-reply@example.com")
@@ -54,105 +59,6 @@ def _notificar_incidente_ws(tipo, titulo, mensaje, incidente_id, destinatarios=N
     except Exception as e:
         print("Error al invocar notify_incidente:", repr(e))
 
-def _to_dynamodb_numbers(obj):
-    """
-    Convierte recursivamente int/float -> Decimal.
-    Deja bool, None, str, Decimal, etc. tal cual.
-    Evita el error 'Float types are not supported'.
-    """
-    if isinstance(obj, dict):
-        return {k: _to_dynamodb_numbers(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_to_dynamodb_numbers(x) for x in obj]
-    if isinstance(obj, bool) or obj is None:
-        return obj
-    if isinstance(obj, Decimal):
-        return obj
-    if isinstance(obj, (int, float)):
-        return Decimal(str(obj))
-    return obj
-
-
-def _guardar_log_en_dynamodb(registro):
-    """
-    Guarda el registro en la tabla de logs y lo imprime para CloudWatch.
-    Respeta el esquema de logs.
-    """
-    if not logs_table:
-        print("[LOG_WARNING] TABLE_LOGS no configurada, no se persiste el log.")
-        print("[LOG]", json.dumps(registro, default=str))
-        return
-
-    registro_ddb = _to_dynamodb_numbers(registro)
-
-    print("[LOG]", json.dumps(registro_ddb, default=str))
-
-    try:
-        logs_table.put_item(Item=registro_ddb)
-    except ClientError as e:
-        print("[LOG_ERROR] Error al guardar log en DynamoDB:", repr(e))
-
-
-def registrar_log_sistema(nivel, mensaje, servicio, contexto=None):
-    """
-    Crea un log de tipo 'sistema' siguiendo el esquema.
-    nivel: INFO | WARNING | ERROR | CRITICAL | AUDIT
-    """
-    if contexto is None:
-        contexto = {}
-
-    registro = {
-        "registro_id": str(uuid.uuid4()),
-        "nivel": nivel,
-        "tipo": "sistema",
-        "marca_tiempo": datetime.now(timezone.utc).isoformat(),
-        "detalles_sistema": {
-            "mensaje": mensaje,
-            "servicio": servicio,
-            "contexto": contexto
-        }
-    }
-
-    _guardar_log_en_dynamodb(registro)
-
-
-def registrar_log_auditoria(
-    usuario_correo,
-    entidad,
-    entidad_id,
-    operacion,
-    valores_previos=None,
-    valores_nuevos=None,
-    nivel="AUDIT"
-):
-    """
-    Crea un log de tipo 'auditoria' siguiendo el esquema.
-    operacion: creacion | actualizacion | eliminacion | consulta
-    """
-    if valores_previos is None:
-        valores_previos = {}
-    if valores_nuevos is None:
-        valores_nuevos = {}
-
-    registro = {
-        "registro_id": str(uuid.uuid4()),
-        "nivel": nivel,
-        "tipo": "auditoria",
-        "marca_tiempo": datetime.now(timezone.utc).isoformat(),
-        "detalles_auditoria": {
-            "usuario_correo": usuario_correo,
-            "entidad": entidad,
-            "entidad_id": entidad_id,
-            "operacion": operacion,
-            "valores_previos": valores_previos,
-            "valores_nuevos": valores_nuevos,
-        }
-    }
-
-    _guardar_log_en_dynamodb(registro)
-
-
-
 def enviar_correo_cambio_estado(correo_destino, incidente, estado_nuevo):
     """
     Envía un correo al creador de la incidencia cada vez que cambia el estado.
@@ -212,6 +118,7 @@ def enviar_correo_cambio_estado(correo_destino, incidente, estado_nuevo):
         print("Error al enviar correo de cambio de estado:", repr(e))
 
 
+@con_logs
 def lambda_handler(event, context):
     registrar_log_sistema(
         nivel="INFO",
@@ -220,13 +127,7 @@ def lambda_handler(event, context):
         contexto={"request_id": getattr(context, "aws_request_id", None)}
     )
 
-    headers = event.get("headers") or {}
-    auth_header = headers.get("Authorization") or headers.get("authorization") or ""
-    if auth_header.lower().startswith("bearer "):
-        auth_header = auth_header.split(" ", 1)[1].strip()
-    token = auth_header
-
-    resultado_validacion = validar_token(token)
+    resultado_validacion = autenticar(event, validar_token)
     
     if not resultado_validacion.get("valido"):
         registrar_log_sistema(
@@ -324,101 +225,158 @@ def lambda_handler(event, context):
                 })
             }
 
+    version_esperada, error_version = leer_version(body)
+    if error_version:
+        return {
+            "statusCode": 400,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"message": error_version})
+        }
+
+    ahora = datetime.now(timezone.utc).isoformat()
+    set_expr = ["#estado = :estado", "updated_at = :ahora", INCREMENTO_VERSION]
+    valores = {":estado": estado_nuevo, ":ahora": ahora, **VALORES_INCREMENTO}
+    if estado_nuevo == "en_progreso":
+        set_expr.append("empleado_correo = :empleado")
+        valores[":empleado"] = empleado_correo
+
+    estados_origen = TRANSICIONES_PERMITIDAS[estado_nuevo]
+    for i, estado in enumerate(estados_origen):
+        valores[f":desde{i}"] = estado
+
+    condicion = "attribute_exists(incidente_id) AND #estado IN (" + ", ".join(
+        f":desde{i}" for i in range(len(estados_origen))
+    ) + ")"
+    condicion_vers, valores_vers = condicion_version(version_esperada)
+    if condicion_vers:
+        condicion += " AND " + condicion_vers
+        valores.update(valores_vers)
+
     try:
-        response = incidentes_table.get_item(Key={'incidente_id': incidente_id})
-        if 'Item' not in response:
+        # Una sola escritura: la condición valida existencia, transición y
+        # versión, y ALL_OLD devuelve el item previo para la auditoría
+        response = incidentes_table.update_item(
+            Key={'incidente_id': incidente_id},
+            UpdateExpression="SET " + ", ".join(set_expr),
+            ConditionExpression=condicion,
+            ExpressionAttributeNames={"#estado": "estado"},
+            ExpressionAttributeValues=valores,
+            ReturnValues="ALL_OLD",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD"
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            actual = item_actual(e)
+            if not actual:
+                registrar_log_sistema(
+                    nivel="WARNING",
+                    mensaje="Incidente no encontrado al cambiar estado",
+                    servicio="cambiar_estado_incidencia",
+                    contexto={"incidente_id": incidente_id}
+                )
+                return {
+                    "statusCode": 404,
+                    "headers": CORS_HEADERS,
+                    "body": json.dumps({"message": "Incidente no encontrado"})
+                }
+            if version_esperada is not None and int(actual.get("version", 0)) != version_esperada:
+                registrar_log_sistema(
+                    nivel="WARNING",
+                    mensaje="Conflicto de versión al cambiar estado",
+                    servicio="cambiar_estado_incidencia",
+                    contexto={
+                        "incidente_id": incidente_id,
+                        "version_esperada": version_esperada,
+                        "version_actual": actual.get("version", 0)
+                    }
+                )
+                return {
+                    "statusCode": 409,
+                    "headers": CORS_HEADERS,
+                    "body": dumps({
+                        "message": "El incidente fue modificado por otra persona. Revisa la versión actual y vuelve a intentarlo.",
+                        "incidente": actual
+                    })
+                }
+            estado_actual = actual.get("estado")
             registrar_log_sistema(
                 nivel="WARNING",
-                mensaje="Incidente no encontrado al cambiar estado",
+                mensaje="Transición de estado no permitida",
                 servicio="cambiar_estado_incidencia",
-                contexto={"incidente_id": incidente_id}
+                contexto={"incidente_id": incidente_id, "estado_actual": estado_actual, "estado_nuevo": estado_nuevo}
             )
             return {
-                "statusCode": 404,
+                "statusCode": 409,
                 "headers": CORS_HEADERS,
-                "body": json.dumps({"message": "Incidente no encontrado"})
+                "body": json.dumps({
+                    "message": f"No se puede pasar de '{estado_actual}' a '{estado_nuevo}'",
+                    "estado_actual": estado_actual
+                })
             }
-        
-        incidente_actual = response['Item']
-        incidente_prev = dict(incidente_actual)
-    except ClientError as e:
         registrar_log_sistema(
             nivel="ERROR",
-            mensaje="Error al obtener incidente de DynamoDB",
+            mensaje="Error al actualizar incidente en DynamoDB",
             servicio="cambiar_estado_incidencia",
             contexto={"incidente_id": incidente_id, "error": str(e)}
         )
         return {
             "statusCode": 500,
             "headers": CORS_HEADERS,
-            "body": json.dumps({"message": f"Error al obtener el incidente: {str(e)}"})
+            "body": json.dumps({"message": f"Error al actualizar el incidente: {str(e)}"})
         }
 
-    incidente_nuevo = dict(incidente_actual)
+    incidente_prev = response.get("Attributes", {})
+    incidente_nuevo = dict(incidente_prev)
     incidente_nuevo["estado"] = estado_nuevo
-    incidente_nuevo["updated_at"] = datetime.now(timezone.utc).isoformat()
-
+    incidente_nuevo["updated_at"] = ahora
+    incidente_nuevo["version"] = int(incidente_prev.get("version", 0)) + 1
     if estado_nuevo == "en_progreso":
         incidente_nuevo["empleado_correo"] = empleado_correo
 
-    try:
-        incidentes_table.put_item(Item=incidente_nuevo)
-
-        registrar_log_auditoria(
-            usuario_correo=usuario_autenticado["correo"],
-            entidad="incidente",
-            entidad_id=incidente_id,
-            operacion="actualizacion",
-            valores_previos=incidente_prev,
-            valores_nuevos=incidente_nuevo
-        )
+    registrar_log_auditoria(
+        usuario_correo=usuario_autenticado["correo"],
+        entidad="incidente",
+        entidad_id=incidente_id,
+        operacion="actualizacion",
+        valores_previos=incidente_prev,
+        valores_nuevos=incidente_nuevo
+    )
 
-        registrar_log_sistema(
-            nivel="INFO",
-            mensaje="Estado de incidente actualizado correctamente",
-            servicio="cambiar_estado_incidencia",
-            contexto={
-                "incidente_id": incidente_id,
-                "nuevo_estado": estado_nuevo,
-                "admin_correo": usuario_autenticado["correo"],
-                "empleado_correo": incidente_nuevo.get("empleado_correo")
-            }
-        )
+    registrar_log_sistema(
+        nivel="INFO",
+        mensaje="Estado de incidente actualizado correctamente",
+        servicio="cambiar_estado_incidencia",
+        contexto={
+            "incidente_id": incidente_id,
+            "nuevo_estado": estado_nuevo,
+            "admin_correo": usuario_autenticado["correo"],
+            "empleado_correo": incidente_nuevo.get("empleado_correo")
+        }
+    )
 
-        correo_creador = incidente_nuevo.get("usuario_correo")
-        enviar_correo_cambio_estado(
-            correo_destino=correo_creador,
-            incidente=incidente_nuevo,
-            estado_nuevo=estado_nuevo
-        )
+    correo_creador = incidente_nuevo.get("usuario_correo")
+    enviar_correo_cambio_estado(
+        correo_destino=correo_creador,
+        incidente=incidente_nuevo,
+        estado_nuevo=estado_nuevo
+    )
 
-        mensaje_notif = f"El incidente {incidente_id} cambió su estado a '{estado_nuevo}'."
+    mensaje_notif = f"El incidente {incidente_id} cambió su estado a '{estado_nuevo}'."
 
-        _notificar_incidente_ws(
-            tipo="incidente_actualizado",
-            titulo="Incidente actualizado",
-            mensaje=mensaje_notif,
-            incidente_id=incidente_id,
-        )
+    _notificar_incidente_ws(
+        tipo="incidente_actualizado",
+        titulo="Incidente actualizado",
+        mensaje=mensaje_notif,
+        incidente_id=incidente_id,
+    )
 
-        return {
-            "statusCode": 200,
-            "headers": CORS_HEADERS,
-            "body": json.dumps({
-                "message": "Estado actualizado correctamente",
-                "incidente_id": incidente_id,
-                "nuevo_estado": estado_nuevo
-            })
-        }
-    except ClientError as e:
-        registrar_log_sistema(
-            nivel="ERROR",
-            mensaje="Error al actualizar incidente en DynamoDB",
-            servicio="cambiar_estado_incidencia",
-            contexto={"incidente_id": incidente_id, "error": str(e)}
-        )
-        return {
-            "statusCode": 500,
-            "headers": CORS_HEADERS,
-            "body": json.dumps({"message": f"Error al actualizar el incidente: {str(e)}"})
-        }
+    return {
+        "statusCode": 200,
+        "headers": CORS_HEADERS,
+        "body": json.dumps({
+            "message": "Estado actualizado correctamente",
+            "incidente_id": incidente_id,
+            "nuevo_estado": estado_nuevo,
+            "version": incidente_nuevo["version"]
+        })
+    }
@@ -1,127 +1,82 @@
 import os
 import json
-import base64
 import boto3
 from datetime import datetime, timezone
 from CRUD.utils import validar_token
+from CRUD.evidencias import borrar_evidencias, decodificar_evidencias, subir_evidencias
+from CRUD.versiones import INCREMENTO_VERSION, VALORES_INCREMENTO, condicion_version, item_actual, leer_version
+from alerta_comun.respuestas import autenticar
+from alerta_comun.decimales import a_dynamodb, dumps
 from botocore.exceptions import ClientError
 from decimal import Decimal, InvalidOperation
-import uuid 
+from alerta_comun.logs import registrar_log_sistema, registrar_log_auditoria, con_logs
 
 dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client('s3')
 
 table_name = os.environ.get('TABLE_INCIDENTES')
 incidentes_table = dynamodb.Table(table_name)
 INCIDENTES_BUCKET = os.environ.get('INCIDENTES_BUCKET')
 CORS_HEADERS = { "Access-Control-Allow-Origin": "*" }
 
-logs_table_name = os.environ.get('TABLE_LOGS')
-logs_table = dynamodb.Table(logs_table_name) if logs_table_name else None
-
 TIPO_ENUM = ["limpieza", "TI" ,"seguridad", "mantenimiento", "otro"]
 NIVEL_URGENCIA_ENUM = ["bajo", "medio", "alto", "critico"]
 PISO_RANGO = range(-2, 12)
 
 
-def _to_dynamodb_numbers(obj):
-    """
-    Convierte recursivamente int/float -> Decimal.
-    Deja bool, None, str, Decimal, etc. tal cual.
-    Esto evita el error 'Float types are not supported' cuando hay
-    campos como ubicacion.x / ubicacion.y o piso con decimales.
-    """
-    if isinstance(obj, dict):
-        return {k: _to_dynamodb_numbers(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_to_dynamodb_numbers(x) for x in obj]
-    if isinstance(obj, bool) or obj is None:
-        return obj
-    if isinstance(obj, Decimal):
-        return obj
-    if isinstance(obj, (int, float)):
-        return Decimal(str(obj))
-    return obj
-
-
-def _guardar_log_en_dynamodb(registro):
-    """
-    Guarda el registro en la tabla de logs y lo imprime para CloudWatch.
-    Respeta el esquema de logs.
-    """
-    if not logs_table:
-        print("[LOG_WARNING] TABLE_LOGS no configurada, no se persiste el log.")
-        print("[LOG]", json.dumps(registro, default=str))
-        return
-
-    registro_ddb = _to_dynamodb_numbers(registro)
-
-    print("[LOG]", json.dumps(registro_ddb, default=str))
+def _respuesta_no_encontrado(incidente_id):
+    registrar_log_sistema(
+        nivel="WARNING",
+        mensaje="Incidente no encontrado al actualizar",
+        servicio="actualizar_incidencia",
+        contexto={"incidente_id": incidente_id}
+    )
+    return {
+        "statusCode": 404,
+        "headers": CORS_HEADERS,
+        "body": json.dumps({"message": "Incidente no encontrado"})
+    }
 
-    try:
-        logs_table.put_item(Item=registro_ddb)
-    except ClientError as e:
-        print("[LOG_ERROR] Error al guardar log en DynamoDB:", repr(e))
-
-
-def registrar_log_sistema(nivel, mensaje, servicio, contexto=None):
-    """
-    Crea un log de tipo 'sistema' siguiendo el esquema.
-    nivel: INFO | WARNING | ERROR | CRITICAL | AUDIT
-    """
-    if contexto is None:
-        contexto = {}
-
-    registro = {
-        "registro_id": str(uuid.uuid4()),
-        "nivel": nivel,
-        "tipo": "sistema",
-        "marca_tiempo": datetime.now(timezone.utc).isoformat(),
-        "detalles_sistema": {
-            "mensaje": mensaje,
-            "servicio": servicio,
-            "contexto": contexto
+
+def _respuesta_no_es_dueno(incidente_id, usuario_autenticado, incidente):
+    registrar_log_sistema(
+        nivel="WARNING",
+        mensaje="Usuario intenta actualizar incidente de otro usuario",
+        servicio="actualizar_incidencia",
+        contexto={
+            "incidente_id": incidente_id,
+            "usuario_correo": usuario_autenticado["correo"],
+            "owner_incidente": incidente.get("usuario_correo")
         }
+    )
+    return {
+        "statusCode": 403,
+        "headers": CORS_HEADERS,
+        "body": json.dumps({"message": "Solo puedes actualizar tus propios incidentes"})
     }
 
-    _guardar_log_en_dynamodb(registro)
-
-
-def registrar_log_auditoria(
-    usuario_correo,
-    entidad,
-    entidad_id,
-    operacion,
-    valores_previos=None,
-    valores_nuevos=None,
-    nivel="AUDIT"
-):
-    """
-    Crea un log de tipo 'auditoria' siguiendo el esquema.
-    operacion: creacion | actualizacion | eliminacion | consulta
-    """
-    if valores_previos is None:
-        valores_previos = {}
-    if valores_nuevos is None:
-        valores_nuevos = {}
-
-    registro = {
-        "registro_id": str(uuid.uuid4()),
-        "nivel": nivel,
-        "tipo": "auditoria",
-        "marca_tiempo": datetime.now(timezone.utc).isoformat(),
-        "detalles_auditoria": {
-            "usuario_correo": usuario_correo,
-            "entidad": entidad,
-            "entidad_id": entidad_id,
-            "operacion": operacion,
-            "valores_previos": valores_previos,
-            "valores_nuevos": valores_nuevos,
+
+def _respuesta_conflicto(incidente_id, version_esperada, actual):
+    registrar_log_sistema(
+        nivel="WARNING",
+        mensaje="Conflicto de versión al actualizar incidente",
+        servicio="actualizar_incidencia",
+        contexto={
+            "incidente_id": incidente_id,
+            "version_esperada": version_esperada,
+            "version_actual": actual.get("version", 0)
         }
+    )
+    return {
+        "statusCode": 409,
+        "headers": CORS_HEADERS,
+        "body": dumps({
+            "message": "El incidente fue modificado por otra persona. Revisa la versión actual y vuelve a intentarlo.",
+            "incidente": actual
+        })
     }
 
-    _guardar_log_en_dynamodb(registro)
 
+@con_logs
 def lambda_handler(event, context):
     registrar_log_sistema(
         nivel="INFO",
@@ -130,12 +85,7 @@ def lambda_handler(event, context):
         contexto={"request_id": getattr(context, "aws_request_id", None)}
     )
 
-    headers = event.get("headers") or {}
-    auth_header = headers.get("Authorization") or headers.get("authorization") or ""
-    if auth_header.lower().startswith("bearer "):
-        auth_header = auth_header.split(" ", 1)[1].strip()
-    token = auth_header
-    resultado_validacion = validar_token(token)
+    resultado_validacion = autenticar(event, validar_token)
 
     if not resultado_validacion.get("valido"):
         registrar_log_sistema(
@@ -269,80 +219,25 @@ def lambda_handler(event, context):
                 "body": json.dumps({"message": "'lat' y 'lng' deben ser números válidos"})
             }
 
-    try:
-        response = incidentes_table.get_item(Key={'incidente_id': incidente_id})
-        if 'Item' not in response:
-            registrar_log_sistema(
-                nivel="WARNING",
-                mensaje="Incidente no encontrado al actualizar",
-                servicio="actualizar_incidencia",
-                contexto={"incidente_id": incidente_id}
-            )
-            return {
-                "statusCode": 404,
-                "headers": CORS_HEADERS,
-                "body": json.dumps({"message": "Incidente no encontrado"})
-            }
-        incidente_actual = response['Item']
-        incidente_prev = dict(incidente_actual)
-    except ClientError as e:
-        registrar_log_sistema(
-            nivel="ERROR",
-            mensaje="Error al obtener incidente de DynamoDB",
-            servicio="actualizar_incidencia",
-            contexto={"incidente_id": incidente_id, "error": str(e)}
-        )
-        return {
-            "statusCode": 500,
-            "headers": CORS_HEADERS,
-            "body": json.dumps({"message": f"Error al obtener el incidente: {str(e)}"})
-        }
-
-    if incidente_actual.get("usuario_correo") != usuario_autenticado["correo"]:
-        registrar_log_sistema(
-            nivel="WARNING",
-            mensaje="Usuario intenta actualizar incidente de otro usuario",
-            servicio="actualizar_incidencia",
-            contexto={
-                "incidente_id": incidente_id,
-                "usuario_correo": usuario_autenticado["correo"],
-                "owner_incidente": incidente_actual.get("usuario_correo")
-            }
-        )
+    version_esperada, error_version = leer_version(body)
+    if error_version:
         return {
-            "statusCode": 403,
+            "statusCode": 400,
             "headers": CORS_HEADERS,
-            "body": json.dumps({"message": "Solo puedes actualizar tus propios incidentes"})
+            "body": json.dumps({"message": error_version})
         }
 
-    evidencia_url = None
+    evidencias_urls = None
     if 'evidencias' in body and body['evidencias'] is not None:
-        image_data = body['evidencias']
-
-        if not isinstance(image_data, dict):
-            return {
-                "statusCode": 400,
-                "headers": CORS_HEADERS,
-                "body": json.dumps({"message": "'evidencias' debe ser un objeto con 'file_base64'"})
-            }
-
-        file_b64 = image_data.get("file_base64")
-        if not file_b64:
-            return {
-                "statusCode": 400,
-                "headers": CORS_HEADERS,
-                "body": json.dumps({"message": "'file_base64' es requerido en 'evidencias'"})
-            }
-
         try:
-            file_bytes = base64.b64decode(file_b64)
-        except Exception as e:
+            archivos = decodificar_evidencias(body['evidencias'])
+        except ValueError as e:
             return {
                 "statusCode": 400,
                 "headers": CORS_HEADERS,
-                "body": json.dumps({"message": f"file_base64 inválido: {e}"})
+                "body": json.dumps({"message": str(e)})
             }
-
+        
         if not INCIDENTES_BUCKET:
             return {
                 "statusCode": 500,
@@ -350,17 +245,30 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "INCIDENTES_BUCKET no configurado"})
             }
 
-        key = f"evidencia_{incidente_id}"
-        content_type = "image/png"
-
+        # Las evidencias se escriben en S3 antes del update, así que el dueño
+        # y la versión se comprueban antes de subirlas
         try:
-            s3.put_object(
-                Bucket=INCIDENTES_BUCKET,
-                Key=key,
-                Body=file_bytes,
-                ContentType=content_type
+            response = incidentes_table.get_item(
+                Key={'incidente_id': incidente_id},
+                ConsistentRead=True
             )
-            evidencia_url = f"s3://{INCIDENTES_BUCKET}/{key}"
+        except ClientError as e:
+            return {
+                "statusCode": 500,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"message": f"Error al obtener el incidente: {str(e)}"})
+            }
+        if 'Item' not in response:
+            return _respuesta_no_encontrado(incidente_id)
+        if response['Item'].get("usuario_correo") != usuario_autenticado["correo"]:
+            return _respuesta_no_es_dueno(incidente_id, usuario_autenticado, response['Item'])
+        if version_esperada is not None and int(response['Item'].get("version", 0)) != version_esperada:
+            return _respuesta_conflicto(incidente_id, version_esperada, response['Item'])
+
+        # Claves nuevas en cada intento: si el update de abajo no se aplica,
+        # se borran y las evidencias vigentes del incidente no se tocan
+        try:
+            evidencias_urls = subir_evidencias(incidente_id, archivos, claves_unicas=True)
         except ClientError as e:
             code = e.response.get("Error", {}).get("Code")
             if code == "AccessDenied":
@@ -387,58 +295,58 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": f"Error interno al subir la imagen: {e}"})
             }
 
-    incidente_actual.update({
+    cambios = {
         "titulo": body["titulo"],
         "descripcion": body["descripcion"],
         "piso": piso_val,
         "ubicacion": body["ubicacion"],
         "tipo": body["tipo"],
         "nivel_urgencia": body["nivel_urgencia"],
-        "evidencias": [evidencia_url] if evidencia_url else incidente_actual.get("evidencias", []),
         "updated_at": datetime.now(timezone.utc).isoformat(),
-    })
-
+    }
+    if evidencias_urls:
+        cambios["evidencias"] = evidencias_urls
     if coordenadas is not None:
-        incidente_actual["coordenadas"] = {
+        cambios["coordenadas"] = {
             "lat": lat,
             "lng": lng
         }
 
-    incidente_ddb = _to_dynamodb_numbers(incidente_actual)
+    nombres = {f"#c{i}": campo for i, campo in enumerate(cambios)}
+    valores = {f":c{i}": valor for i, valor in enumerate(a_dynamodb(cambios).values())}
+    valores.update(VALORES_INCREMENTO)
+    valores[":correo"] = usuario_autenticado["correo"]
 
-    try:
-        incidentes_table.put_item(Item=incidente_ddb)
-
-        registrar_log_auditoria(
-            usuario_correo=usuario_autenticado["correo"],
-            entidad="incidente",
-            entidad_id=incidente_id,
-            operacion="actualizacion",
-            valores_previos=incidente_prev,
-            valores_nuevos=incidente_actual
-        )
+    condicion = "attribute_exists(incidente_id) AND usuario_correo = :correo"
+    condicion_vers, valores_vers = condicion_version(version_esperada)
+    if condicion_vers:
+        condicion += " AND " + condicion_vers
+        valores.update(valores_vers)
 
-        registrar_log_sistema(
-            nivel="INFO",
-            mensaje="Incidente actualizado correctamente por estudiante",
-            servicio="actualizar_incidencia",
-            contexto={
-                "incidente_id": incidente_id,
-                "usuario_correo": usuario_autenticado["correo"],
-                "tipo": body["tipo"],
-                "nivel_urgencia": body["nivel_urgencia"]
-            }
+    try:
+        # Una sola escritura: dueño, existencia y versión se validan en la
+        # condición; ALL_OLD trae el item previo para la auditoría
+        response = incidentes_table.update_item(
+            Key={'incidente_id': incidente_id},
+            UpdateExpression="SET " + ", ".join(
+                [f"#c{i} = :c{i}" for i in range(len(cambios))] + [INCREMENTO_VERSION]
+            ),
+            ConditionExpression=condicion,
+            ExpressionAttributeNames=nombres,
+            ExpressionAttributeValues=valores,
+            ReturnValues="ALL_OLD",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD"
         )
-
-        return {
-            "statusCode": 200,
-            "headers": CORS_HEADERS,
-            "body": json.dumps({
-                "message": "Incidente actualizado correctamente",
-                "incidente_id": incidente_id
-            })
-        }
     except ClientError as e:
+        if evidencias_urls:
+            borrar_evidencias(evidencias_urls)
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            actual = item_actual(e)
+            if not actual:
+                return _respuesta_no_encontrado(incidente_id)
+            if actual.get("usuario_correo") != usuario_autenticado["correo"]:
+                return _respuesta_no_es_dueno(incidente_id, usuario_autenticado, actual)
+            return _respuesta_conflicto(incidente_id, version_esperada, actual)
         registrar_log_sistema(
             nivel="ERROR",
             mensaje="Error al actualizar incidente en DynamoDB",
@@ -450,3 +358,41 @@ def lambda_handler(event, context):
             "headers": CORS_HEADERS,
             "body": json.dumps({"message": f"Error al actualizar el incidente: {str(e)}"})
         }
+
+    incidente_prev = response.get("Attributes", {})
+    if evidencias_urls:
+        # Las evidencias reemplazadas quedaron en otras claves
+        borrar_evidencias([e for e in incidente_prev.get("evidencias") or [] if e not in evidencias_urls])
+    incidente_nuevo = {**incidente_prev, **cambios}
+    incidente_nuevo["version"] = int(incidente_prev.get("version", 0)) + 1
+
+    registrar_log_auditoria(
+        usuario_correo=usuario_autenticado["correo"],
+        entidad="incidente",
+        entidad_id=incidente_id,
+        operacion="actualizacion",
+        valores_previos=incidente_prev,
+        valores_nuevos=incidente_nuevo
+    )
+
+    registrar_log_sistema(
+        nivel="INFO",
+        mensaje="Incidente actualizado correctamente por estudiante",
+        servicio="actualizar_incidencia",
+        contexto={
+            "incidente_id": incidente_id,
+            "usuario_correo": usuario_autenticado["correo"],
+            "tipo": body["tipo"],
+            "nivel_urgencia": body["nivel_urgencia"]
+        }
+    )
+
+    return {
+        "statusCode": 200,
+        "headers": CORS_HEADERS,
+        "body": json.dumps({
+            "message": "Incidente actualizado correctamente",
+            "incidente_id": incidente_id,
+            "version": incidente_nuevo["version"]
+        })
+    }
@@ -1,6 +1,12 @@
-import jwt
 import os
+import json
+import hmac
+import base64
+import hashlib
 from datetime import datetime, timedelta
+from decimal import Decimal
+from alerta_comun.decimales import json_default
+from alerta_comun.tokens import decodificar_token
 
 # Solo necesitamos JWT_SECRET, no tablas de DynamoDB
 JWT_SECRET = os.getenv("JWT_SECRET")
@@ -24,8 +30,11 @@ def validar_token(token):
     if not token:
         return {"valido": False, "error": "Token es obligatorio"}
 
+    # PyJWT sólo se carga si no llegó el contexto del Authorizer (ver alerta_comun.respuestas.autenticar)
+    import jwt
+
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decodificar_token(token, JWT_SECRET, JWT_ALGORITHM)
         rol = payload.get("rol", payload.get("rol", "estudiante"))
         
         return {
@@ -37,4 +46,52 @@ def validar_token(token):
     except jwt.ExpiredSignatureError:
         return {"valido": False, "error": "Token expirado"}
     except jwt.InvalidTokenError:
-        return {"valido": False, "error": "Token inválido"}
\ No newline at end of file
+        return {"valido": False, "error": "Token inválido"}
+
+def firmar_cursor(last_evaluated_key, contexto=""):
+    """
+    Convierte un LastEvaluatedKey de DynamoDB en un cursor opaco y firmado.
+
+    El cursor es base64url(json) + "." + HMAC-SHA256 con JWT_SECRET, de modo
+    que el cliente no puede fabricar ni alterar claves de inicio. `contexto`
+    liga el cursor a la consulta que lo generó (filtros / índice).
+    """
+    if not last_evaluated_key:
+        return None
+
+    datos = json.dumps(
+        {"k": last_evaluated_key, "c": contexto},
+        default=json_default,
+        separators=(",", ":"),
+        sort_keys=True,
+    ).encode("utf-8")
+    cuerpo = base64.urlsafe_b64encode(datos).decode("ascii").rstrip("=")
+    firma = hmac.new((JWT_SECRET or "").encode("utf-8"), cuerpo.encode("ascii"), hashlib.sha256)
+    return f"{cuerpo}.{firma.hexdigest()}"
+
+
+def leer_cursor(cursor, contexto=""):
+    """
+    Valida un cursor generado por firmar_cursor y retorna el ExclusiveStartKey.
+
+    Returns:
+        dict | None: la clave de inicio, o None si el cursor es inválido,
+        fue alterado o pertenece a otra consulta.
+    """
+    if not cursor or not isinstance(cursor, str) or "." not in cursor:
+        return None
+
+    cuerpo, firma = cursor.rsplit(".", 1)
+    esperada = hmac.new((JWT_SECRET or "").encode("utf-8"), cuerpo.encode("ascii"), hashlib.sha256)
+    if not hmac.compare_digest(esperada.hexdigest(), firma):
+        return None
+
+    try:
+        relleno = "=" * (-len(cuerpo) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cuerpo + relleno), parse_float=Decimal, parse_int=Decimal)
+    except (ValueError, TypeError):
+        return None
+
+    if datos.get("c") != contexto or not isinstance(datos.get("k"), dict):
+        return None
+    return datos["k"]
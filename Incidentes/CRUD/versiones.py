@@ -0,0 +1,47 @@
+from boto3.dynamodb.types import TypeDeserializer
+
+# Concurrencia optimista de incidentes: cada escritura incrementa `version` y,
+# si el cliente envía la versión que leyó, sólo se aplica si sigue vigente.
+# Los incidentes creados antes de este atributo cuentan como versión 0.
+INCREMENTO_VERSION = "version = if_not_exists(version, :version_cero) + :version_uno"
+VALORES_INCREMENTO = {":version_cero": 0, ":version_uno": 1}
+
+_deserializer = TypeDeserializer()
+
+
+def leer_version(body):
+    """
+    Versión esperada enviada por el cliente.
+
+    Returns:
+        tuple: (version | None, error | None)
+    """
+    if body.get("version") is None:
+        return None, None
+    try:
+        version = int(body["version"])
+    except (TypeError, ValueError):
+        return None, "'version' debe ser un número entero"
+    if version < 0:
+        return None, "'version' debe ser un número entero"
+    return version, None
+
+
+def condicion_version(version):
+    """
+    Fragmento de ConditionExpression y valores para comprobar la versión
+    esperada. Sin versión no se agrega condición (clientes antiguos).
+    """
+    if version is None:
+        return None, {}
+    if version == 0:
+        return "(attribute_not_exists(version) OR version = :version_esperada)", {":version_esperada": 0}
+    return "version = :version_esperada", {":version_esperada": version}
+
+
+def item_actual(error):
+    """Item devuelto por ReturnValuesOnConditionCheckFailure=ALL_OLD, deserializado."""
+    item = error.response.get("Item")
+    if not item:
+        return None
+    return {k: _deserializer.deserialize(v) for k, v in item.items()}
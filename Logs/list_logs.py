@@ -4,53 +4,50 @@ import math
 import boto3
 from boto3.dynamodb.conditions import Attr
 from utils import validar_token
-from decimal import Decimal
+from alerta_comun.respuestas import responder, safe_int, autenticar
 
 TABLE_LOGS = os.environ.get("TABLE_LOGS")
-CORS_HEADERS = {
-    "Access-Control-Allow-Origin": "*"
-}
+TABLE_CONTADORES = os.environ.get("TABLE_CONTADORES")
+CLAVE_TOTAL_LOGS = "logs|total"
 
-def _convert_decimals(obj):
+def _contar_logs(table, filter_expr):
     """
-    Convierte recursivamente Decimal -> int/float para que sea JSON serializable
-    y los números sigan siendo números en el JSON.
+    Total de logs. Sin filtros se lee el contador materializado que mantiene
+    stream_contadores (un GetItem); en otro caso, o si el contador aún no
+    existe, se cuenta con Select=COUNT.
     """
-    if isinstance(obj, list):
-        return [_convert_decimals(x) for x in obj]
-    if isinstance(obj, dict):
-        return {k: _convert_decimals(v) for k, v in obj.items()}
-    if isinstance(obj, Decimal):
-        if obj % 1 == 0:
-            return int(obj)
-        return float(obj)
-    return obj
-
-def _resp(code, body):
-    safe_body = _convert_decimals(body)
-    return {
-        "statusCode": code,
-        "headers": CORS_HEADERS,
-        "body": json.dumps(safe_body, ensure_ascii=False)
+    if filter_expr is None and TABLE_CONTADORES:
+        ddb = boto3.resource("dynamodb")
+        resp = ddb.Table(TABLE_CONTADORES).get_item(
+            Key={"contador_id": CLAVE_TOTAL_LOGS},
+            ConsistentRead=True
+        )
+        if "Item" in resp:
+            return int(resp["Item"].get("total", 0))
+
+    total = 0
+    count_args = {
+        "Select": "COUNT"
     }
+    if filter_expr is not None:
+        count_args["FilterExpression"] = filter_expr
 
-def _safe_int(v, default):
-    try:
-        return int(v)
-    except Exception:
-        return default
+    lek = None
+    while True:
+        if lek:
+            count_args["ExclusiveStartKey"] = lek
+        rcount = table.scan(**count_args)
+        total += rcount.get("Count", 0)
+        lek = rcount.get("LastEvaluatedKey")
+        if not lek:
+            break
+    return total
 
 def lambda_handler(event, context):
-    headers = event.get("headers") or {}
-    auth_header = headers.get("Authorization") or headers.get("authorization") or ""
-    if auth_header.lower().startswith("bearer "):
-        auth_header = auth_header.split(" ", 1)[1].strip()
-    token = auth_header
-
-    resultado_validacion = validar_token(token)
+    resultado_validacion = autenticar(event, validar_token)
 
     if not resultado_validacion.get("valido"):
-        return _resp(401, {"error": resultado_validacion.get("error")})
+        return responder(401, {"error": resultado_validacion.get("error")})
 
     usuario_autenticado = {
         "correo": resultado_validacion.get("correo"),
@@ -60,11 +57,11 @@ def lambda_handler(event, context):
     rol = usuario_autenticado["rol"]
 
     if rol not in ["personal_administrativo", "autoridad"]:
-        return _resp(403, {"error": "No tienes permisos para listar logs"})
+        return responder(403, {"error": "No tienes permisos para listar logs"})
 
     body = json.loads(event.get("body") or "{}")
-    page = _safe_int(body.get("page", 0), 0)
-    size = _safe_int(body.get("size", body.get("limit", 10)), 10)
+    page = safe_int(body.get("page", 0), 0)
+    size = safe_int(body.get("size", body.get("limit", 10)), 10)
 
     if size <= 0 or size > 100:
         size = 10
@@ -76,27 +73,12 @@ def lambda_handler(event, context):
 
     filter_expr = None
 
-    total = 0
-    count_args = {
-        "Select": "COUNT"
-    }
-    if filter_expr is not None:
-        count_args["FilterExpression"] = filter_expr
-
-    lek = None
-    while True:
-        if lek:
-            count_args["ExclusiveStartKey"] = lek
-        rcount = table.scan(**count_args)
-        total += rcount.get("Count", 0)
-        lek = rcount.get("LastEvaluatedKey")
-        if not lek:
-            break
+    total = _contar_logs(table, filter_expr)
 
     total_pages = math.ceil(total / size) if size > 0 else 0
 
     if total_pages and page >= total_pages:
-        return _resp(200, {
+        return responder(200, {
             "contents": [],
             "page": page,
             "size": size,
@@ -117,7 +99,7 @@ def lambda_handler(event, context):
         rskip = table.scan(**qargs)
         lek = rskip.get("LastEvaluatedKey")
         if not lek:
-            return _resp(200, {
+            return responder(200, {
                 "contents": [],
                 "page": page,
                 "size": size,
@@ -130,7 +112,7 @@ def lambda_handler(event, context):
     rpage = table.scan(**qargs)
     items = rpage.get("Items", [])
 
-    return _resp(200, {
+    return responder(200, {
         "contents": items,
         "page": page,
         "size": size,
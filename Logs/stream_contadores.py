@@ -0,0 +1,48 @@
+import os
+import hashlib
+
+import boto3
+
+TABLE_CONTADORES = os.environ.get("TABLE_CONTADORES")
+CLAVE_TOTAL_LOGS = "logs|total"
+
+dynamodb_client = boto3.client("dynamodb")
+
+
+def lambda_handler(event, context):
+    """
+    Consumidor del stream de la tabla de logs: mantiene el total de logs
+    (INSERT suma, REMOVE resta, incluidas las expiraciones por TTL) para que
+    list_logs no tenga que contar la tabla en cada página.
+    """
+    records = event.get("Records", [])
+    if not TABLE_CONTADORES:
+        print("TABLE_CONTADORES no configurada, se ignoran", len(records), "registros")
+        return {"procesados": 0}
+
+    delta = 0
+    for record in records:
+        if record.get("eventName") == "INSERT":
+            delta += 1
+        elif record.get("eventName") == "REMOVE":
+            delta -= 1
+
+    if delta:
+        secuencias = [r.get("dynamodb", {}).get("SequenceNumber", "") for r in records]
+        token = hashlib.sha256(f"{secuencias[0]}-{secuencias[-1]}".encode("utf-8")).hexdigest()[:36]
+        # ClientRequestToken hace idempotente el reintento del mismo lote
+        dynamodb_client.transact_write_items(
+            TransactItems=[{
+                "Update": {
+                    "TableName": TABLE_CONTADORES,
+                    "Key": {"contador_id": {"S": CLAVE_TOTAL_LOGS}},
+                    "UpdateExpression": "ADD #total :delta",
+                    "ExpressionAttributeNames": {"#total": "total"},
+                    "ExpressionAttributeValues": {":delta": {"N": str(delta)}},
+                }
+            }],
+            ClientRequestToken=token,
+        )
+
+    print(f"Total de logs ajustado en {delta} (registros: {len(records)})")
+    return {"procesados": len(records), "delta": delta}
@@ -1,6 +1,6 @@
-import jwt
 import os
 from datetime import datetime, timedelta
+from alerta_comun.tokens import decodificar_token
 
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = "HS256"
@@ -23,8 +23,11 @@ def validar_token(token):
     if not token:
         return {"valido": False, "error": "Token es obligatorio"}
 
+    # PyJWT sólo se carga si no llegó el contexto del Authorizer (ver alerta_comun.respuestas.autenticar)
+    import jwt
+
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decodificar_token(token, JWT_SECRET, JWT_ALGORITHM)
         rol = payload.get("rol", payload.get("rol", "estudiante"))
         
         return {
@@ -1,46 +1,186 @@
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.types import TypeDeserializer
 
+# Envíos simultáneos a post_to_connection. El pool HTTP del cliente se
+# dimensiona igual para que los hilos no esperen una conexión libre.
+NOTIFY_MAX_WORKERS = int(os.getenv("NOTIFY_MAX_WORKERS", "32"))
+# Consultas simultáneas al GSI cuando la notificación tiene destinatarios
+NOTIFY_QUERY_MAX_WORKERS = int(os.getenv("NOTIFY_QUERY_MAX_WORKERS", "8"))
+INDICE_USUARIO_CORREO = "UsuarioCorreoIndex"
+# BatchWriteItem acepta como máximo 25 escrituras por llamada
+MAX_ITEMS_BATCH = 25
+MAX_REINTENTOS_BATCH = 5
+# Errores de envío que se incluyen como ejemplo en el resumen del broadcast
+MAX_ERRORES_RESUMEN = 5
+
+TABLE_CONEXIONES = os.environ["TABLE_CONEXIONES"]
 dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(os.environ["TABLE_CONEXIONES"])
+table = dynamodb.Table(TABLE_CONEXIONES)
+# El cliente de bajo nivel es thread-safe (el recurso Table no lo es)
+dynamodb_client = boto3.client(
+    "dynamodb",
+    config=Config(max_pool_connections=NOTIFY_QUERY_MAX_WORKERS)
+)
+_deserializer = TypeDeserializer()
 management_api = boto3.client(
     "apigatewaymanagementapi",
-    endpoint_url=os.environ["WEBSOCKET_API_ENDPOINT"].replace("wss://", "https://")
+    endpoint_url=os.environ["WEBSOCKET_API_ENDPOINT"].replace("wss://", "https://"),
+    config=Config(max_pool_connections=NOTIFY_MAX_WORKERS)
 )
 
 
-def _broadcast(conexiones, payload):
-    eliminados = []
-    enviados = 0
-    for conn in conexiones:
-        connection_id = conn["conexion_id"]
-        try:
-            management_api.post_to_connection(
-                ConnectionId=connection_id,
-                Data=json.dumps(payload, ensure_ascii=False).encode("utf-8")
-            )
-            enviados += 1
-            print(f"✓ Enviado a {conn.get('usuario_correo')} ({connection_id})")
-        except ClientError as exc:
-            status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
-            if status == 410:
-                eliminados.append(connection_id)
-                print(f"✗ Conexión obsoleta: {connection_id}")
-            else:
-                print(f"Error enviando a {connection_id}: {exc}")
-    
-    for connection_id in eliminados:
+def _enviar(conn, data):
+    """
+    Envía el payload ya serializado a una conexión. No escribe logs (se
+    resume todo el broadcast al final) y nunca lanza excepción.
+
+    Returns:
+        tuple: ("enviado" | "obsoleta" (410) | "error", detalle del error o None)
+    """
+    connection_id = conn["conexion_id"]
+    try:
+        management_api.post_to_connection(ConnectionId=connection_id, Data=data)
+        return "enviado", None
+    except ClientError as exc:
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status == 410:
+            return "obsoleta", None
+        return "error", f"{connection_id}: {exc}"
+    except Exception as exc:
+        return "error", f"{connection_id}: {exc}"
+
+
+def _eliminar_conexiones(connection_ids):
+    """
+    Borra conexiones obsoletas con BatchWriteItem (hasta 25 por llamada),
+    reintentando los UnprocessedItems con backoff. Retorna cuántas se borraron.
+    """
+    request_items = {
+        TABLE_CONEXIONES: [
+            {"DeleteRequest": {"Key": {"conexion_id": {"S": connection_id}}}}
+            for connection_id in connection_ids
+        ]
+    }
+    for intento in range(MAX_REINTENTOS_BATCH):
         try:
-            table.delete_item(Key={"conexion_id": connection_id})
+            response = dynamodb_client.batch_write_item(RequestItems=request_items)
         except Exception as e:
-            print(f"Error eliminando conexión {connection_id}: {e}")
-    
-    return enviados
+            print(f"Error eliminando conexiones obsoletas: {e}")
+            break
+        request_items = response.get("UnprocessedItems") or {}
+        if not request_items:
+            break
+        time.sleep(0.05 * (2 ** intento))
+
+    pendientes = len(request_items.get(TABLE_CONEXIONES, []))
+    if pendientes:
+        print(f"⚠️ {pendientes} conexiones obsoletas sin eliminar")
+    return len(connection_ids) - pendientes
+
+
+def _broadcast(conexiones, payload):
+    """
+    Envía el payload a todas las conexiones con un pool acotado de hilos
+    (NOTIFY_MAX_WORKERS) que comparten el mismo cliente. El payload se
+    serializa una sola vez.
+
+    Las conexiones que responden 410 se borran en lotes de 25 mientras el
+    envío continúa. Se escribe una sola línea de log con el resumen.
+
+    Returns:
+        tuple: (mensajes_enviados, conexiones_eliminadas)
+    """
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    obsoletas = []
+    limpiezas = []
+    enviados = 0
+    total_obsoletas = 0
+    errores = []
+
+    with ThreadPoolExecutor(max_workers=2) as pool_limpieza:
+        with ThreadPoolExecutor(max_workers=max(1, min(NOTIFY_MAX_WORKERS, len(conexiones)))) as pool:
+            futuros = {pool.submit(_enviar, conn, data): conn for conn in conexiones}
+            for futuro in as_completed(futuros):
+                resultado, detalle = futuro.result()
+                if resultado == "enviado":
+                    enviados += 1
+                elif resultado == "error":
+                    errores.append(detalle)
+                elif resultado == "obsoleta":
+                    total_obsoletas += 1
+                    obsoletas.append(futuros[futuro]["conexion_id"])
+                    if len(obsoletas) == MAX_ITEMS_BATCH:
+                        limpiezas.append(pool_limpieza.submit(_eliminar_conexiones, obsoletas))
+                        obsoletas = []
+
+        if obsoletas:
+            limpiezas.append(pool_limpieza.submit(_eliminar_conexiones, obsoletas))
+        eliminadas = sum(limpieza.result() for limpieza in limpiezas)
+
+    print(
+        f"📤 Broadcast: {enviados} enviados, {len(errores)} fallidos, "
+        f"{total_obsoletas} obsoletas ({eliminadas} eliminadas) de {len(conexiones)} conexiones"
+    )
+    for detalle in errores[:MAX_ERRORES_RESUMEN]:
+        print(f"  ❌ {detalle}")
+
+    return enviados, eliminadas
+
+
+def _conexiones_de_usuario(correo):
+    """Conexiones abiertas de un usuario vía query sobre UsuarioCorreoIndex."""
+    conexiones = []
+    kwargs = {
+        "TableName": TABLE_CONEXIONES,
+        "IndexName": INDICE_USUARIO_CORREO,
+        "KeyConditionExpression": "usuario_correo = :correo",
+        "ExpressionAttributeValues": {":correo": {"S": correo}},
+    }
+    while True:
+        response = dynamodb_client.query(**kwargs)
+        for item in response.get("Items", []):
+            conexiones.append({k: _deserializer.deserialize(v) for k, v in item.items()})
+        if "LastEvaluatedKey" not in response:
+            return conexiones
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _conexiones_de_destinatarios(destinatarios):
+    """
+    Una query al GSI por destinatario, hasta NOTIFY_QUERY_MAX_WORKERS a la
+    vez. Notificar a un usuario cuesta unas pocas lecturas en lugar de
+    escanear todas las conexiones abiertas.
+    """
+    correos = list(dict.fromkeys(d for d in destinatarios if isinstance(d, str) and d))
+    if not correos:
+        return []
+
+    conexiones = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(NOTIFY_QUERY_MAX_WORKERS, len(correos)))) as pool:
+        for resultado in pool.map(_conexiones_de_usuario, correos):
+            for conn in resultado:
+                conexiones[conn["conexion_id"]] = conn
+    return list(conexiones.values())
+
+
+def _todas_las_conexiones():
+    scan_kwargs = {}
+    conexiones = []
+    response = table.scan(**scan_kwargs)
+    conexiones.extend(response.get("Items", []))
+    while "LastEvaluatedKey" in response:
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        response = table.scan(**scan_kwargs)
+        conexiones.extend(response.get("Items", []))
+    return conexiones
 
 
 def _parse_body(event):
@@ -97,30 +237,23 @@ def lambda_handler(event, context):
             })
         }
 
-    # Escanear conexiones
-    scan_kwargs = {}
-    if destinatarios and isinstance(destinatarios, list) and len(destinatarios) > 0:
-        filter_expr = Attr("usuario_correo").is_in(destinatarios)
-        scan_kwargs["FilterExpression"] = filter_expr
+    # Buscar conexiones
+    dirigida = bool(destinatarios and isinstance(destinatarios, list) and len(destinatarios) > 0)
+    if dirigida:
         print(f"🔍 Buscando conexiones para destinatarios específicos...")
     else:
         print(f"🔍 Buscando TODAS las conexiones activas...")
 
-    conexiones = []
     try:
-        response = table.scan(**scan_kwargs)
-        conexiones.extend(response.get("Items", []))
-        while "LastEvaluatedKey" in response:
-            scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-            response = table.scan(**scan_kwargs)
-            conexiones.extend(response.get("Items", []))
-        
+        if dirigida:
+            conexiones = _conexiones_de_destinatarios(destinatarios)
+        else:
+            conexiones = _todas_las_conexiones()
+
         print(f"📊 Conexiones encontradas: {len(conexiones)}")
-        for conn in conexiones:
-            print(f"  - {conn.get('usuario_correo')} ({conn.get('rol')}) - ID: {conn.get('conexion_id')}")
-            
+
     except Exception as e:
-        print(f"❌ Error escaneando conexiones: {e}")
+        print(f"❌ Error obteniendo conexiones: {e}")
         return {
             "statusCode": 500,
             "body": json.dumps({"message": "Error al obtener conexiones", "error": str(e)})
@@ -143,13 +276,14 @@ def lambda_handler(event, context):
     }
 
     print(f"📤 Enviando notificaciones...")
-    enviados = _broadcast(conexiones, payload)
+    enviados, eliminadas = _broadcast(conexiones, payload)
 
     return {
         "statusCode": 200,
         "body": json.dumps({
             "message": "Notificaciones enviadas",
             "conexiones_encontradas": len(conexiones),
-            "mensajes_enviados": enviados
+            "mensajes_enviados": enviados,
+            "conexiones_eliminadas": eliminadas
         })
     }
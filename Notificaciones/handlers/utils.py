@@ -1,6 +1,7 @@
 import os
 import jwt
 from datetime import datetime, timedelta
+from alerta_comun.tokens import decodificar_token
 
 JWT_SECRET = os.getenv("JWT_SECRET", "")
 JWT_ALGORITHM = "HS256"
@@ -11,7 +12,7 @@ def validar_token(token: str):
         return {"valido": False, "error": "Token es obligatorio"}
 
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decodificar_token(token, JWT_SECRET, JWT_ALGORITHM)
         expiracion = payload.get("exp")
         if expiracion and datetime.utcnow() > datetime.utcfromtimestamp(expiracion):
             return {"valido": False, "error": "Token expirado"}
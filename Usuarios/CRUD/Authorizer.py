@@ -1,6 +1,19 @@
 import json
 from CRUD.utils import validar_token
 
+def _recurso_api(method_arn):
+    """
+    ARN que cubre todos los métodos de la API y stage de la request.
+
+    Con resultTtlInSeconds > 0 API Gateway reutiliza la política cacheada
+    para cualquier endpoint llamado con el mismo token, así que no puede
+    limitarse al methodArn de la primera llamada.
+    """
+    api_arn, _, ruta = method_arn.partition("/")
+    stage = ruta.split("/", 1)[0]
+    return f"{api_arn}/{stage}/*/*"
+
+
 def lambda_handler(event, context):
     """
     Lambda Authorizer con validación de JWT
@@ -24,7 +37,7 @@ def lambda_handler(event, context):
                 {
                     "Action": "execute-api:Invoke",
                     "Effect": "Allow",
-                    "Resource": event["methodArn"]
+                    "Resource": _recurso_api(event["methodArn"])
                 }
             ]
         },
@@ -4,10 +4,8 @@ import os
 import requests
 from CRUD.utils import generar_token, validar_token, ALLOWED_ROLES
 from botocore.exceptions import ClientError  
-from decimal import Decimal                  
-import uuid                                  
-
-CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+from alerta_comun.respuestas import responder, extraer_token
+from alerta_comun.logs import registrar_log_sistema, registrar_log_auditoria, con_logs
 
 BREVO_API_KEY = os.environ.get("BREVO_API_KEY")
 EMAIL_FROM = os.environ.get("EMAIL_FROM", "no-reply@example.com")
@@ -17,120 +15,6 @@ TABLE_USUARIOS_NAME = os.getenv("TABLE_USUARIOS", "TABLE_USUARIOS")
 dynamodb = boto3.resource("dynamodb")
 usuarios_table = dynamodb.Table(TABLE_USUARIOS_NAME)
 
-TABLE_LOGS_NAME = os.getenv("TABLE_LOGS")
-logs_table = dynamodb.Table(TABLE_LOGS_NAME) if TABLE_LOGS_NAME else None
-
-def _response(status_code, body_dict):
-    """
-    Helper para unificar respuestas HTTP con CORS.
-    """
-    return {
-        "statusCode": status_code,
-        "headers": CORS_HEADERS,
-        "body": json.dumps(body_dict)
-    }
-
-
-def _to_dynamodb_numbers(obj):
-    """
-    Convierte recursivamente int/float -> Decimal.
-    Deja bool, None, str, Decimal, etc. tal cual.
-    """
-    if isinstance(obj, dict):
-        return {k: _to_dynamodb_numbers(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_to_dynamodb_numbers(x) for x in obj]
-    if isinstance(obj, bool) or obj is None:
-        return obj
-    if isinstance(obj, Decimal):
-        return obj
-    if isinstance(obj, (int, float)):
-        return Decimal(str(obj))
-    return obj
-
-
-def _guardar_log_en_dynamodb(registro):
-    """
-    Guarda el registro en la tabla de logs y lo imprime para CloudWatch.
-    Respeta el esquema de logs.
-    """
-    if not logs_table:
-        print("[LOG_WARNING] TABLE_LOGS no configurada, no se persiste el log.")
-        print("[LOG]", json.dumps(registro, default=str))
-        return
-
-    registro_ddb = _to_dynamodb_numbers(registro)
-
-    print("[LOG]", json.dumps(registro_ddb, default=str))
-
-    try:
-        logs_table.put_item(Item=registro_ddb)
-    except ClientError as e:
-        print("[LOG_ERROR] Error al guardar log en DynamoDB:", repr(e))
-
-
-def registrar_log_sistema(nivel, mensaje, servicio, contexto=None):
-    """
-    Crea un log de tipo 'sistema' siguiendo el esquema.
-    nivel: INFO | WARNING | ERROR | CRITICAL | AUDIT
-    """
-    if contexto is None:
-        contexto = {}
-
-    registro = {
-        "registro_id": str(uuid.uuid4()),
-        "nivel": nivel,
-        "tipo": "sistema",
-        "marca_tiempo": __import__("datetime").datetime.now(
-            __import__("datetime").timezone.utc
-        ).isoformat(),
-        "detalles_sistema": {
-            "mensaje": mensaje,
-            "servicio": servicio,
-            "contexto": contexto
-        }
-    }
-
-    _guardar_log_en_dynamodb(registro)
-
-
-def registrar_log_auditoria(
-    usuario_correo,
-    entidad,
-    entidad_id,
-    operacion,
-    valores_previos=None,
-    valores_nuevos=None,
-    nivel="AUDIT"
-):
-    """
-    Crea un log de tipo 'auditoria' siguiendo el esquema.
-    operacion: creacion | actualizacion | eliminacion | consulta
-    """
-    if valores_previos is None:
-        valores_previos = {}
-    if valores_nuevos is None:
-        valores_nuevos = {}
-
-    registro = {
-        "registro_id": str(uuid.uuid4()),
-        "nivel": nivel,
-        "tipo": "auditoria",
-        "marca_tiempo": __import__("datetime").datetime.now(
-            __import__("datetime").timezone.utc
-        ).isoformat(),
-        "detalles_auditoria": {
-            "usuario_correo": usuario_correo,
-            "entidad": entidad,
-            "entidad_id": entidad_id,
-            "operacion": operacion,
-            "valores_previos": valores_previos,
-            "valores_nuevos": valores_nuevos,
-        }
-    }
-
-    _guardar_log_en_dynamodb(registro)
-
 
 def enviar_correo_bienvenida(nombre: str, correo: str):
     """
@@ -216,6 +100,7 @@ def enviar_correo_bienvenida(nombre: str, correo: str):
         )
 
 
+@con_logs
 def lambda_handler(event, context):
     registrar_log_sistema(
         nivel="INFO",
@@ -225,13 +110,13 @@ def lambda_handler(event, context):
     )
 
     body = {}
-    headers = event.get("headers") or {}
-    auth_header = headers.get("authorization") or headers.get("Authorization")
+    # El token es opcional (auto-registro); si viene, se valida igual que en
+    # el resto de handlers
+    token = extraer_token(event) if isinstance(event, dict) else ""
     rol_autenticado = None
     correo_autenticado = None
 
-    if auth_header:
-        token = auth_header.split(" ")[-1]
+    if token:
         resultado_token = validar_token(token)
         if not resultado_token.get("valido"):
             registrar_log_sistema(
@@ -240,7 +125,7 @@ def lambda_handler(event, context):
                 servicio="crear_usuario",
                 contexto={"motivo": resultado_token.get("error")}
             )
-            return _response(401, {"message": resultado_token.get("error", "Token inválido")})
+            return responder(401, {"message": resultado_token.get("error", "Token inválido")})
         
         rol_autenticado = resultado_token.get("rol")
         correo_autenticado = resultado_token.get("correo")
@@ -268,19 +153,19 @@ def lambda_handler(event, context):
             servicio="crear_usuario",
             contexto={"body_recibido": body}
         )
-        return _response(
+        return responder(
             400,
             {"message": "nombre, correo, contrasena y rol son obligatorios"}
         )
 
     if "@" not in correo:
-        return _response(400, {"message": "Correo electrónico inválido"})
+        return responder(400, {"message": "Correo electrónico inválido"})
 
     if len(contrasena) < 6:
-        return _response(400, {"message": "La contraseña debe tener al menos 6 caracteres"})
+        return responder(400, {"message": "La contraseña debe tener al menos 6 caracteres"})
 
     if rol not in ALLOWED_ROLES:
-        return _response(
+        return responder(
             400,
             {"message": "Rol inválido, debe ser 'estudiante', 'personal_administrativo' o 'autoridad'"}
         )
@@ -293,7 +178,7 @@ def lambda_handler(event, context):
                 servicio="crear_usuario",
                 contexto={"correo": correo, "rol_solicitado": rol}
             )
-            return _response(
+            return responder(
                 403,
                 {"message": "Solo puedes auto-registrarte como estudiante"}
             )
@@ -308,7 +193,7 @@ def lambda_handler(event, context):
                 "rol_solicitado": rol
             }
         )
-        return _response(
+        return responder(
             403,
             {"message": "Solo una autoridad puede crear usuarios adicionales"}
         )
@@ -322,7 +207,7 @@ def lambda_handler(event, context):
             servicio="crear_usuario",
             contexto={"correo": correo, "error": str(e)}
         )
-        return _response(500, {"message": "Error interno al verificar usuario"})
+        return responder(500, {"message": "Error interno al verificar usuario"})
 
     if "Item" in resp:
         registrar_log_sistema(
@@ -331,7 +216,7 @@ def lambda_handler(event, context):
             servicio="crear_usuario",
             contexto={"correo": correo}
         )
-        return _response(400, {"error": "El correo ya está registrado"})
+        return responder(400, {"error": "El correo ya está registrado"})
 
     item = {
         "nombre": nombre,
@@ -349,7 +234,7 @@ def lambda_handler(event, context):
             servicio="crear_usuario",
             contexto={"correo": correo, "error": str(e)}
         )
-        return _response(500, {"message": "Error interno al crear el usuario"})
+        return responder(500, {"message": "Error interno al crear el usuario"})
 
     actor_correo = correo_autenticado or correo
     registrar_log_auditoria(
@@ -386,4 +271,4 @@ def lambda_handler(event, context):
     if not rol_autenticado:
         respuesta["token"] = generar_token(correo=correo, role=rol, nombre=nombre)
 
-    return _response(201, respuesta)
+    return responder(201, respuesta)
@@ -1,6 +1,7 @@
 import jwt
 import os
 from datetime import datetime, timedelta
+from alerta_comun.tokens import decodificar_token
 
 JWT_SECRET = os.getenv("JWT_SECRET", "qwertyuiopmnbvcxz12345lkjh09876gfd4567sa1234")
 JWT_ALGORITHM = "HS256"
@@ -45,7 +46,7 @@ def validar_token(token):
         return {"valido": False, "error": "Token es obligatorio"}
 
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decodificar_token(token, JWT_SECRET, JWT_ALGORITHM)
         rol = payload.get("rol", payload.get("role"))
         if rol not in ALLOWED_ROLES:
             return {"valido": False, "error": "Rol inválido en token"}
@@ -57,8 +57,24 @@ prepare_dependencies() {
     echo -e "${YELLOW}📥 Instalando dependencias Python (forzado)...${NC}"
     pip3 install -r ../requirements.txt -t python/ --upgrade --quiet
     echo -e "${GREEN}✅ Dependencias instaladas en python-dependencies/python/${NC}"
+
+    # Paquete compartido por los microservicios (logs, helpers)
+    cp -r ../alerta_comun python/
+    echo -e "${GREEN}✅ Paquete alerta_comun copiado a la layer${NC}"
+
+    # Layer aparte con Pillow, sólo para VariantesEvidencia (Incidentes,
+    # python3.13): trae binarios nativos, así que se instala la rueda de
+    # Lambda (Linux x86_64) para ese runtime aunque el build corra en otra
+    # plataforma, y no llega a los servicios con otro runtime (Analitica)
+    cd ..
+    mkdir -p pillow-dependencies
+    rm -rf pillow-dependencies/python
+    mkdir -p pillow-dependencies/python
+    pip3 install "Pillow>=10.4.0" -t pillow-dependencies/python/ --upgrade --quiet \
+        --platform manylinux2014_x86_64 --implementation cp --python-version 3.13 --only-binary=:all:
+    echo -e "${GREEN}✅ Pillow instalado en pillow-dependencies/python/${NC}"
     
-    cd ../..
+    cd ..
 }
 
 ensure_analitica_bucket() {
@@ -98,6 +114,22 @@ upload_airflow_dag() {
   echo -e "${GREEN}✅ DAG actualizado${NC}"
 }
 
+# Exporta los ARN de los streams DynamoDB que consumen las Lambdas de contadores
+export_stream_arns() {
+  echo -e "${BLUE}🔗 Obteniendo ARN de streams DynamoDB...${NC}"
+  TABLE_INCIDENTES_STREAM_ARN=$(aws dynamodb describe-table --table-name "${TABLE_INCIDENTES}" --query "Table.LatestStreamArn" --output text)
+  TABLE_LOGS_STREAM_ARN=$(aws dynamodb describe-table --table-name "${TABLE_LOGS}" --query "Table.LatestStreamArn" --output text)
+
+  if [ -z "${TABLE_INCIDENTES_STREAM_ARN}" ] || [ "${TABLE_INCIDENTES_STREAM_ARN}" = "None" ] || \
+     [ -z "${TABLE_LOGS_STREAM_ARN}" ] || [ "${TABLE_LOGS_STREAM_ARN}" = "None" ]; then
+    echo -e "${RED}❌ Las tablas de incidentes y logs deben tener stream habilitado (ejecuta la opción 3)${NC}"
+    exit 1
+  fi
+
+  export TABLE_INCIDENTES_STREAM_ARN TABLE_LOGS_STREAM_ARN
+  echo -e "${GREEN}✅ Streams encontrados${NC}"
+}
+
 # Función para crear infraestructura
 deploy_infrastructure() {
     echo -e "\n${BLUE}🏗️  Creando recursos de infraestructura (Tablas DynamoDB y Bucket S3)...${NC}"
@@ -118,6 +150,7 @@ deploy_services() {
     prepare_dependencies
     ensure_analitica_bucket
     upload_airflow_dag
+    export_stream_arns
     sls deploy
     echo -e "${GREEN}✅ Microservicios desplegados${NC}"
 }
@@ -140,6 +173,8 @@ remove_infrastructure() {
     aws dynamodb delete-table --table-name ${TABLE_EMPLEADOS} 2>/dev/null || echo "Tabla ${TABLE_EMPLEADOS} no existe"
     aws dynamodb delete-table --table-name ${TABLE_LOGS} 2>/dev/null || echo "Tabla ${TABLE_LOGS} no existe"
     aws dynamodb delete-table --table-name ${TABLE_CONEXIONES} 2>/dev/null || echo "Tabla ${TABLE_CONEXIONES} no existe"
+    aws dynamodb delete-table --table-name ${TABLE_CONTADORES} 2>/dev/null || echo "Tabla ${TABLE_CONTADORES} no existe"
+    aws dynamodb delete-table --table-name ${TABLE_ROLLUPS} 2>/dev/null || echo "Tabla ${TABLE_ROLLUPS} no existe"
     
     # Eliminar bucket S3
     echo -e "${YELLOW}Eliminando bucket S3...${NC}"